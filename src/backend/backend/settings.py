@@ -78,6 +78,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": os.path.join(Path(__file__).resolve().parent.parent.parent, 'db', 'sql') / "data.db",
+        # the DB is in WAL mode (see db/sql/connection.py), so reads don't
+        # block on the sync's writes; wait on locks instead of erroring.
+        "OPTIONS": {"timeout": 30},
     }
 }
 
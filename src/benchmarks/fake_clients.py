@@ -0,0 +1,292 @@
+"""Fake YouTube and Spotify backends that serve synthetic channels, for
+benchmarking the pipeline without the network or Redis.
+
+Each of the N synthetic podcasts has a YouTube channel and a Spotify show with
+the same M episodes, titled and described the way each platform does (e.g.,
+"Guest: Topic | Channel" on YouTube and "#12 | Guest: Topic" on Spotify), so
+that the mapping has realistic work to do. The data is generated from a seed,
+so every run (and every commit) benchmarks the same payloads.
+"""
+from datetime import datetime, timedelta
+import random
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set
+
+from integrations.spotify.constants import SPOTIFY_MAX_EPISODES_PER_PAGE
+from integrations.youtube.constants import MAX_PLAYLIST_ITEMS_PER_REQUEST
+from integrations.youtube.test.test_data import EXPECTED_CHANNEL_METADATA
+from lib.sync_enrichment import METADATA_TO_HYDRATE
+
+WORDS = (
+    "sleep focus dopamine nutrition fasting habits motivation stress anxiety "
+    "hormones exercise strength endurance learning memory creativity light "
+    "vision breathing cold heat recovery longevity aging brain gut health "
+    "fitness science protocols tools mindset performance discipline emotions "
+    "relationships addiction pleasure pain inflammation immunity metabolism "
+    "supplements caffeine alcohol cannabis meditation neuroplasticity mood "
+    "depression resilience willpower attention music language movement"
+).split()
+FIRST_NAMES = "Jane John Maria David Sarah Michael Anna Peter Laura James".split()
+LAST_NAMES = "Doe Smith Garcia Chen Patel Walker Kim Novak Rossi Adams".split()
+
+FIRST_EPISODE_DATE = datetime(2020, 1, 6, 13)
+DAYS_BETWEEN_EPISODES = 3
+
+
+def make_sentence(rng: random.Random, num_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(num_words)).capitalize() + "."
+
+
+class SyntheticEpisode:
+    """An episode that is published on both platforms."""
+
+    def __init__(self, seed: int, channel_index: int, episode_index: int) -> None:
+        rng = random.Random(f"{seed}:{channel_index}:{episode_index}")
+        self.episode_index = episode_index
+        self.guest = f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        self.topic = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 6)))
+        self.summary = " ".join(
+            make_sentence(rng, rng.randint(8, 20)) for _ in range(4)
+        )
+        self.published_at = FIRST_EPISODE_DATE + timedelta(
+            days=episode_index * DAYS_BETWEEN_EPISODES, minutes=rng.randint(0, 300)
+        )
+        self.duration_ms = rng.randint(30, 180) * 60 * 1000
+        self.view_count = rng.randint(1_000, 5_000_000)
+        self.youtube_id = f"yt{channel_index:04d}v{episode_index:05d}"
+        self.spotify_id = f"sp{channel_index:04d}e{episode_index:05d}".ljust(22, "0")
+
+    @property
+    def title(self) -> str:
+        return f"{self.guest}: {self.topic.title()}"
+
+    def get_description(self, footer: str) -> str:
+        return (
+            f"In this episode, {self.guest} and I discuss {self.topic}. "
+            f"{self.summary}\n\n{footer}"
+        )
+
+
+class SyntheticPodcast:
+    """A podcast, with its YouTube channel and Spotify show."""
+
+    def __init__(self, seed: int, channel_index: int, num_episodes: int) -> None:
+        self.channel_index = channel_index
+        self.youtube_channel_name = f"Benchmark Channel {channel_index}"
+        self.youtube_channel_id = f"UCbenchmark{channel_index:013d}"
+        self.spotify_show_name = f"Benchmark Show {channel_index}"
+        self.spotify_show_id = f"show{channel_index:018d}"
+        # newest-first, like both APIs list them.
+        self.episodes = [
+            SyntheticEpisode(seed, channel_index, episode_index)
+            for episode_index in reversed(range(num_episodes))
+        ]
+
+
+class SyntheticDataset:
+    def __init__(
+        self, num_channels: int, num_episodes_per_channel: int, seed: int = 0
+    ) -> None:
+        self.podcasts = [
+            SyntheticPodcast(seed, channel_index, num_episodes_per_channel)
+            for channel_index in range(num_channels)
+        ]
+        self.youtube_channel_name_to_podcast = {
+            podcast.youtube_channel_name: podcast for podcast in self.podcasts
+        }
+        self.youtube_channel_id_to_podcast = {
+            podcast.youtube_channel_id: podcast for podcast in self.podcasts
+        }
+        self.spotify_show_id_to_podcast = {
+            podcast.spotify_show_id: podcast for podcast in self.podcasts
+        }
+
+    @property
+    def num_episodes(self) -> int:
+        return sum(len(podcast.episodes) for podcast in self.podcasts)
+
+    @property
+    def youtube_channel_name_to_id(self) -> Dict[str, str]:
+        return {
+            podcast.youtube_channel_name: podcast.youtube_channel_id
+            for podcast in self.podcasts
+        }
+
+    @property
+    def spotify_show_name_to_id(self) -> Dict[str, str]:
+        return {
+            podcast.spotify_show_name: podcast.spotify_show_id
+            for podcast in self.podcasts
+        }
+
+    @property
+    def channel_pairings(self) -> List[Dict]:
+        """The true channel pairings, in the format of
+        `lsh.EpisodeLSHIndex.get_channel_pairings`."""
+        return [
+            {
+                "youtube_channel_id": podcast.youtube_channel_id,
+                "youtube_channel_name": podcast.youtube_channel_name,
+                "spotify_show_id": podcast.spotify_show_id,
+                "spotify_show_name": podcast.spotify_show_name,
+                "num_episode_pairs": len(podcast.episodes),
+            }
+            for podcast in self.podcasts
+        ]
+
+    @property
+    def youtube_id_to_spotify_id(self) -> Dict[str, str]:
+        """The true episode pairs."""
+        return {
+            episode.youtube_id: episode.spotify_id
+            for podcast in self.podcasts
+            for episode in podcast.episodes
+        }
+
+
+def make_video_info(podcast: SyntheticPodcast, episode: SyntheticEpisode) -> Dict:
+    """Video info in the format of `YoutubeClient.parse_video_responses`."""
+    return {
+        "video_id": episode.youtube_id,
+        "metadata": {
+            "publishedAt": episode.published_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "channelId": podcast.youtube_channel_id,
+            "title": f"{episode.title} | {podcast.spotify_show_name} Podcast",
+            "description": episode.get_description(
+                footer="Thank you to our sponsors. Timestamps: 00:00 Introduction"
+            ),
+            "channelTitle": podcast.youtube_channel_name,
+            "tags": episode.topic.split(),
+            "categoryId": "28",
+            "liveBroadcastContent": "none",
+            "defaultLanguage": "en",
+            "defaultAudioLanguage": "en",
+        },
+        "statistics": {
+            "viewCount": episode.view_count,
+            "likeCount": episode.view_count // 40,
+            "favoriteCount": 0,
+            "commentCount": episode.view_count // 400,
+        },
+        **METADATA_TO_HYDRATE,
+    }
+
+
+def make_episode_metadata(episode: SyntheticEpisode) -> Dict:
+    """Episode in the format of the Spotify episodes endpoint."""
+    description = episode.get_description(
+        footer="Learn more about your ad choices. Visit megaphone.fm/adchoices"
+    )
+    return {
+        "audio_preview_url": f"https://podz-content.spotifycdn.com/{episode.spotify_id}",  # noqa
+        "description": description,
+        "html_description": f"<p>{description}</p>",
+        "duration_ms": episode.duration_ms,
+        "explicit": False,
+        "external_urls": {
+            "spotify": f"https://open.spotify.com/episode/{episode.spotify_id}"
+        },
+        "href": f"https://api.spotify.com/v1/episodes/{episode.spotify_id}",
+        "id": episode.spotify_id,
+        "is_externally_hosted": False,
+        "is_playable": True,
+        "language": "en",
+        "languages": ["en"],
+        "name": f"#{episode.episode_index} | {episode.title}",
+        "release_date": episode.published_at.strftime("%Y-%m-%d"),
+        "release_date_precision": "day",
+        "type": "episode",
+        "uri": f"spotify:episode:{episode.spotify_id}",
+        **METADATA_TO_HYDRATE,
+    }
+
+
+class FakeYoutubeClient:
+    """Serves the synthetic channels through the `YoutubeClient` methods that
+    the sync uses."""
+
+    def __init__(self, dataset: SyntheticDataset) -> None:
+        self.dataset = dataset
+
+    def get_channel_metadata(self, channel_name: str) -> Dict:
+        podcast = self.dataset.youtube_channel_name_to_podcast[channel_name]
+        return {
+            **EXPECTED_CHANNEL_METADATA["snippet"],
+            "channelId": podcast.youtube_channel_id,
+            "title": podcast.youtube_channel_name,
+            "description": f"Welcome to the official {channel_name} channel.",
+            "channelTitle": podcast.youtube_channel_name,
+            **METADATA_TO_HYDRATE,
+        }
+
+    def iter_video_stats_pages_for_channel(
+        self,
+        channel_id: str,
+        max_results_total: Optional[int] = 20,
+        max_results_per_query: int = MAX_PLAYLIST_ITEMS_PER_REQUEST,
+        published_after: Optional[str] = None,
+        stop_at_video_id: Optional[str] = None,
+    ) -> Iterator[List[Dict]]:
+        podcast = self.dataset.youtube_channel_id_to_podcast[channel_id]
+        video_infos = []
+        for episode in podcast.episodes[:max_results_total]:
+            video_info = make_video_info(podcast, episode)
+            if episode.youtube_id == stop_at_video_id or (
+                published_after is not None
+                and video_info["metadata"]["publishedAt"] < published_after
+            ):
+                break
+            video_infos.append(video_info)
+        for i in range(0, len(video_infos), max_results_per_query):
+            yield video_infos[i : i + max_results_per_query]
+
+
+class FakeAsyncSpotifyClient:
+    """Serves the synthetic shows through the `AsyncSpotifyClient` methods
+    that the sync uses."""
+
+    def __init__(self, dataset: SyntheticDataset) -> None:
+        self.dataset = dataset
+
+    async def get_podcast_show_metadata(self, show_id: str) -> Dict:
+        podcast = self.dataset.spotify_show_id_to_podcast[show_id]
+        episodes = [
+            make_episode_metadata(episode)
+            for episode in podcast.episodes[:SPOTIFY_MAX_EPISODES_PER_PAGE]
+        ]
+        return {
+            "available_markets": ["CA", "GB", "US"],
+            "copyrights": [],
+            "description": f"The {podcast.spotify_show_name} podcast.",
+            "episodes": {"items": episodes, "total": len(podcast.episodes)},
+            "explicit": False,
+            "href": f"https://api.spotify.com/v1/shows/{show_id}",
+            "html_description": f"<p>The {podcast.spotify_show_name} podcast.</p>",
+            "id": show_id,
+            "is_externally_hosted": False,
+            "languages": ["en"],
+            "media_type": "audio",
+            "name": podcast.spotify_show_name,
+            "publisher": "Benchmark Media",
+            "total_episodes": len(podcast.episodes),
+            "type": "show",
+            "uri": f"spotify:show:{show_id}",
+            **METADATA_TO_HYDRATE,
+        }
+
+    async def iter_episode_pages_for_podcast_show(
+        self,
+        show_id: str,
+        max_results: Optional[int] = None,
+        known_episode_ids: Optional[Set[str]] = None,
+    ) -> AsyncIterator[List[Dict]]:
+        podcast = self.dataset.spotify_show_id_to_podcast[show_id]
+        episodes = podcast.episodes[:max_results]
+        for i in range(0, len(episodes), SPOTIFY_MAX_EPISODES_PER_PAGE):
+            page: List[Dict] = []
+            for episode in episodes[i : i + SPOTIFY_MAX_EPISODES_PER_PAGE]:
+                if known_episode_ids and episode.spotify_id in known_episode_ids:
+                    if page:
+                        yield page
+                    return
+                page.append(make_episode_metadata(episode))
+            yield page
@@ -0,0 +1,466 @@
+"""Benchmarks the pipeline end to end on synthetic channels (see
+`fake_clients`), against a scratch SQLite DB.
+
+Times each stage of the pipeline, and reports its throughput and the peak RSS
+of the process by the end of the stage:
+1. extract: fetch the channels and episodes from the fake clients.
+2. flatten: turn the payloads into dataclass instances, in write batches.
+3. write: stream the batches into SQLite through the sync engine.
+4. load: load the synced data that the mapping uses.
+5. map: build the LSH index, map the channels, and map their episodes.
+6. write_mapped: write the mapped channels and episodes.
+
+Results are saved as JSON, along with the metrics recorded during the run
+(see `lib.metrics`), so that runs on different commits can be compared:
+
+    cd src
+    python -m benchmarks.run_benchmarks --num-channels 10 --num-episodes 500 \
+        --output before.json
+    (check out another commit)
+    python -m benchmarks.run_benchmarks --num-channels 10 --num-episodes 500 \
+        --output after.json --compare-to before.json
+"""
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from benchmarks.fake_clients import (
+    FakeAsyncSpotifyClient,
+    FakeYoutubeClient,
+    SyntheticDataset,
+)
+from db.sql import connection
+from db.sql.connection import close_connections, set_db_path
+from integrations.spotify import helper as spotify_helper
+from integrations.spotify.constants import (
+    SPOTIFY_SYNC_MAX_QUEUED_BATCHES,
+    SPOTIFY_SYNC_MAX_WORKERS,
+)
+from integrations.spotify.sqlite_helper import bulk_write_spotify_data_to_db
+from integrations.sync_engine import run_streaming_async_sync, run_streaming_sync
+from integrations.youtube import constants as youtube_constants
+from integrations.youtube import helper as youtube_helper
+from integrations.youtube.sqlite_helper import bulk_write_youtube_data_to_db
+from lib.constants import CURRENT_SYNCTIMESTAMP
+from lib.metrics import METRICS
+from transformations.enrichment.helper import get_map_tables_to_sqlite_data
+from transformations.enrichment.mappings.lsh import build_lsh_index
+from transformations.enrichment.mappings.map_channels import (
+    get_channel_mapping,
+    map_channels,
+)
+from transformations.enrichment.mappings.map_episodes import map_episodes
+from transformations.enrichment.mappings.models import MappedChannel, MappedEpisode
+from transformations.enrichment.mappings.sqlite_helper import (
+    bulk_write_mapped_data_to_db,
+    get_channel_episodes_for_matching,
+)
+
+T = TypeVar("T")
+
+# (channel ID, the batches to write for the channel)
+ChannelBatches = Dict[str, List[List]]
+
+
+@dataclass
+class StageResult:
+    stage: str
+    num_items: int
+    seconds: float
+    items_per_second: float
+    peak_rss_mb: float
+
+
+@dataclass
+class ExtractedData:
+    youtube_channels: Dict[str, Dict]
+    youtube_video_pages: Dict[str, List[List[Dict]]]
+    spotify_shows: Dict[str, Dict]
+    spotify_episode_pages: Dict[str, List[List[Dict]]]
+
+
+def get_peak_rss_mb() -> float:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KB elsewhere.
+    return max_rss / 1024 / 1024 if sys.platform == "darwin" else max_rss / 1024
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stage(
+    stage: str, run: Callable[[], Tuple[T, int]], results: List[StageResult]
+) -> T:
+    """Run a stage, which returns its output and how many items it handled,
+    and record how it performed."""
+    start_time = time.perf_counter()
+    output, num_items = run()
+    seconds = time.perf_counter() - start_time
+    result = StageResult(
+        stage=stage,
+        num_items=num_items,
+        seconds=round(seconds, 4),
+        items_per_second=round(num_items / seconds, 1) if seconds else 0.0,
+        peak_rss_mb=round(get_peak_rss_mb(), 1),
+    )
+    results.append(result)
+    print(
+        f"{stage:>12}: {num_items:>8} items in {result.seconds:>8.3f}s "
+        f"({result.items_per_second:>10.1f}/s), peak RSS {result.peak_rss_mb} MB"
+    )
+    return output
+
+
+def extract(dataset: SyntheticDataset) -> Tuple[ExtractedData, int]:
+    youtube_client = FakeYoutubeClient(dataset)
+    spotify_client = FakeAsyncSpotifyClient(dataset)
+
+    youtube_channels = {}
+    youtube_video_pages = {}
+    for channel_name, channel_id in dataset.youtube_channel_name_to_id.items():
+        youtube_channels[channel_id] = youtube_client.get_channel_metadata(channel_name)
+        youtube_video_pages[channel_id] = list(
+            youtube_client.iter_video_stats_pages_for_channel(
+                channel_id, max_results_total=None
+            )
+        )
+
+    async def fetch_show(show_id: str) -> Tuple[Dict, List[List[Dict]]]:
+        show_metadata = await spotify_client.get_podcast_show_metadata(show_id)
+        episode_pages = [
+            page
+            async for page in spotify_client.iter_episode_pages_for_podcast_show(
+                show_id
+            )
+        ]
+        return show_metadata, episode_pages
+
+    async def fetch_shows() -> List[Tuple[Dict, List[List[Dict]]]]:
+        return await asyncio.gather(
+            *[
+                fetch_show(show_id)
+                for show_id in dataset.spotify_show_name_to_id.values()
+            ]
+        )
+
+    spotify_shows = {}
+    spotify_episode_pages = {}
+    for show_metadata, episode_pages in asyncio.run(fetch_shows()):
+        spotify_shows[show_metadata["id"]] = show_metadata
+        spotify_episode_pages[show_metadata["id"]] = episode_pages
+
+    extracted_data = ExtractedData(
+        youtube_channels=youtube_channels,
+        youtube_video_pages=youtube_video_pages,
+        spotify_shows=spotify_shows,
+        spotify_episode_pages=spotify_episode_pages,
+    )
+    num_payloads = (
+        len(youtube_channels)
+        + len(spotify_shows)
+        + sum(len(page) for pages in youtube_video_pages.values() for page in pages)
+        + sum(len(page) for pages in spotify_episode_pages.values() for page in pages)
+    )
+    return extracted_data, num_payloads
+
+
+def flatten(
+    extracted_data: ExtractedData,
+) -> Tuple[Tuple[ChannelBatches, ChannelBatches], int]:
+    """Create the batches that the YouTube and Spotify syncs write, in the
+    same way as `fetch_channel_batches` and `fetch_show_batches`."""
+    num_instances = 0
+    youtube_batches: ChannelBatches = {}
+    for channel_id, channel_metadata in extracted_data.youtube_channels.items():
+        batches: List[List] = [
+            [youtube_helper.create_channel_dataclass_instance(channel_metadata)]
+        ]
+        for page in extracted_data.youtube_video_pages[channel_id]:
+            batches.append(
+                [
+                    youtube_helper.create_video_dataclass_instance(video_metadata)
+                    for video_metadata in page
+                ]
+            )
+        videos = [video for batch in batches[1:] for video in batch]
+        sync_state = youtube_helper.get_updated_channel_sync_state(
+            channel_id=channel_id,
+            videos=(
+                [max(videos, key=lambda video: video.metadata.published_at)]
+                if videos
+                else []
+            ),
+            previous_sync_state=None,
+            synctimestamp=CURRENT_SYNCTIMESTAMP,
+        )
+        if sync_state:
+            batches.append([sync_state])
+        youtube_batches[channel_id] = batches
+        num_instances += sum(len(batch) for batch in batches)
+
+    spotify_batches: ChannelBatches = {}
+    for show_id, show_metadata in extracted_data.spotify_shows.items():
+        batches = [[spotify_helper.create_spotify_show_instance(show_metadata)]]
+        for page in extracted_data.spotify_episode_pages[show_id]:
+            batches.append(
+                [
+                    spotify_helper.create_spotify_episode_instance(
+                        metadata=episode_metadata,
+                        show_id=show_id,
+                        show_name=show_metadata["name"],
+                    )
+                    for episode_metadata in page
+                ]
+            )
+        spotify_batches[show_id] = batches
+        num_instances += sum(len(batch) for batch in batches)
+
+    return (youtube_batches, spotify_batches), num_instances
+
+
+def write(
+    dataset: SyntheticDataset,
+    youtube_batches: ChannelBatches,
+    spotify_batches: ChannelBatches,
+) -> Tuple[None, int]:
+    """Write the batches through the same sync engine, and with the same
+    settings, as the syncs."""
+    run_streaming_sync(
+        integration="youtube",
+        name_to_id_map=dataset.youtube_channel_name_to_id,
+        fetch_batches=lambda channel_name, channel_id: youtube_batches[channel_id],
+        write_batch=bulk_write_youtube_data_to_db,
+        max_workers=youtube_constants.YOUTUBE_SYNC_MAX_WORKERS,
+        max_queued_batches=youtube_constants.YOUTUBE_SYNC_MAX_QUEUED_BATCHES,
+    )
+
+    async def iter_show_batches(show_name: str, show_id: str) -> AsyncIterator[List]:
+        for batch in spotify_batches[show_id]:
+            yield batch
+
+    asyncio.run(
+        run_streaming_async_sync(
+            integration="spotify",
+            name_to_id_map=dataset.spotify_show_name_to_id,
+            fetch_batches=iter_show_batches,
+            write_batch=bulk_write_spotify_data_to_db,
+            max_concurrency=SPOTIFY_SYNC_MAX_WORKERS,
+            max_queued_batches=SPOTIFY_SYNC_MAX_QUEUED_BATCHES,
+        )
+    )
+    num_rows = sum(
+        len(batch)
+        for channel_batches in [youtube_batches, spotify_batches]
+        for batches in channel_batches.values()
+        for batch in batches
+    )
+    return None, num_rows
+
+
+def load(dataset: SyntheticDataset) -> Tuple[Tuple[Dict, Dict], int]:
+    """Load the tables used to map the channels, and each channel's episodes
+    with the columns used to match them."""
+    tables = get_map_tables_to_sqlite_data()
+    channel_id_to_episodes = {}
+    for pairing in dataset.channel_pairings:
+        channel_id_to_episodes[
+            pairing["youtube_channel_id"]
+        ] = get_channel_episodes_for_matching(
+            table_name="youtube_videos",
+            channel_id_col="channel_id",
+            channel_id=pairing["youtube_channel_id"],
+        ).to_dict(
+            orient="records"
+        )
+        channel_id_to_episodes[
+            pairing["spotify_show_id"]
+        ] = get_channel_episodes_for_matching(
+            table_name="spotify_episode",
+            channel_id_col="show_id",
+            channel_id=pairing["spotify_show_id"],
+        ).to_dict(
+            orient="records"
+        )
+    num_rows = sum(len(df) for df in tables.values()) + sum(
+        len(episodes) for episodes in channel_id_to_episodes.values()
+    )
+    return (tables, channel_id_to_episodes), num_rows
+
+
+def map_podcasts(
+    tables: Dict, channel_id_to_episodes: Dict
+) -> Tuple[List[Tuple[MappedChannel, List[MappedEpisode]]], int]:
+    lsh_index = build_lsh_index()
+    mapped_channels = map_channels(
+        youtube_channels_df=tables["youtube_channels"],
+        spotify_shows_df=tables["spotify_show"],
+        youtube_videos_df=tables["youtube_videos"],
+        spotify_episodes_df=tables["spotify_episode"],
+        youtube_channel_to_spotify_show=get_channel_mapping(
+            lsh_index.get_channel_pairings()
+        ),
+    )
+    mapped_data = []
+    num_episodes = 0
+    for mapped_channel in mapped_channels:
+        youtube_videos = channel_id_to_episodes[mapped_channel.youtube_channel.id]
+        spotify_episodes = channel_id_to_episodes[mapped_channel.spotify_channel.id]
+        mapped_episodes = map_episodes(
+            youtube_videos=youtube_videos,
+            spotify_episodes=spotify_episodes,
+            mapped_channels=[mapped_channel],
+        )
+        mapped_data.append((mapped_channel, mapped_episodes))
+        num_episodes += len(youtube_videos) + len(spotify_episodes)
+    return mapped_data, num_episodes
+
+
+def write_mapped(
+    mapped_data: List[Tuple[MappedChannel, List[MappedEpisode]]]
+) -> Tuple[None, int]:
+    for mapped_channel, mapped_episodes in mapped_data:
+        bulk_write_mapped_data_to_db([mapped_channel, *mapped_episodes])
+    return None, sum(1 + len(mapped_episodes) for _, mapped_episodes in mapped_data)
+
+
+def get_mapping_accuracy(
+    dataset: SyntheticDataset,
+    mapped_data: List[Tuple[MappedChannel, List[MappedEpisode]]],
+) -> Dict[str, float]:
+    """Share of the true episode pairs that were mapped (recall), and share
+    of the mapped pairs that are true pairs (precision)."""
+    youtube_id_to_spotify_id = dataset.youtube_id_to_spotify_id
+    mapped_pairs = [
+        (mapped_episode.youtube_episode.id, mapped_episode.spotify_episode.id)
+        for _, mapped_episodes in mapped_data
+        for mapped_episode in mapped_episodes
+    ]
+    num_correct = sum(
+        youtube_id_to_spotify_id.get(youtube_id) == spotify_id
+        for youtube_id, spotify_id in mapped_pairs
+    )
+    return {
+        "num_mapped_episodes": len(mapped_pairs),
+        "recall": round(num_correct / len(youtube_id_to_spotify_id), 4)
+        if youtube_id_to_spotify_id
+        else 0.0,
+        "precision": round(num_correct / len(mapped_pairs), 4) if mapped_pairs else 0.0,
+    }
+
+
+def run_benchmarks(
+    num_channels: int, num_episodes_per_channel: int, seed: int = 0
+) -> Dict:
+    """Run every stage of the pipeline on a synthetic dataset, against a
+    scratch DB. Returns the results."""
+    dataset = SyntheticDataset(
+        num_channels=num_channels,
+        num_episodes_per_channel=num_episodes_per_channel,
+        seed=seed,
+    )
+    results: List[StageResult] = []
+    METRICS.reset()
+    db_path = connection.SQLITE_DB_PATH
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        set_db_path(os.path.join(tmp_dir, "benchmark.db"))
+        try:
+            extracted_data = run_stage("extract", lambda: extract(dataset), results)
+            youtube_batches, spotify_batches = run_stage(
+                "flatten", lambda: flatten(extracted_data), results
+            )
+            run_stage(
+                "write",
+                lambda: write(dataset, youtube_batches, spotify_batches),
+                results,
+            )
+            tables, channel_id_to_episodes = run_stage(
+                "load", lambda: load(dataset), results
+            )
+            mapped_data = run_stage(
+                "map", lambda: map_podcasts(tables, channel_id_to_episodes), results
+            )
+            run_stage("write_mapped", lambda: write_mapped(mapped_data), results)
+        finally:
+            close_connections()
+            set_db_path(db_path)
+
+    return {
+        "commit": get_git_commit(),
+        "timestamp": CURRENT_SYNCTIMESTAMP,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "num_channels": num_channels,
+        "num_episodes_per_channel": num_episodes_per_channel,
+        "seed": seed,
+        "stages": [asdict(result) for result in results],
+        "total_seconds": round(sum(result.seconds for result in results), 4),
+        "mapping_accuracy": get_mapping_accuracy(dataset, mapped_data),
+        "metrics": METRICS.to_dict(),
+    }
+
+
+def compare_results(results: Dict, baseline_results: Dict) -> None:
+    """Print how long each stage took compared to a baseline run."""
+    if (
+        results["num_channels"] != baseline_results["num_channels"]
+        or results["num_episodes_per_channel"]
+        != baseline_results["num_episodes_per_channel"]
+    ):
+        print("Warning: the baseline was run on a different dataset size.")
+    baseline_stage_to_seconds = {
+        stage["stage"]: stage["seconds"] for stage in baseline_results["stages"]
+    }
+    print(f"Compared to {baseline_results['commit']}:")
+    for stage in results["stages"]:
+        baseline_seconds = baseline_stage_to_seconds.get(stage["stage"])
+        if not baseline_seconds:
+            continue
+        print(
+            f"{stage['stage']:>12}: {baseline_seconds:>8.3f}s -> "
+            f"{stage['seconds']:>8.3f}s ({stage['seconds'] / baseline_seconds:.2f}x)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--num-channels", type=int, default=10)
+    parser.add_argument("--num-episodes", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Path to save the results JSON to.")
+    parser.add_argument("--compare-to", help="Path to a previous results JSON.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        num_channels=args.num_channels,
+        num_episodes_per_channel=args.num_episodes,
+        seed=args.seed,
+    )
+    print(f"Mapping accuracy: {results['mapping_accuracy']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare_to:
+        with open(args.compare_to) as f:
+            compare_results(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
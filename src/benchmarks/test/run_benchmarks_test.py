@@ -0,0 +1,29 @@
+"""Tests for methods in run_benchmarks.py"""
+from benchmarks.run_benchmarks import compare_results, run_benchmarks
+
+
+def test_run_benchmarks_times_every_stage_and_maps_every_episode(capsys):
+    results = run_benchmarks(num_channels=2, num_episodes_per_channel=60)
+
+    assert [stage["stage"] for stage in results["stages"]] == [
+        "extract",
+        "flatten",
+        "write",
+        "load",
+        "map",
+        "write_mapped",
+    ]
+    stage_to_num_items = {
+        stage["stage"]: stage["num_items"] for stage in results["stages"]
+    }
+    # 2 channels, 2 shows, and 120 videos and 120 episodes.
+    assert stage_to_num_items["extract"] == 244
+    assert stage_to_num_items["write_mapped"] == 2 + 120
+    assert results["mapping_accuracy"] == {
+        "num_mapped_episodes": 120,
+        "recall": 1.0,
+        "precision": 1.0,
+    }
+
+    compare_results(results, baseline_results=results)
+    assert "1.00x" in capsys.readouterr().out
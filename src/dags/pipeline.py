@@ -4,6 +4,7 @@ from airflow import DAG
 from airflow.operators.python_operator import PythonOperator
 from datetime import datetime, timedelta
 from src.integrations.sync_integrations import main as sync_integrations_main
+from lib.metrics import export_metrics
 from transformations.main import main as transformations_main
 
 default_args = {
@@ -21,10 +22,16 @@ dag = DAG(
 )
 
 def run_sync_integrations():
-    sync_integrations_main()
+    try:
+        sync_integrations_main()
+    finally:
+        export_metrics(job_name="sync_integrations")
 
 def run_transformations():
-    transformations_main()
+    try:
+        transformations_main()
+    finally:
+        export_metrics(job_name="transformations")
 
 task_sync_integrations = PythonOperator(
     task_id='sync_integrations',
@@ -0,0 +1,79 @@
+"""Codecs for the values stored in the Redis cache.
+
+Values are serialized with orjson, which is several times faster than `json`
+and produces compact UTF-8 bytes. Values that are large enough to be worth it
+are also compressed with zlib.
+
+Each stored value starts with a version byte and a compression byte, so that
+the format can change without flushing the cache. Values that don't start
+with a known version byte are plain JSON text, as stored by older versions of
+the cache.
+"""
+from typing import Any, Dict, Union
+import zlib
+
+import orjson
+
+from db.redis.constants import COMPRESSION_LEVEL, COMPRESSION_MIN_NUM_BYTES
+
+CODEC_VERSION = 1
+
+UNCOMPRESSED = 0
+ZLIB_COMPRESSED = 1
+
+# which fields of a value to keep: `True` keeps the whole field, and a nested
+# dict keeps only the given fields of the field (or of each item, for lists).
+FieldProjection = Dict[str, Union[bool, "FieldProjection"]]
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value)
+
+
+def loads(payload: bytes) -> Any:
+    return orjson.loads(payload)
+
+
+def compress(payload: bytes) -> bytes:
+    """Add the header to a serialized value, compressing it if it's large."""
+    if len(payload) < COMPRESSION_MIN_NUM_BYTES:
+        return bytes([CODEC_VERSION, UNCOMPRESSED]) + payload
+    return bytes([CODEC_VERSION, ZLIB_COMPRESSED]) + zlib.compress(
+        payload, COMPRESSION_LEVEL
+    )
+
+
+def decompress(raw: bytes) -> bytes:
+    """Get the serialized value back from a stored value."""
+    if raw[:1] != bytes([CODEC_VERSION]):
+        # stored by an older version of the cache, as JSON text.
+        return raw
+    compression = raw[1]
+    if compression == ZLIB_COMPRESSED:
+        return zlib.decompress(raw[2:])
+    if compression == UNCOMPRESSED:
+        return raw[2:]
+    raise ValueError(f"Unknown cache value compression: {compression}")
+
+
+def encode_value(value: Any) -> bytes:
+    return compress(dumps(value))
+
+
+def decode_value(raw: bytes) -> Any:
+    return loads(decompress(raw))
+
+
+def project(value: Any, projection: Union[bool, FieldProjection]) -> Any:
+    """Keep only the fields of a value that are in the projection."""
+    if projection is True:
+        return value
+    if isinstance(value, list):
+        return [project(item, projection) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        field: project(value[field], field_projection)
+        for field, field_projection in projection.items()  # type: ignore
+        if field in value
+    }
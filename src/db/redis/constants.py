@@ -1,3 +1,132 @@
 REDIS_PORT = 6379
 REDIS_HOST = "localhost"
 DEFAULT_CACHE_TIME_SECONDS = 300
+
+# how long the responses cached by each function stay fresh. Data that
+# doesn't change (e.g., channel metadata) is kept for much longer than data
+# that does (e.g., the statistics in video details, or the latest episodes).
+FUNCTION_NAME_TO_CACHE_TIME_SECONDS = {
+    "get_channel_id_from_handle": 30 * 24 * 60 * 60,
+    "get_channel_metadata": 7 * 24 * 60 * 60,
+    "get_uploads_playlist_id": 30 * 24 * 60 * 60,
+    # new uploads shift the videos across pages, so pages can't be kept long.
+    "get_playlist_page": 60 * 60,
+    "get_video_details_from_id": 60 * 60,
+    "get_podcast_show_metadata": 24 * 60 * 60,
+    "get_episode_details_for_podcast_show": 60 * 60,
+}
+# how long expired responses are kept in Redis, so that they can still be
+# revalidated with their ETag.
+STALE_CACHE_TIME_SECONDS = 7 * 24 * 60 * 60
+
+# bounds for the in-process cache in front of Redis.
+LOCAL_CACHE_MAX_NUM_ENTRIES = 4096
+LOCAL_CACHE_MAX_NUM_BYTES = 64 * 1024 * 1024
+LOCAL_CACHE_TIME_SECONDS = 300
+# how long to remember, in-process, that a key isn't in Redis.
+NEGATIVE_CACHE_TIME_SECONDS = 30
+
+# cached values at least this big (serialized) are compressed.
+COMPRESSION_MIN_NUM_BYTES = 1024
+# zlib level: low levels are much faster and still shrink JSON several-fold.
+COMPRESSION_LEVEL = 3
+
+# the fields of each cached function's responses that the clients use (see
+# `codecs.project`). Everything else, e.g. thumbnails, is dropped before
+# caching. The sync metadata (e.g., synctimestamp) is never cached: the clients
+# add it after the cache lookup. Functions that aren't listed have their responses cached whole.
+YOUTUBE_VIDEO_SNIPPET_FIELDS = [
+    "title",
+    "channelId",
+    "channelTitle",
+    "categoryId",
+    "defaultAudioLanguage",
+    "defaultLanguage",
+    "description",
+    "liveBroadcastContent",
+    "publishedAt",
+    "tags",
+]
+SPOTIFY_EPISODE_FIELDS = [
+    "id",
+    "audio_preview_url",
+    "description",
+    "html_description",
+    "duration_ms",
+    "explicit",
+    "href",
+    "is_externally_hosted",
+    "is_playable",
+    "languages",
+    "name",
+    "release_date",
+    "release_date_precision",
+    "type",
+    "uri",
+]
+SPOTIFY_SHOW_FIELDS = [
+    "id",
+    "available_markets",
+    "copyrights",
+    "description",
+    "explicit",
+    "href",
+    "html_description",
+    "is_externally_hosted",
+    "languages",
+    "media_type",
+    "name",
+    "publisher",
+    "type",
+    "uri",
+    "total_episodes",
+]
+FUNCTION_NAME_TO_CACHED_FIELDS = {
+    "get_channel_metadata": {
+        field: True
+        for field in [
+            "channelId",
+            "title",
+            "description",
+            "channelTitle",
+            "publishTime",
+            "publishedAt",
+        ]
+    },
+    "get_uploads_playlist_id": {
+        "etag": True,
+        "items": {"contentDetails": {"relatedPlaylists": {"uploads": True}}},
+    },
+    "get_playlist_page": {
+        "etag": True,
+        "nextPageToken": True,
+        "items": {"contentDetails": {"videoId": True, "videoPublishedAt": True}},
+    },
+    "get_video_details_from_id": {
+        "kind": True,
+        "etag": True,
+        "pageInfo": True,
+        "items": {
+            "id": True,
+            "etag": True,
+            "snippet": {field: True for field in YOUTUBE_VIDEO_SNIPPET_FIELDS},
+            "statistics": True,
+        },
+    },
+    "get_podcast_show_metadata": {
+        **{field: True for field in SPOTIFY_SHOW_FIELDS},
+        "episodes": {"items": {"id": True}},
+    },
+    "get_episode_details_for_podcast_show": {
+        "next": True,
+        "items": {field: True for field in SPOTIFY_EPISODE_FIELDS},
+    },
+}
+
+# a worker that misses the cache holds a lease on the key while it fetches,
+# so that other workers wait for its result instead of fetching it too (see
+# `singleflight`). The lease expires in case the worker dies mid-fetch.
+SINGLEFLIGHT_LEASE_TIME_SECONDS = 30
+SINGLEFLIGHT_POLL_INTERVAL_SECONDS = 0.05
+# how long to wait for another worker's fetch before fetching anyway.
+SINGLEFLIGHT_MAX_WAIT_SECONDS = 30
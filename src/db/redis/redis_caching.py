@@ -8,18 +8,129 @@ is on before running. Run the following in a CLI tool, from this directory.
 ```
 redis-server ./redis.conf
 ```
+
+Lookups go through a bounded in-process LRU cache before Redis, since the
+same keys (e.g., channel metadata) are read many times per run. Redis misses
+are also remembered for a short while (negative caching), so that repeated
+lookups for data that isn't cached don't each cost a round trip. Values from
+the in-process cache are shared, so callers should treat them as read-only.
+
+How long a response stays fresh depends on the function that cached it (see
+`FUNCTION_NAME_TO_CACHE_TIME_SECONDS`). Expired responses are kept in Redis for
+a while longer, along with their ETag, so that clients can revalidate them
+with a conditional request instead of downloading them again (see
+`get_stale_cache_entry`).
+
+Values are stored in a compact binary format (see `codecs`), and are
+projected down to the fields that the clients use before they're cached
+(see `FUNCTION_NAME_TO_CACHED_FIELDS`).
 """
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
 import json
-from typing import Dict, Union
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import redis
 
-from db.redis.constants import DEFAULT_CACHE_TIME_SECONDS, REDIS_HOST, REDIS_PORT
+from db.redis import codecs
+from db.redis.constants import (
+    DEFAULT_CACHE_TIME_SECONDS,
+    FUNCTION_NAME_TO_CACHE_TIME_SECONDS,
+    FUNCTION_NAME_TO_CACHED_FIELDS,
+    LOCAL_CACHE_MAX_NUM_BYTES,
+    LOCAL_CACHE_MAX_NUM_ENTRIES,
+    LOCAL_CACHE_TIME_SECONDS,
+    NEGATIVE_CACHE_TIME_SECONDS,
+    REDIS_HOST,
+    REDIS_PORT,
+    STALE_CACHE_TIME_SECONDS,
+)
 from lib.log.logger import Logger
+from lib.metrics import METRICS
 
-redis_conn = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+# values are binary (see `codecs`), so they aren't decoded to strings.
+redis_conn = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=False)
 logger = Logger(__file__)
 
+# cached in-process for keys that aren't in Redis.
+MISSING = object()
+
+
+@dataclass
+class CacheEntry:
+    """A cached response, as stored in Redis."""
+
+    data: Any
+    etag: Optional[str]
+    expires_at: float  # unix time after which the data needs revalidating
+
+    def is_fresh(self) -> bool:
+        return self.expires_at > time.time()
+
+
+class LocalCache:
+    """Thread-safe LRU cache, bounded by both its number of entries and the
+    total size of its values, whose entries expire after a TTL."""
+
+    def __init__(self, max_num_entries: int, max_num_bytes: int) -> None:
+        self.max_num_entries = max_num_entries
+        self.max_num_bytes = max_num_bytes
+        self.num_bytes = 0
+        # key -> (value, size, expiry time)
+        self.entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns (True, value) on a hit, otherwise (False, None). The value
+        is the stored object itself (not a copy), so it mustn't be mutated."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            value, _, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._delete(key)
+                return False, None
+            self.entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, size: int, ttl_seconds: float) -> None:
+        with self.lock:
+            self._delete(key)
+            if size > self.max_num_bytes:
+                return
+            self.entries[key] = (value, size, time.monotonic() + ttl_seconds)
+            self.num_bytes += size
+            while (
+                len(self.entries) > self.max_num_entries
+                or self.num_bytes > self.max_num_bytes
+            ):
+                self._delete(next(iter(self.entries)))
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self._delete(key)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.num_bytes = 0
+
+    def _delete(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.num_bytes -= entry[1]
+
+
+local_cache = LocalCache(
+    max_num_entries=LOCAL_CACHE_MAX_NUM_ENTRIES, max_num_bytes=LOCAL_CACHE_MAX_NUM_BYTES
+)
+
 
 def cache_key(function_name: str, params: Dict) -> str:
     """Generate a cache key based on the API endpoint and parameters."""
@@ -28,20 +139,147 @@ def cache_key(function_name: str, params: Dict) -> str:
     return f"{function_name}:{params_str}"
 
 
-def cache_data(function_name: str, params: Dict, data: Dict) -> None:
-    """Cache the API response data in Redis."""
+def get_cache_time_seconds(function_name: str) -> int:
+    """How long the responses cached by a function stay fresh."""
+    return FUNCTION_NAME_TO_CACHE_TIME_SECONDS.get(
+        function_name, DEFAULT_CACHE_TIME_SECONDS
+    )
+
+
+def encode_cache_entry(
+    function_name: str, data: Any, etag: Optional[str]
+) -> Tuple[CacheEntry, bytes, int]:
+    """Returns the entry to cache, its encoded value, and its serialized
+    (uncompressed) size."""
+    cache_entry = CacheEntry(
+        data=codecs.project(
+            data, FUNCTION_NAME_TO_CACHED_FIELDS.get(function_name, True)
+        ),
+        etag=etag,
+        expires_at=time.time() + get_cache_time_seconds(function_name),
+    )
+    payload = codecs.dumps(asdict(cache_entry))
+    return cache_entry, codecs.compress(payload), len(payload)
+
+
+def decode_cache_entry(raw: bytes) -> Tuple[Optional[CacheEntry], int]:
+    """Returns the cached entry and its serialized (uncompressed) size. The
+    entry is None for values that weren't stored as a `CacheEntry`."""
+    payload = codecs.decompress(raw)
+    cache_entry_dict = codecs.loads(payload)
+    if not isinstance(cache_entry_dict, dict) or "expires_at" not in cache_entry_dict:
+        return None, len(payload)
+    return CacheEntry(**cache_entry_dict), len(payload)
+
+
+def set_local_cache(key: str, cache_entry: CacheEntry, size: int) -> None:
+    ttl_seconds = min(LOCAL_CACHE_TIME_SECONDS, cache_entry.expires_at - time.time())
+    local_cache.set(key, cache_entry.data, size=size, ttl_seconds=ttl_seconds)
+
+
+def set_local_cache_miss(key: str) -> None:
+    local_cache.set(key, MISSING, size=0, ttl_seconds=NEGATIVE_CACHE_TIME_SECONDS)
+
+
+def get_redis_ttl_seconds(function_name: str) -> int:
+    """Keep responses in Redis past their expiry, so that they can be
+    revalidated."""
+    return get_cache_time_seconds(function_name) + STALE_CACHE_TIME_SECONDS
+
+
+def cache_data(
+    function_name: str, params: Dict, data: Dict, etag: Optional[str] = None
+) -> None:
+    """Cache the API response data in Redis, along with its ETag, if any."""
     key = cache_key(function_name, params)
-    data_str = json.dumps(data)
-    redis_conn.setex(key, DEFAULT_CACHE_TIME_SECONDS, data_str)
+    cache_entry, raw, size = encode_cache_entry(function_name, data, etag)
+    redis_conn.setex(key, get_redis_ttl_seconds(function_name), raw)
+    set_local_cache(key, cache_entry, size)
+
+
+def cache_data_many(
+    function_name: str, params_list: Sequence[Dict], data_list: Sequence[Dict]
+) -> None:
+    """Cache several API responses in Redis, in one round trip. The responses
+    are stored without an ETag, since they are usually split from one
+    multi-item response, whose ETag doesn't apply to each of them."""
+    pipeline = redis_conn.pipeline(transaction=False)
+    for params, data in zip(params_list, data_list):
+        key = cache_key(function_name, params)
+        cache_entry, raw, size = encode_cache_entry(function_name, data, etag=None)
+        pipeline.setex(key, get_redis_ttl_seconds(function_name), raw)
+        set_local_cache(key, cache_entry, size)
+    pipeline.execute()
 
 
 def get_cached_data(function_name: str, params: Dict) -> Union[Dict, None]:
-    """Retrieve cached data from Redis if available."""
-    key = cache_key(function_name, params)
-    cached_data = redis_conn.get(key)
-    if cached_data is not None:
-        return json.loads(cached_data)
-    logger.warning(
-        f"Cached data not found for function {function_name} and params {params}"
-    )  # noqa
-    return None
+    """Retrieve cached data from the in-process cache or, failing that, from
+    Redis, if available and still fresh."""
+    return get_cached_data_many(function_name, [params])[0]
+
+
+def record_cache_lookups(function_name: str, result: str, num_lookups: int) -> None:
+    if num_lookups:
+        METRICS.increment(
+            "cache_lookups_total",
+            num_lookups,
+            function_name=function_name,
+            result=result,
+        )
+
+
+def get_cached_data_many(
+    function_name: str, params_list: Sequence[Dict]
+) -> List[Optional[Dict]]:
+    """Retrieve the cached data for each set of params, in order, with one
+    Redis round trip for all the keys that aren't cached in-process. Returns
+    None for each set of params that isn't cached or has expired."""
+    keys = [cache_key(function_name, params) for params in params_list]
+    results: List[Optional[Dict]] = [None] * len(keys)
+    redis_keys: List[str] = []
+    redis_key_indices: List[int] = []
+    num_local_hits = 0
+    num_local_misses = 0
+    for i, key in enumerate(keys):
+        found, value = local_cache.get(key)
+        if not found:
+            redis_keys.append(key)
+            redis_key_indices.append(i)
+        elif value is not MISSING:
+            results[i] = value
+            num_local_hits += 1
+        else:
+            num_local_misses += 1
+    record_cache_lookups(function_name, "local_hit", num_local_hits)
+    record_cache_lookups(function_name, "miss", num_local_misses)
+
+    if not redis_keys:
+        return results
+
+    num_misses = 0
+    for i, key, raw in zip(redis_key_indices, redis_keys, redis_conn.mget(redis_keys)):
+        cache_entry, size = decode_cache_entry(raw) if raw is not None else (None, 0)
+        if cache_entry is None or not cache_entry.is_fresh():
+            set_local_cache_miss(key)
+            num_misses += 1
+            continue
+        results[i] = cache_entry.data
+        set_local_cache(key, cache_entry, size)
+    record_cache_lookups(function_name, "redis_hit", len(redis_keys) - num_misses)
+    record_cache_lookups(function_name, "miss", num_misses)
+    if num_misses:
+        logger.debug(
+            f"Cached data not found for function {function_name} for "
+            f"{num_misses}/{len(keys)} params."
+        )
+    return results
+
+
+def get_stale_cache_entry(function_name: str, params: Dict) -> Optional[CacheEntry]:
+    """Get the cached response for the params even if it has expired, so that
+    it can be revalidated with its ETag. Bypasses the in-process cache."""
+    raw = redis_conn.get(cache_key(function_name, params))
+    if raw is None:
+        return None
+    cache_entry, _ = decode_cache_entry(raw)
+    return cache_entry
@@ -0,0 +1,262 @@
+"""Coalesce concurrent cache misses for the same key into a single fetch.
+
+When several workers miss the cache for the same key at once (e.g., the same
+channel metadata or video ID), only one of them fetches the data from the
+API; the others wait for it to land in the cache. Within a process, workers
+queue on a per-key lock. Across processes (e.g., Airflow workers), the
+fetching worker holds a lease on the key in Redis (`SET NX` with an expiry),
+and the others poll the cache until the lease is released.
+
+Fetches must cache their own results (with `cache_data`), since that is how
+the waiting workers get them.
+"""
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+import threading
+import time
+from typing import (
+    Awaitable,
+    Callable,
+    DefaultDict,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+import uuid
+
+from db.redis import redis_caching
+from db.redis.constants import (
+    SINGLEFLIGHT_LEASE_TIME_SECONDS,
+    SINGLEFLIGHT_MAX_WAIT_SECONDS,
+    SINGLEFLIGHT_POLL_INTERVAL_SECONDS,
+)
+from db.redis.redis_caching import cache_key, get_cached_data, get_cached_data_many
+from lib.log.logger import Logger
+
+logger = Logger(__name__)
+
+LEASE_KEY_PREFIX = "lease:"
+
+# only delete the lease if we still hold it, i.e., it hasn't expired and been
+# taken by another worker.
+RELEASE_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+key_locks: Dict[str, threading.Lock] = {}
+key_lock_counts: DefaultDict[str, int] = defaultdict(int)
+key_locks_lock = threading.Lock()
+# the event loop is single-threaded, so these don't need a lock.
+async_key_locks: Dict[str, asyncio.Lock] = {}
+async_key_lock_counts: DefaultDict[str, int] = defaultdict(int)
+
+
+@contextmanager
+def hold_key_lock(key: str) -> Iterator[None]:
+    """Hold the in-process lock for a key. Locks are dropped once no thread
+    holds or waits for them."""
+    with key_locks_lock:
+        lock = key_locks.setdefault(key, threading.Lock())
+        key_lock_counts[key] += 1
+    try:
+        with lock:
+            yield
+    finally:
+        with key_locks_lock:
+            key_lock_counts[key] -= 1
+            if not key_lock_counts[key]:
+                del key_lock_counts[key]
+                del key_locks[key]
+
+
+def acquire_leases(keys: Sequence[str]) -> List[Optional[str]]:
+    """Try to take the lease on each key, in one round trip. Returns the
+    lease token for each key that we got, otherwise None."""
+    tokens = [uuid.uuid4().hex for _ in keys]
+    pipeline = redis_caching.redis_conn.pipeline(transaction=False)
+    for key, token in zip(keys, tokens):
+        pipeline.set(
+            LEASE_KEY_PREFIX + key, token, nx=True, ex=SINGLEFLIGHT_LEASE_TIME_SECONDS
+        )
+    return [
+        token if acquired else None
+        for token, acquired in zip(tokens, pipeline.execute())
+    ]
+
+
+def release_leases(keys: Sequence[str], tokens: Sequence[Optional[str]]) -> None:
+    pipeline = redis_caching.redis_conn.pipeline(transaction=False)
+    for key, token in zip(keys, tokens):
+        if token is not None:
+            pipeline.eval(RELEASE_LEASE_SCRIPT, 1, LEASE_KEY_PREFIX + key, token)
+    pipeline.execute()
+
+
+def poll_cached_data(
+    function_name: str, params_list: Sequence[Dict], keys: Sequence[str]
+) -> Optional[List[Optional[Dict]]]:
+    """Check the cache for data that other workers are fetching. Returns
+    None while any of the keys is still leased and not cached yet."""
+    for key in keys:
+        # skip the negatively cached miss from before the fetch.
+        redis_caching.local_cache.delete(key)
+    results = get_cached_data_many(function_name, params_list)
+    pending_keys = [key for key, data in zip(keys, results) if data is None]
+    if pending_keys and any(
+        redis_caching.redis_conn.exists(LEASE_KEY_PREFIX + key) for key in pending_keys
+    ):
+        return None
+    return results
+
+
+def wait_for_cached_data(
+    function_name: str, params_list: Sequence[Dict], keys: Sequence[str]
+) -> List[Optional[Dict]]:
+    """Wait for the other workers to fetch the data for the params, and get it
+    from the cache. Returns None for data that they didn't cache in time."""
+    deadline = time.monotonic() + SINGLEFLIGHT_MAX_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        results = poll_cached_data(function_name, params_list, keys)
+        if results is not None:
+            return results
+        time.sleep(SINGLEFLIGHT_POLL_INTERVAL_SECONDS)
+    logger.warning(f"Timed out waiting for other workers to fetch {function_name}.")
+    return [None] * len(keys)
+
+
+async def wait_for_cached_data_async(
+    function_name: str, params_list: Sequence[Dict], keys: Sequence[str]
+) -> List[Optional[Dict]]:
+    """Async version of `wait_for_cached_data`."""
+    deadline = time.monotonic() + SINGLEFLIGHT_MAX_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        results = await asyncio.to_thread(
+            poll_cached_data, function_name, params_list, keys
+        )
+        if results is not None:
+            return results
+        await asyncio.sleep(SINGLEFLIGHT_POLL_INTERVAL_SECONDS)
+    logger.warning(f"Timed out waiting for other workers to fetch {function_name}.")
+    return [None] * len(keys)
+
+
+def get_or_fetch(function_name: str, params: Dict, fetch: Callable[[], Dict]) -> Dict:
+    """Get the data for the params from the cache, or fetch it (and cache it)
+    with `fetch`, making sure that only one worker fetches it at a time."""
+    cached_data = get_cached_data(function_name=function_name, params=params)
+    if cached_data:
+        return cached_data
+
+    key = cache_key(function_name, params)
+    with hold_key_lock(key):
+        # another thread may have fetched it while we waited for the lock.
+        cached_data = get_cached_data(function_name=function_name, params=params)
+        if cached_data:
+            return cached_data
+        [token] = acquire_leases([key])
+        if token is None:
+            [cached_data] = wait_for_cached_data(function_name, [params], [key])
+            if cached_data:
+                return cached_data
+            [token] = acquire_leases([key])
+        try:
+            return fetch()
+        finally:
+            release_leases([key], [token])
+
+
+def get_or_fetch_many(
+    function_name: str,
+    params_list: Sequence[Dict],
+    fetch_many: Callable[[List[Dict]], List[Optional[Dict]]],
+) -> List[Optional[Dict]]:
+    """Batch version of `get_or_fetch`. `fetch_many` gets the params that
+    need to be fetched and returns (and caches) their data, in order, or None
+    for the ones that have no data.
+
+    Only the Redis leases are used, so that one batch never waits on
+    another's in-process lock.
+    """
+    results = get_cached_data_many(function_name, params_list)
+    missing_indices = [i for i, data in enumerate(results) if not data]
+    if not missing_indices:
+        return results
+
+    missing_keys = [cache_key(function_name, params_list[i]) for i in missing_indices]
+    tokens = acquire_leases(missing_keys)
+    leased_indices = [i for i, token in zip(missing_indices, tokens) if token]
+    waiting_indices = [i for i, token in zip(missing_indices, tokens) if not token]
+    try:
+        if leased_indices:
+            fetched_results = fetch_many([params_list[i] for i in leased_indices])
+            for i, data in zip(leased_indices, fetched_results):
+                results[i] = data
+    finally:
+        release_leases(missing_keys, tokens)
+    if not waiting_indices:
+        return results
+
+    waited_results = wait_for_cached_data(
+        function_name,
+        [params_list[i] for i in waiting_indices],
+        [cache_key(function_name, params_list[i]) for i in waiting_indices],
+    )
+    for i, data in zip(waiting_indices, waited_results):
+        results[i] = data
+
+    # fetch whatever the other workers didn't get (e.g., if they failed).
+    refetch_indices = [i for i in waiting_indices if not results[i]]
+    if refetch_indices:
+        fetched_results = fetch_many([params_list[i] for i in refetch_indices])
+        for i, data in zip(refetch_indices, fetched_results):
+            results[i] = data
+    return results
+
+
+async def get_or_fetch_async(
+    function_name: str, params: Dict, fetch: Callable[[], Awaitable[Dict]]
+) -> Dict:
+    """Async version of `get_or_fetch`, for coroutines on one event loop.
+
+    The Redis calls are blocking, so they're run in worker threads, to not
+    hold up the other coroutines on the event loop while they wait on Redis.
+    """
+    cached_data = await asyncio.to_thread(
+        get_cached_data, function_name=function_name, params=params
+    )
+    if cached_data:
+        return cached_data
+
+    key = cache_key(function_name, params)
+    lock = async_key_locks.setdefault(key, asyncio.Lock())
+    async_key_lock_counts[key] += 1
+    try:
+        async with lock:
+            cached_data = await asyncio.to_thread(
+                get_cached_data, function_name=function_name, params=params
+            )
+            if cached_data:
+                return cached_data
+            [token] = await asyncio.to_thread(acquire_leases, [key])
+            if token is None:
+                [cached_data] = await wait_for_cached_data_async(
+                    function_name, [params], [key]
+                )
+                if cached_data:
+                    return cached_data
+                [token] = await asyncio.to_thread(acquire_leases, [key])
+            try:
+                return await fetch()
+            finally:
+                await asyncio.to_thread(release_leases, [key], [token])
+    finally:
+        async_key_lock_counts[key] -= 1
+        if not async_key_lock_counts[key]:
+            del async_key_lock_counts[key]
+            del async_key_locks[key]
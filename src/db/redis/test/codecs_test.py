@@ -0,0 +1,52 @@
+"""Tests for codecs.py"""
+import json
+
+from db.redis.codecs import (
+    compress,
+    CODEC_VERSION,
+    decode_value,
+    encode_value,
+    project,
+    ZLIB_COMPRESSED,
+)
+from db.redis.constants import COMPRESSION_MIN_NUM_BYTES
+
+
+def test_encode_value_round_trips_and_compresses_large_values():
+    small_value = {"title": "a", "tags": ["x", "y"], "viewCount": 1}
+    large_value = {"description": "lorem ipsum " * COMPRESSION_MIN_NUM_BYTES}
+
+    encoded_small_value = encode_value(small_value)
+    encoded_large_value = encode_value(large_value)
+
+    assert decode_value(encoded_small_value) == small_value
+    assert decode_value(encoded_large_value) == large_value
+    assert encoded_large_value[:2] == bytes([CODEC_VERSION, ZLIB_COMPRESSED])
+    assert len(encoded_large_value) < len(json.dumps(large_value)) / 10
+
+
+def test_decode_value_reads_legacy_json():
+    value = {"title": "a", "items": [1, 2]}
+    assert decode_value(json.dumps(value).encode("utf-8")) == value
+
+
+def test_compress_only_adds_header_to_small_values():
+    assert compress(b"{}") == bytes([CODEC_VERSION, 0]) + b"{}"
+
+
+def test_project_keeps_only_projected_fields():
+    response = {
+        "etag": "etag",
+        "items": [
+            {
+                "id": "a",
+                "snippet": {"title": "title", "thumbnails": {"default": {}}},
+                "statistics": {"viewCount": "1"},
+            }
+        ],
+    }
+    projection = {"items": {"id": True, "snippet": {"title": True, "tags": True}}}
+    assert project(response, projection) == {
+        "items": [{"id": "a", "snippet": {"title": "title"}}]
+    }
+    assert project(response, True) == response
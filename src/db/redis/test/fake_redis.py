@@ -0,0 +1,65 @@
+"""In-memory stand-in for the Redis commands that the cache uses."""
+from typing import Any, Dict, List, Optional
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self.redis = redis
+        self.commands: List[tuple] = []
+
+    def setex(self, key: str, ttl: int, value: bytes) -> None:
+        self.commands.append(("setex", key, ttl, value))
+
+    def set(self, key: str, value: str, nx: bool = False, ex: int = 0) -> None:
+        self.commands.append(("set", key, value, nx))
+
+    def eval(self, script: str, num_keys: int, key: str, token: str) -> None:
+        self.commands.append(("eval", key, token))
+
+    def execute(self) -> List[Any]:
+        self.redis.num_round_trips += 1
+        results: List[Any] = []
+        for command in self.commands:
+            if command[0] == "setex":
+                self.redis.data[command[1]] = command[3]
+                results.append(True)
+            elif command[0] == "set":
+                _, key, value, nx = command
+                if nx and key in self.redis.data:
+                    results.append(None)
+                else:
+                    self.redis.data[key] = value
+                    results.append(True)
+            else:
+                _, key, token = command
+                if self.redis.data.get(key) == token:
+                    del self.redis.data[key]
+                    results.append(1)
+                else:
+                    results.append(0)
+        return results
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.data: Dict[str, Any] = {}
+        self.num_round_trips = 0
+
+    def setex(self, key: str, ttl: int, value: bytes) -> None:
+        self.num_round_trips += 1
+        self.data[key] = value
+
+    def get(self, key: str) -> Optional[bytes]:
+        self.num_round_trips += 1
+        return self.data.get(key)
+
+    def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        self.num_round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    def exists(self, key: str) -> int:
+        self.num_round_trips += 1
+        return int(key in self.data)
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
@@ -0,0 +1,120 @@
+"""Tests for redis_caching.py"""
+import pytest
+
+from db.redis import redis_caching
+from db.redis.redis_caching import (
+    cache_data,
+    cache_data_many,
+    get_cached_data,
+    get_cached_data_many,
+    get_stale_cache_entry,
+    LocalCache,
+)
+from db.redis.test.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def fake_redis(monkeypatch) -> FakeRedis:
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(redis_caching, "redis_conn", fake_redis)
+    redis_caching.local_cache.clear()
+    yield fake_redis
+    redis_caching.local_cache.clear()
+
+
+def test_local_cache_evicts_least_recently_used():
+    local_cache = LocalCache(max_num_entries=2, max_num_bytes=100)
+    local_cache.set("a", 1, size=10, ttl_seconds=60)
+    local_cache.set("b", 2, size=10, ttl_seconds=60)
+    local_cache.get("a")
+    local_cache.set("c", 3, size=10, ttl_seconds=60)
+    assert local_cache.get("b") == (False, None)
+    assert local_cache.get("a") == (True, 1)
+
+    # too big for the remaining space, so "a" and "c" are both evicted.
+    local_cache.set("d", 4, size=95, ttl_seconds=60)
+    assert len(local_cache) == 1
+    assert local_cache.get("d") == (True, 4)
+
+
+def test_local_cache_expires_entries():
+    local_cache = LocalCache(max_num_entries=2, max_num_bytes=100)
+    local_cache.set("a", 1, size=10, ttl_seconds=0)
+    assert local_cache.get("a") == (False, None)
+    assert len(local_cache) == 0
+
+
+def test_get_cached_data_only_reads_redis_once_per_key(fake_redis):
+    cache_data("get_channel_metadata", {"channel_name": "a"}, {"title": "a"})
+    redis_caching.local_cache.clear()
+
+    for _ in range(3):
+        assert get_cached_data("get_channel_metadata", {"channel_name": "a"}) == {
+            "title": "a"
+        }
+        assert get_cached_data("get_channel_metadata", {"channel_name": "b"}) is None
+
+    # 1 write, then 1 read each for the hit and the (negatively cached) miss.
+    assert fake_redis.num_round_trips == 3
+
+
+def test_cache_data_replaces_negatively_cached_miss(fake_redis):
+    assert get_cached_data("get_channel_metadata", {"channel_name": "a"}) is None
+    cache_data("get_channel_metadata", {"channel_name": "a"}, {"title": "a"})
+    assert get_cached_data("get_channel_metadata", {"channel_name": "a"}) == {
+        "title": "a"
+    }
+
+
+def test_get_and_cache_data_many_batch_round_trips(fake_redis):
+    params_list = [{"id": f"video-{i}"} for i in range(10)]
+    cache_data_many(
+        "get_video_details_from_id",
+        params_list=params_list[:5],
+        data_list=[{"items": [i]} for i in range(5)],
+    )
+    redis_caching.local_cache.clear()
+
+    results = get_cached_data_many("get_video_details_from_id", params_list)
+
+    assert results == [{"items": [i]} for i in range(5)] + [None] * 5
+    assert fake_redis.num_round_trips == 2
+
+
+def test_expired_data_is_a_miss_but_can_be_revalidated(fake_redis, monkeypatch):
+    monkeypatch.setitem(
+        redis_caching.FUNCTION_NAME_TO_CACHE_TIME_SECONDS, "get_video_details", 0
+    )
+    cache_data("get_video_details", {"id": "a"}, {"items": ["a"]}, etag="etag-a")
+    cache_data("get_channel_metadata", {"channel_name": "a"}, {"title": "a"})
+    redis_caching.local_cache.clear()
+
+    assert get_cached_data("get_video_details", {"id": "a"}) is None
+    assert get_cached_data("get_channel_metadata", {"channel_name": "a"}) == {
+        "title": "a"
+    }
+    stale_cache_entry = get_stale_cache_entry("get_video_details", {"id": "a"})
+    assert stale_cache_entry.data == {"items": ["a"]}
+    assert stale_cache_entry.etag == "etag-a"
+    assert not stale_cache_entry.is_fresh()
+
+
+def test_cache_data_stores_only_projected_fields(fake_redis):
+    response = {
+        "etag": "etag-a",
+        "pageInfo": {"totalResults": 1},
+        "items": [
+            {
+                "id": "a",
+                "snippet": {"title": "title", "thumbnails": {"default": {}}},
+                "statistics": {"viewCount": "1"},
+            }
+        ],
+    }
+    cache_data("get_video_details_from_id", {"id": "a"}, response)
+    redis_caching.local_cache.clear()
+
+    cached_response = get_cached_data("get_video_details_from_id", {"id": "a"})
+    assert "thumbnails" not in cached_response["items"][0]["snippet"]
+    assert cached_response["items"][0]["snippet"]["title"] == "title"
+    assert cached_response["items"][0]["statistics"] == {"viewCount": "1"}
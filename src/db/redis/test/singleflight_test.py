@@ -0,0 +1,146 @@
+"""Tests for singleflight.py"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pytest
+
+from db.redis import redis_caching
+from db.redis.redis_caching import cache_data, cache_data_many, cache_key
+from db.redis.singleflight import (
+    acquire_leases,
+    get_or_fetch,
+    get_or_fetch_async,
+    get_or_fetch_many,
+    LEASE_KEY_PREFIX,
+    release_leases,
+)
+from db.redis.test.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def fake_redis(monkeypatch) -> FakeRedis:
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(redis_caching, "redis_conn", fake_redis)
+    redis_caching.local_cache.clear()
+    yield fake_redis
+    redis_caching.local_cache.clear()
+
+
+def test_get_or_fetch_coalesces_concurrent_misses(fake_redis):
+    num_fetches: List[int] = [0]
+    params = {"channel_name": "a"}
+
+    def fetch() -> Dict:
+        num_fetches[0] += 1
+        time.sleep(0.05)
+        cache_data("get_channel_metadata", params, {"title": "a"})
+        return {"title": "a"}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda _: get_or_fetch("get_channel_metadata", params, fetch), range(8)
+            )
+        )
+
+    assert results == [{"title": "a"}] * 8
+    assert num_fetches[0] == 1
+    # the lease is released once the fetch is done.
+    assert not any(key.startswith(LEASE_KEY_PREFIX) for key in fake_redis.data)
+
+
+def test_get_or_fetch_waits_for_lease_held_by_another_process(fake_redis):
+    params = {"channel_name": "a"}
+    key = cache_key("get_channel_metadata", params)
+    [token] = acquire_leases([key])
+
+    def other_process_fetch() -> None:
+        time.sleep(0.05)
+        cache_data("get_channel_metadata", params, {"title": "a"})
+        redis_caching.local_cache.clear()
+        release_leases([key], [token])
+
+    threading.Thread(target=other_process_fetch).start()
+
+    def fetch() -> Dict:
+        raise AssertionError("should have waited for the other process")
+
+    assert get_or_fetch("get_channel_metadata", params, fetch) == {"title": "a"}
+
+
+def test_get_or_fetch_many_only_fetches_unleased_misses(fake_redis):
+    params_list = [{"id": f"video-{i}"} for i in range(4)]
+    cache_data_many(
+        "get_video_details", params_list=params_list[:1], data_list=[{"id": 0}]
+    )
+    # another process is fetching video-1, and fails to.
+    [token] = acquire_leases([cache_key("get_video_details", params_list[1])])
+    threading.Timer(
+        0.05,
+        lambda: release_leases(
+            [cache_key("get_video_details", params_list[1])], [token]
+        ),
+    ).start()
+    fetched_params_lists: List[List[Dict]] = []
+
+    def fetch_many(params_list: List[Dict]) -> List[Optional[Dict]]:
+        fetched_params_lists.append(params_list)
+        cache_data_many(
+            "get_video_details",
+            params_list=params_list,
+            data_list=[{"id": params["id"]} for params in params_list],
+        )
+        return [{"id": params["id"]} for params in params_list]
+
+    results = get_or_fetch_many("get_video_details", params_list, fetch_many)
+
+    assert results == [{"id": 0}] + [{"id": f"video-{i}"} for i in range(1, 4)]
+    assert fetched_params_lists == [params_list[2:], params_list[1:2]]
+
+
+def test_get_or_fetch_async_coalesces_concurrent_misses(fake_redis):
+    num_fetches: List[int] = [0]
+    params = {"show_id": "a"}
+
+    async def fetch() -> Dict:
+        num_fetches[0] += 1
+        await asyncio.sleep(0.01)
+        cache_data("get_podcast_show_metadata", params, {"name": "a"})
+        return {"name": "a"}
+
+    async def get_all() -> List[Dict]:
+        return await asyncio.gather(
+            *[
+                get_or_fetch_async("get_podcast_show_metadata", params, fetch)
+                for _ in range(5)
+            ]
+        )
+
+    assert asyncio.run(get_all()) == [{"name": "a"}] * 5
+    assert num_fetches[0] == 1
+
+
+def test_get_or_fetch_async_calls_redis_off_the_event_loop(monkeypatch, fake_redis):
+    redis_thread_ids: List[int] = []
+    for method_name in ["mget", "exists", "pipeline"]:
+        method = getattr(fake_redis, method_name)
+
+        def record_thread(*args, method=method, **kwargs):
+            redis_thread_ids.append(threading.get_ident())
+            return method(*args, **kwargs)
+
+        monkeypatch.setattr(fake_redis, method_name, record_thread)
+    params = {"show_id": "a"}
+
+    async def fetch() -> Dict:
+        return {"name": "a"}
+
+    async def get() -> Dict:
+        return await get_or_fetch_async("get_podcast_show_metadata", params, fetch)
+
+    assert asyncio.run(get()) == {"name": "a"}
+    assert redis_thread_ids
+    assert threading.get_ident() not in redis_thread_ids
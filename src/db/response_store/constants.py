@@ -0,0 +1,19 @@
+import os
+
+current_file_directory = os.path.dirname(os.path.abspath(__file__))
+
+# "off": every request goes to the API.
+# "record": every request goes to the API, and its response is stored.
+# "replay": every request is answered from the store, without the network.
+RESPONSE_STORE_MODES = {"off", "record", "replay"}
+RESPONSE_STORE_MODE = os.getenv("RESPONSE_STORE_MODE", "off")
+
+# point this at a copy of the store to replay a snapshot.
+RESPONSE_STORE_DIRECTORY = os.getenv(
+    "RESPONSE_STORE_DIRECTORY", os.path.join(current_file_directory, "responses")
+)
+RESPONSE_STORE_INDEX_NAME = "index.jsonl"
+
+# start a new segment once the current one reaches this size.
+MAX_SEGMENT_NUM_BYTES = 64 * 1024 * 1024
+SEGMENT_COMPRESSION_LEVEL = 6
@@ -0,0 +1,216 @@
+"""On-disk store of raw API responses, so that syncs can be recorded once and
+then replayed offline (like an HTTP cassette).
+
+Responses are appended to gzip-compressed JSONL segment files. Each response
+is its own gzip member, so that it can be read back from its offset without
+decompressing the rest of the segment. Responses are content-addressed (by the
+hash of their JSON), so a response that comes back for many requests is only
+stored once. The index, also JSONL, maps the hash of each request (API,
+endpoint and params) to where its response is stored. Both files are only
+appended to, so recording never rewrites what's already on disk.
+
+The store is used according to `RESPONSE_STORE_MODE` (see `constants`).
+Responses are only recorded for requests that reach the API, so record with a
+cold Redis cache to capture a whole sync.
+"""
+from dataclasses import dataclass
+import gzip
+import hashlib
+import os
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+import uuid
+
+import orjson
+
+from db.response_store.constants import (
+    MAX_SEGMENT_NUM_BYTES,
+    RESPONSE_STORE_DIRECTORY,
+    RESPONSE_STORE_INDEX_NAME,
+    RESPONSE_STORE_MODE,
+    RESPONSE_STORE_MODES,
+    SEGMENT_COMPRESSION_LEVEL,
+)
+
+if RESPONSE_STORE_MODE not in RESPONSE_STORE_MODES:
+    raise ValueError(
+        f"RESPONSE_STORE_MODE must be one of {sorted(RESPONSE_STORE_MODES)}, "
+        f"got {RESPONSE_STORE_MODE!r}."
+    )
+
+
+class ResponseNotRecorded(Exception):
+    """Raised when replaying a request whose response was never recorded."""
+
+
+@dataclass
+class ResponseLocation:
+    segment_name: str
+    offset: int
+    num_bytes: int
+
+
+def hash_json(value: Dict) -> str:
+    return hashlib.sha256(orjson.dumps(value, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def get_request_key(api: str, endpoint: str, params: Optional[Dict]) -> str:
+    return hash_json({"api": api, "endpoint": endpoint, "params": params or {}})
+
+
+class ResponseStore:
+    """Thread-safe. Each process appends to its own segment files, and
+    reloads the index to pick up what other processes have recorded."""
+
+    def __init__(
+        self, directory: str, max_segment_num_bytes: int = MAX_SEGMENT_NUM_BYTES
+    ) -> None:
+        self.directory = directory
+        self.index_path = os.path.join(directory, RESPONSE_STORE_INDEX_NAME)
+        self.max_segment_num_bytes = max_segment_num_bytes
+        self.lock = threading.Lock()
+        self.request_key_to_content_hash: Dict[str, str] = {}
+        self.content_hash_to_location: Dict[str, ResponseLocation] = {}
+        # how much of the index file has been loaded.
+        self.index_offset = 0
+        self.segment_name: Optional[str] = None
+        self.segment_num_bytes = 0
+
+    def __len__(self) -> int:
+        with self.lock:
+            self.load_index()
+            return len(self.request_key_to_content_hash)
+
+    def load_index(self) -> None:
+        """Load the index entries appended since the last load."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self.index_offset)
+            lines = f.read().split(b"\n")
+        # the last line is either empty or still being written.
+        for line in lines[:-1]:
+            self.index_offset += len(line) + 1
+            entry = orjson.loads(line)
+            self.request_key_to_content_hash[entry["request_key"]] = entry[
+                "content_hash"
+            ]
+            self.content_hash_to_location[entry["content_hash"]] = ResponseLocation(
+                segment_name=entry["segment_name"],
+                offset=entry["offset"],
+                num_bytes=entry["num_bytes"],
+            )
+
+    def get_location(self, request_key: str) -> Optional[ResponseLocation]:
+        with self.lock:
+            if request_key not in self.request_key_to_content_hash:
+                self.load_index()
+            content_hash = self.request_key_to_content_hash.get(request_key)
+            if content_hash is None:
+                return None
+            return self.content_hash_to_location[content_hash]
+
+    def get(self, api: str, endpoint: str, params: Optional[Dict]) -> Optional[Dict]:
+        """Get the stored response to a request, if any."""
+        location = self.get_location(get_request_key(api, endpoint, params))
+        if location is None:
+            return None
+        with open(os.path.join(self.directory, location.segment_name), "rb") as f:
+            f.seek(location.offset)
+            member = f.read(location.num_bytes)
+        return orjson.loads(gzip.decompress(member))["response"]
+
+    def write_response(self, content_hash: str, response: Dict) -> ResponseLocation:
+        """Append a response to the current segment, starting a new segment
+        if there's none yet or if the current one is full."""
+        if (
+            self.segment_name is None
+            or self.segment_num_bytes >= self.max_segment_num_bytes
+        ):
+            self.segment_name = f"segment-{os.getpid()}-{uuid.uuid4().hex}.jsonl.gz"
+            self.segment_num_bytes = 0
+        member = gzip.compress(
+            orjson.dumps({"content_hash": content_hash, "response": response}) + b"\n",
+            compresslevel=SEGMENT_COMPRESSION_LEVEL,
+        )
+        with open(os.path.join(self.directory, self.segment_name), "ab") as f:
+            f.write(member)
+        location = ResponseLocation(
+            segment_name=self.segment_name,
+            offset=self.segment_num_bytes,
+            num_bytes=len(member),
+        )
+        self.segment_num_bytes += len(member)
+        return location
+
+    def put(
+        self, api: str, endpoint: str, params: Optional[Dict], response: Dict
+    ) -> None:
+        """Store the response to a request. The response is only written if
+        the same response isn't stored already."""
+        request_key = get_request_key(api, endpoint, params)
+        content_hash = hash_json(response)
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            self.load_index()
+            if self.request_key_to_content_hash.get(request_key) == content_hash:
+                return
+            location = self.content_hash_to_location.get(content_hash)
+            if location is None:
+                location = self.write_response(content_hash, response)
+            entry = {
+                "request_key": request_key,
+                "api": api,
+                "endpoint": endpoint,
+                "params": params or {},
+                "content_hash": content_hash,
+                "segment_name": location.segment_name,
+                "offset": location.offset,
+                "num_bytes": location.num_bytes,
+            }
+            # appending a single line at a time, so that concurrent writers
+            # don't interleave their entries.
+            with open(self.index_path, "ab") as f:
+                f.write(orjson.dumps(entry) + b"\n")
+            self.load_index()
+
+
+RESPONSE_STORE = ResponseStore(directory=RESPONSE_STORE_DIRECTORY)
+
+
+def get_replayed_response(api: str, endpoint: str, params: Optional[Dict]) -> Dict:
+    response = RESPONSE_STORE.get(api, endpoint, params)
+    if response is None:
+        raise ResponseNotRecorded(
+            f"No recorded {api} response for {endpoint} with params {params}."
+        )
+    return response
+
+
+def fetch_with_response_store(
+    api: str, endpoint: str, params: Optional[Dict], fetch: Callable[[], Dict]
+) -> Dict:
+    """Get the response to a request from the API or from the store,
+    depending on `RESPONSE_STORE_MODE`."""
+    if RESPONSE_STORE_MODE == "replay":
+        return get_replayed_response(api, endpoint, params)
+    response = fetch()
+    if RESPONSE_STORE_MODE == "record":
+        RESPONSE_STORE.put(api, endpoint, params, response)
+    return response
+
+
+async def fetch_with_response_store_async(
+    api: str,
+    endpoint: str,
+    params: Optional[Dict],
+    fetch: Callable[[], Awaitable[Dict]],
+) -> Dict:
+    """Async variant of `fetch_with_response_store`. The store is on local
+    disk, so it's read and written without leaving the event loop."""
+    if RESPONSE_STORE_MODE == "replay":
+        return get_replayed_response(api, endpoint, params)
+    response = await fetch()
+    if RESPONSE_STORE_MODE == "record":
+        RESPONSE_STORE.put(api, endpoint, params, response)
+    return response
@@ -0,0 +1,98 @@
+"""Tests for methods in response_store.py"""
+import asyncio
+import os
+from typing import Dict
+
+import pytest
+
+from db.response_store import response_store as response_store_module
+from db.response_store.response_store import (
+    fetch_with_response_store,
+    fetch_with_response_store_async,
+    ResponseNotRecorded,
+    ResponseStore,
+)
+
+ENDPOINT = "https://api.spotify.com/v1/shows/show-id/episodes"
+
+
+def make_response(i: int) -> Dict:
+    return {"items": [{"id": f"episode-{i}", "name": f"Episode {i}"}], "next": None}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch) -> ResponseStore:
+    store = ResponseStore(directory=str(tmp_path))
+    monkeypatch.setattr(response_store_module, "RESPONSE_STORE", store)
+    return store
+
+
+def test_put_and_get_response(store):
+    store.put("spotify", ENDPOINT, {"offset": 0}, make_response(0))
+    store.put("spotify", ENDPOINT, {"offset": 50}, make_response(1))
+
+    assert store.get("spotify", ENDPOINT, {"offset": 0}) == make_response(0)
+    assert store.get("spotify", ENDPOINT, {"offset": 50}) == make_response(1)
+    assert store.get("spotify", ENDPOINT, {"offset": 100}) is None
+    assert store.get("youtube", ENDPOINT, {"offset": 0}) is None
+
+
+def test_identical_responses_are_stored_once(store, tmp_path):
+    store.put("spotify", ENDPOINT, {"offset": 0}, make_response(0))
+    segment_paths = [path for path in tmp_path.iterdir() if path.suffix == ".gz"]
+    segment_num_bytes = os.path.getsize(segment_paths[0])
+
+    store.put("spotify", ENDPOINT, {"offset": 0, "limit": 50}, make_response(0))
+    assert len(store) == 2
+    assert os.path.getsize(segment_paths[0]) == segment_num_bytes
+
+
+def test_store_is_reloaded_from_disk(tmp_path):
+    store = ResponseStore(directory=str(tmp_path), max_segment_num_bytes=1)
+    for i in range(3):
+        store.put("spotify", ENDPOINT, {"offset": i}, make_response(i))
+    # each response went to a new segment.
+    assert len([path for path in tmp_path.iterdir() if path.suffix == ".gz"]) == 3
+
+    reloaded_store = ResponseStore(directory=str(tmp_path))
+    assert len(reloaded_store) == 3
+    for i in range(3):
+        assert reloaded_store.get("spotify", ENDPOINT, {"offset": i}) == (
+            make_response(i)
+        )
+
+
+def test_fetch_with_response_store_records_and_replays(store, monkeypatch):
+    monkeypatch.setattr(response_store_module, "RESPONSE_STORE_MODE", "record")
+    response = fetch_with_response_store(
+        "spotify", ENDPOINT, None, fetch=lambda: make_response(0)
+    )
+    assert response == make_response(0)
+
+    def fetch() -> Dict:
+        raise AssertionError("Replaying shouldn't send requests.")
+
+    monkeypatch.setattr(response_store_module, "RESPONSE_STORE_MODE", "replay")
+    assert fetch_with_response_store("spotify", ENDPOINT, None, fetch) == (
+        make_response(0)
+    )
+    with pytest.raises(ResponseNotRecorded):
+        fetch_with_response_store("spotify", ENDPOINT, {"offset": 50}, fetch)
+
+
+def test_fetch_with_response_store_async_records(store, monkeypatch):
+    monkeypatch.setattr(response_store_module, "RESPONSE_STORE_MODE", "record")
+
+    async def fetch() -> Dict:
+        return make_response(0)
+
+    asyncio.run(
+        fetch_with_response_store_async("spotify", ENDPOINT, {"offset": 0}, fetch)
+    )
+    assert store.get("spotify", ENDPOINT, {"offset": 0}) == make_response(0)
+
+
+def test_fetch_with_response_store_is_skipped_when_off(store):
+    assert response_store_module.RESPONSE_STORE_MODE == "off"
+    fetch_with_response_store("spotify", ENDPOINT, None, lambda: make_response(0))
+    assert len(store) == 0
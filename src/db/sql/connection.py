@@ -0,0 +1,63 @@
+"""Manages connections to the SQLite DB.
+
+`sqlite3` connections can't be shared across threads, so each thread gets its
+own connection to each DB, which is opened the first time the thread needs it.
+Every connection is configured with the PRAGMAs in `SQLITE_PRAGMAS` (WAL mode,
+etc.), so readers and writers in different threads and processes don't block
+each other.
+
+WAL mode details: https://www.sqlite.org/wal.html
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from db.sql.constants import SQLITE_BUSY_TIMEOUT_SECONDS, SQLITE_PRAGMAS
+
+current_file_directory = os.path.dirname(os.path.abspath(__file__))
+
+SQLITE_DB_NAME = "data.db"
+SQLITE_DB_PATH = os.getenv(
+    "SQLITE_DB_PATH", os.path.join(current_file_directory, SQLITE_DB_NAME)
+)
+
+thread_local = threading.local()
+
+
+def configure_connection(conn: sqlite3.Connection) -> None:
+    for pragma, value in SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma}={value}")
+
+
+def get_thread_connections() -> Dict[str, sqlite3.Connection]:
+    if not hasattr(thread_local, "connections"):
+        thread_local.connections = {}
+    return thread_local.connections
+
+
+def set_db_path(db_path: str) -> None:
+    """Point the connections opened from now on at another DB (e.g., a
+    scratch DB for benchmarks)."""
+    global SQLITE_DB_PATH
+    SQLITE_DB_PATH = db_path
+
+
+def get_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Get the current thread's connection to the DB (`SQLITE_DB_PATH` by
+    default), opening it if needed."""
+    db_path = db_path or SQLITE_DB_PATH
+    connections = get_thread_connections()
+    if db_path not in connections:
+        conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+        configure_connection(conn)
+        connections[db_path] = conn
+    return connections[db_path]
+
+
+def close_connections() -> None:
+    """Close all of the current thread's connections."""
+    connections = get_thread_connections()
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
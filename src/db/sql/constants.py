@@ -26,6 +26,12 @@ TABLE_NAME_TO_SCHEMA_MAP = {
         comment_count INTEGER,
         synctimestamp TEXT
     """,
+    "youtube_sync_state": """
+        channel_id TEXT PRIMARY KEY,
+        latest_video_id TEXT,  -- most recently published video that was synced
+        latest_published_at TEXT,
+        synctimestamp TEXT
+    """,
     "spotify_show": """
         id TEXT PRIMARY KEY,
         available_markets TEXT,  -- Comma-separated list of markets
@@ -83,16 +89,75 @@ TABLE_NAME_TO_SCHEMA_MAP = {
         youtube_episode_channel_id TEXT,
         youtube_episode_name TEXT,
         spotify_episode_id TEXT,
-        spotify_episode_show_id TEXT,
-        spotify_episode_show_name TEXT,
+        spotify_episode_channel_id TEXT,
+        spotify_episode_name TEXT,
+        match_confidence REAL,  -- between 0 and 1
         last_updated_timestamp TEXT
-    """
+    """,
+    "mapping_sync_state": """
+        name TEXT PRIMARY KEY,
+        last_synctimestamp TEXT,  -- latest synctimestamp of the mapped data
+        synctimestamp TEXT
+    """,
+    "episode_signatures": """
+        signature_id TEXT PRIMARY KEY,  -- "<integration>:<episode_id>"
+        integration TEXT,
+        episode_id TEXT,
+        channel_id TEXT,
+        channel_name TEXT,
+        signature BLOB,  -- MinHash signature, as uint32 bytes
+        synctimestamp TEXT
+    """,
+    "proposed_channel_mappings": """
+        youtube_channel_name TEXT PRIMARY KEY,
+        youtube_channel_id TEXT,
+        spotify_show_id TEXT,
+        spotify_show_name TEXT,
+        num_episode_pairs INTEGER,
+        synctimestamp TEXT
+    """,
 }
 
 
 TABLE_NAME_TO_KEYS_MAP = {
     "channels": {"primary": ["channel_id"], "foreign": None},
     "videos": {"primary": ["video_id"], "foreign": ["channel_id"]},
+    "youtube_channels": {"primary": ["channel_id"], "foreign": None},
+    "youtube_videos": {"primary": ["video_id"], "foreign": ["channel_id"]},
+    "youtube_sync_state": {"primary": ["channel_id"], "foreign": None},
     "spotify_show": {"primary": ["id"], "foreign": ["episode_ids"]},
     "spotify_episode": {"primary": ["id"], "foreign": ["show_id"]},
+    "mapped_channels": {"primary": ["consolidated_name"], "foreign": None},
+    "mapped_episodes": {
+        "primary": ["consolidated_name"],
+        "foreign": ["mapped_channel_name"],
+    },
+    "episode_signatures": {"primary": ["signature_id"], "foreign": None},
+    "mapping_sync_state": {"primary": ["name"], "foreign": None},
+    "proposed_channel_mappings": {
+        "primary": ["youtube_channel_name"],
+        "foreign": None,
+    },
 }
+
+# columns added to a table's schema after the table was first created. Tables
+# in existing DBs don't get them from `CREATE TABLE IF NOT EXISTS`, so they're
+# added with `ALTER TABLE` before writing (see `helper.add_missing_columns`).
+TABLE_NAME_TO_ADDED_COLUMNS = {"mapped_episodes": {"match_confidence": "REAL"}}
+
+
+# PRAGMAs set on every connection. WAL mode lets readers (e.g., the Django
+# API) keep reading while the sync writes, and with WAL, synchronous=NORMAL
+# is still safe from corruption while skipping an fsync per transaction.
+# https://www.sqlite.org/pragma.html
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,  # bytes
+    "cache_size": -64 * 1024,  # negative values are in KiB, so 64MB
+    "temp_store": "MEMORY",
+}
+
+# how long a connection waits for a lock held by another connection before
+# raising "database is locked".
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
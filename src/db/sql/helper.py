@@ -1,21 +1,19 @@
 import sqlite3
-import os
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
 import pandas as pd
 
-from db.sql.constants import TABLE_NAME_TO_KEYS_MAP, TABLE_NAME_TO_SCHEMA_MAP
+from db.sql.connection import get_connection
+from db.sql.constants import (
+    TABLE_NAME_TO_ADDED_COLUMNS,
+    TABLE_NAME_TO_KEYS_MAP,
+    TABLE_NAME_TO_SCHEMA_MAP,
+)
 from lib.log.logger import Logger
+from lib.metrics import METRICS
 
-current_file_directory = os.path.dirname(os.path.abspath(__file__))
-
-SQLITE_DB_NAME = "data.db"
-SQLITE_DB_PATH = os.path.join(current_file_directory, SQLITE_DB_NAME)
 TEST_DB_NAME = "test-data.db"
 
-conn = sqlite3.connect(SQLITE_DB_PATH)
-cursor = conn.cursor()
-
 test_conn = sqlite3.connect(TEST_DB_NAME)
 test_cursor = test_conn.cursor()
 
@@ -46,6 +44,28 @@ def check_if_table_exists(cursor: sqlite3.Cursor, table_name: str) -> bool:
     return result is not None
 
 
+def get_table_columns(cursor: sqlite3.Cursor, table_name: str) -> List[str]:
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def add_missing_columns(
+    conn: sqlite3.Connection, cursor: sqlite3.Cursor, table_name: str
+) -> None:
+    """Add the columns in `TABLE_NAME_TO_ADDED_COLUMNS` that an existing
+    table doesn't have yet."""
+    added_columns = TABLE_NAME_TO_ADDED_COLUMNS.get(table_name)
+    if not added_columns:
+        return
+    table_columns = set(get_table_columns(cursor=cursor, table_name=table_name))
+    for column, column_type in added_columns.items():
+        if column in table_columns:
+            continue
+        logger.info(f"Adding column {column} to {table_name}.")
+        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {column_type}")
+    conn.commit()
+
+
 def write_to_database(
     conn: sqlite3.Connection, cursor: sqlite3.Cursor, table_name: str, data: Dict
 ) -> None:
@@ -57,9 +77,98 @@ def write_to_database(
     conn.commit()
 
 
-def get_column(table_name: str, column: str) -> List:
+def get_primary_key(table_name: str) -> str:
+    return TABLE_NAME_TO_KEYS_MAP[table_name]["primary"][0]
+
+
+def generate_upsert_statement(table_name: str, columns: List[str]) -> str:
+    """Generate an `INSERT ... ON CONFLICT DO UPDATE` statement, which inserts
+    a row or, if a row with the same PK already exists, updates it."""
+    table_pk = get_primary_key(table_name)
+    placeholders = ", ".join(["?"] * len(columns))
+    update_columns = [column for column in columns if column != table_pk]
+    on_conflict = (
+        "DO UPDATE SET "
+        + ", ".join(f"{column}=excluded.{column}" for column in update_columns)
+        if update_columns
+        else "DO NOTHING"
+    )
+    return f"""
+        INSERT INTO {table_name} ({", ".join(columns)})
+        VALUES ({placeholders})
+        ON CONFLICT({table_pk}) {on_conflict}
+    """
+
+
+def bulk_upsert(
+    conn: sqlite3.Connection,
+    cursor: sqlite3.Cursor,
+    table_name: str,
+    rows: List[Dict],
+) -> int:
+    """Upsert a batch of rows with a single `executemany` in a single
+    transaction.
+
+    Assumes that each row is a dict with the same keys, corresponding to the
+    data for one row (e.g., a flattened dataclass). Rows without a PK are
+    skipped. Returns the number of rows written.
+    """
+    table_pk = get_primary_key(table_name)
+    rows_with_pk = [row for row in rows if row.get(table_pk) is not None]
+    if len(rows_with_pk) < len(rows):
+        logger.warning(
+            f"Skipping {len(rows) - len(rows_with_pk)} rows for {table_name}: "
+            f"data lacks {table_pk} PK."
+        )
+    if not rows_with_pk:
+        return 0
+
+    columns = list(rows_with_pk[0].keys())
+    upsert_statement = generate_upsert_statement(table_name, columns)
+    values = [tuple(row[column] for column in columns) for row in rows_with_pk]
+    with conn:  # commits once at the end, or rolls back on error.
+        cursor.executemany(upsert_statement, values)
+    return len(rows_with_pk)
+
+
+def upsert_rows(table_name: str, rows: List[Dict]) -> int:
+    """Upsert rows into a table in the DB, creating the table if needed."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    if not check_if_table_exists(cursor=cursor, table_name=table_name):
+        create_table(conn=conn, cursor=cursor, table_name=table_name)
+    else:
+        add_missing_columns(conn=conn, cursor=cursor, table_name=table_name)
+    with METRICS.time("sqlite_write_duration_seconds", table=table_name):
+        num_rows = bulk_upsert(
+            conn=conn, cursor=cursor, table_name=table_name, rows=rows
+        )
+    METRICS.increment("sqlite_rows_written_total", num_rows, table=table_name)
+    return num_rows
+
+
+def get_row_by_primary_key(table_name: str, pk_value: str) -> Optional[Dict]:
+    """Get the row with the given PK as a dict, or None if there isn't one."""
+    cursor = get_connection().cursor()
+    if not check_if_table_exists(cursor=cursor, table_name=table_name):
+        return None
+    table_pk = get_primary_key(table_name)
+    cursor.execute(f"SELECT * FROM {table_name} WHERE {table_pk}=?", (pk_value,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    columns = [description[0] for description in cursor.description]
+    return dict(zip(columns, row))
+
+
+def get_column(table_name: str, column: str, where: Optional[Dict] = None) -> List:
+    """Get all the values of a column, optionally only for the rows where the
+    columns in `where` equal the given values."""
     query = f"SELECT {column} FROM {table_name}"
-    cursor.execute(query)
+    if where:
+        query += " WHERE " + " AND ".join(f"{key}=?" for key in where.keys())
+    cursor = get_connection().cursor()
+    cursor.execute(query, tuple(where.values()) if where else ())
     results = cursor.fetchall()
     return [row[0] for row in results]
 
@@ -83,12 +192,86 @@ def single_row_insertion_is_valid(row_data: Dict, table_name: str) -> bool:
     return row_pk_value not in col  # only insert if PK is unique.
 
 
-def get_all_table_results_as_df(table_name: str) -> pd.DataFrame:
+def generate_select_query(
+    table_name: str,
+    columns: Optional[List[str]] = None,
+    synced_after: Optional[str] = None,
+    synced_before: Optional[str] = None,
+    where_in: Optional[Dict[str, Sequence]] = None,
+) -> Tuple[str, List]:
+    """Generate a `SELECT` query and its parameters.
+
+    Only selects the given columns (all of them if None), for the rows with
+    `synced_after <= synctimestamp < synced_before` and, for each column in
+    `where_in`, whose value is one of the given values.
+    """
+    conditions: List[str] = []
+    params: List = []
+    if synced_after is not None:
+        conditions.append("synctimestamp >= ?")
+        params.append(synced_after)
+    if synced_before is not None:
+        conditions.append("synctimestamp < ?")
+        params.append(synced_before)
+    for column, values in (where_in or {}).items():
+        conditions.append(f"{column} IN ({', '.join(['?'] * len(values))})")
+        params.extend(values)
+    query = f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, params
+
+
+def load_table(
+    table_name: str,
+    columns: Optional[List[str]] = None,
+    synced_after: Optional[str] = None,
+    synced_before: Optional[str] = None,
+    where_in: Optional[Dict[str, Sequence]] = None,
+) -> pd.DataFrame:
+    """Load the rows of a table as a df, with only the given columns and rows
+    (see `generate_select_query`). Returns an empty df if the table can't be
+    read (e.g., it doesn't exist yet)."""
+    query, params = generate_select_query(
+        table_name=table_name,
+        columns=columns,
+        synced_after=synced_after,
+        synced_before=synced_before,
+        where_in=where_in,
+    )
     try:
-        query = f"SELECT * FROM {table_name}"
-        df = pd.read_sql_query(query, conn)
-        return df
+        return pd.read_sql_query(query, get_connection(), params=params)
     except Exception as e:
-        logger.info(f"Error getting all table results as df: {e}")
+        logger.info(f"Error loading {table_name} as df: {e}")
         logger.info("Returning empty df.")
         return pd.DataFrame()
+
+
+def iter_table_chunks(
+    table_name: str,
+    chunksize: int,
+    columns: Optional[List[str]] = None,
+    synced_after: Optional[str] = None,
+    synced_before: Optional[str] = None,
+    where_in: Optional[Dict[str, Sequence]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Like `load_table`, but yields dfs of up to `chunksize` rows, so that
+    a large table can be processed in bounded memory."""
+    conn = get_connection()
+    if not check_if_table_exists(cursor=conn.cursor(), table_name=table_name):
+        return
+    query, params = generate_select_query(
+        table_name=table_name,
+        columns=columns,
+        synced_after=synced_after,
+        synced_before=synced_before,
+        where_in=where_in,
+    )
+    yield from pd.read_sql_query(query, conn, params=params, chunksize=chunksize)
+
+
+def get_all_table_results_as_df(
+    table_name: str, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Get all the rows of a table. Only loads the given columns, if any."""
+    return load_table(table_name=table_name, columns=columns)
@@ -0,0 +1,28 @@
+import threading
+from typing import List
+
+from db.sql.connection import close_connections, get_connection
+
+
+def test_get_connection_is_per_thread(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    conn = get_connection(db_path)
+    assert get_connection(db_path) is conn
+
+    other_thread_connections: List = []
+    thread = threading.Thread(
+        target=lambda: other_thread_connections.append(get_connection(db_path))
+    )
+    thread.start()
+    thread.join()
+    assert other_thread_connections[0] is not conn
+
+    close_connections()
+
+
+def test_get_connection_uses_wal_mode(tmp_path):
+    conn = get_connection(str(tmp_path / "test.db"))
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # 1 == NORMAL
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    close_connections()
@@ -1,14 +1,20 @@
 import os
+import sqlite3
 
 import pytest
 
+from db.sql import helper
 from db.sql.helper import (
+    bulk_upsert,
     check_if_table_exists,
     create_table,
+    iter_table_chunks,
+    load_table,
     test_conn,
     test_cursor,
     TEST_DB_NAME,
 )
+from db.sql.test.test_data import MOCK_CHANNEL_METADATA
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -25,3 +31,107 @@ def test_create_table(cleanup_database):
     assert (
         check_if_table_exists(cursor=test_cursor, table_name="youtube_channels") is True
     )
+
+
+def test_bulk_upsert(cleanup_database):
+    create_table(conn=test_conn, cursor=test_cursor, table_name="youtube_channels")
+    rows = [{**MOCK_CHANNEL_METADATA, "channel_id": f"channel_{i}"} for i in range(3)]
+    num_written = bulk_upsert(
+        conn=test_conn, cursor=test_cursor, table_name="youtube_channels", rows=rows
+    )
+    assert num_written == 3
+
+    # existing rows are updated and new rows are inserted.
+    updated_rows = [
+        {**MOCK_CHANNEL_METADATA, "channel_id": "channel_0", "title": "New Title"},
+        {**MOCK_CHANNEL_METADATA, "channel_id": "channel_3"},
+        {**MOCK_CHANNEL_METADATA, "channel_id": None},
+    ]
+    num_written = bulk_upsert(
+        conn=test_conn,
+        cursor=test_cursor,
+        table_name="youtube_channels",
+        rows=updated_rows,
+    )
+    assert num_written == 2
+
+    test_cursor.execute("SELECT COUNT(*) FROM youtube_channels")
+    assert test_cursor.fetchone()[0] == 4
+    test_cursor.execute(
+        "SELECT title FROM youtube_channels WHERE channel_id='channel_0'"
+    )
+    assert test_cursor.fetchone()[0] == "New Title"
+
+
+@pytest.fixture
+def videos_conn(monkeypatch, tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    cursor = conn.cursor()
+    create_table(conn=conn, cursor=cursor, table_name="youtube_videos")
+    rows = [
+        {
+            "video_id": f"video_{i}",
+            "channel_id": f"channel_{i % 2}",
+            "description": "long description",
+            "synctimestamp": f"2023-09-0{i + 1}T00:00:00Z",
+        }
+        for i in range(5)
+    ]
+    bulk_upsert(conn=conn, cursor=cursor, table_name="youtube_videos", rows=rows)
+    monkeypatch.setattr(helper, "get_connection", lambda: conn)
+    yield conn
+    conn.close()
+
+
+def test_load_table(videos_conn):
+    df = load_table(
+        table_name="youtube_videos",
+        columns=["video_id", "channel_id"],
+        synced_after="2023-09-02T00:00:00Z",
+        synced_before="2023-09-05T00:00:00Z",
+        where_in={"channel_id": ["channel_0"]},
+    )
+    assert list(df.columns) == ["video_id", "channel_id"]
+    assert list(df["video_id"]) == ["video_2"]
+
+
+def test_load_table_that_does_not_exist(videos_conn):
+    assert load_table(table_name="spotify_episode").empty
+
+
+def test_iter_table_chunks(videos_conn):
+    chunks = list(
+        iter_table_chunks(
+            table_name="youtube_videos", chunksize=2, columns=["video_id"]
+        )
+    )
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert list(iter_table_chunks(table_name="spotify_episode", chunksize=2)) == []
+
+
+def test_upsert_rows_adds_new_columns_to_existing_table(monkeypatch, tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    # the table as it was created before match_confidence was added.
+    conn.execute(
+        "CREATE TABLE mapped_episodes (consolidated_name TEXT PRIMARY KEY, "
+        "mapped_channel_name TEXT, last_updated_timestamp TEXT)"
+    )
+    monkeypatch.setattr(helper, "get_connection", lambda: conn)
+
+    num_written = helper.upsert_rows(
+        table_name="mapped_episodes",
+        rows=[
+            {
+                "consolidated_name": "episode",
+                "mapped_channel_name": "channel",
+                "match_confidence": 0.9,
+                "last_updated_timestamp": "2023-09-01T00:00:00Z",
+            }
+        ],
+    )
+
+    assert num_written == 1
+    assert conn.execute("SELECT match_confidence FROM mapped_episodes").fetchall() == [
+        (0.9,)
+    ]
+    conn.close()
@@ -0,0 +1,224 @@
+"""Async access to the Spotify API.
+
+Variant of `SpotifyClient` for fetching many shows at once. All requests share
+one pool of keep-alive connections, so they skip the TCP+TLS handshake, and
+they can be awaited concurrently.
+
+HTTPX async client docs: https://www.python-httpx.org/async/
+"""
+import asyncio
+from types import TracebackType
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple, Type
+
+import httpx
+
+from db.redis.redis_caching import cache_data
+from db.redis.singleflight import get_or_fetch_async
+from db.response_store.response_store import fetch_with_response_store_async
+from integrations.spotify import constants
+from integrations.spotify.client import (
+    get_new_episodes_from_page,
+    get_page_size,
+    raise_for_rate_limit,
+    record_response_status,
+    SPOTIFY_RATE_LIMITER,
+    SpotifyAccessToken,
+    token_data,
+    token_headers,
+)
+from lib.log.logger import Logger
+from lib.metrics import get_endpoint_label, METRICS
+from lib.sync_enrichment import METADATA_TO_HYDRATE
+
+logger = Logger(__name__)
+
+
+class AsyncSpotifyClient:
+    """Async Spotify client. Use as an async context manager so that the
+    connection pool is closed once done:
+
+    >> async with AsyncSpotifyClient() as client:
+    >>     show_metadata = await client.get_podcast_show_metadata(show_id)
+    """
+
+    def __init__(self) -> None:
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=constants.SPOTIFY_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=(
+                    constants.SPOTIFY_ASYNC_MAX_KEEPALIVE_CONNECTIONS
+                ),
+            ),
+            timeout=constants.SPOTIFY_ASYNC_TIMEOUT_SECONDS,
+        )
+        self.access_token = SpotifyAccessToken()
+        self.token_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncSpotifyClient":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.http_client.aclose()
+
+    async def get_headers(self) -> Dict[str, str]:
+        """Get the auth headers, refreshing the access token if it has
+        expired. The lock makes sure that only one refresh is in flight."""
+        async with self.token_lock:
+            if self.access_token.is_expired():
+                response = await self.http_client.post(
+                    constants.SPOTIFY_TOKEN_ENDPOINT,
+                    data=token_data,
+                    headers=token_headers,
+                )
+                self.access_token.update(response.json())
+        return {"Authorization": f"Bearer {self.access_token.token}"}
+
+    async def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
+        """Send a GET request through the shared rate limiter, which retries
+        with backoff if the request is throttled. Depending on the response
+        store mode, the response is also recorded, or is replayed from the
+        store instead of sending the request (and without an access token)."""
+
+        async def send() -> Dict:
+            headers = await self.get_headers()
+            with METRICS.time(
+                "api_request_duration_seconds",
+                api="spotify",
+                endpoint=get_endpoint_label(endpoint),
+            ):
+                response = await self.http_client.get(
+                    endpoint, headers=headers, params=params
+                )
+            record_response_status(endpoint, response.status_code)
+            raise_for_rate_limit(
+                response.status_code, response.headers.get("Retry-After")
+            )
+            # other errors (e.g., an expired token, or a show that doesn't
+            # exist) raise too, so that their bodies are never cached as data.
+            response.raise_for_status()
+            return response.json()
+
+        return await fetch_with_response_store_async(
+            api="spotify",
+            endpoint=endpoint,
+            params=params,
+            fetch=lambda: SPOTIFY_RATE_LIMITER.call_async(send),
+        )
+
+    async def get_podcast_show_metadata(self, show_id: str) -> Dict:
+        """Get the details about a given show on Spotify."""
+        params = {"show_id": show_id}
+
+        async def fetch() -> Dict:
+            endpoint = constants.PODCAST_SHOW_ENDPOINT.format(id=show_id, market="US")
+            res = await self.get(endpoint)
+            await asyncio.to_thread(
+                cache_data,
+                function_name="get_podcast_show_metadata",
+                params=params,
+                data=res,
+            )
+            return res
+
+        # only the API's response is cached, so that the sync metadata is
+        # from this sync even on a cache hit.
+        show_metadata = await get_or_fetch_async(
+            function_name="get_podcast_show_metadata", params=params, fetch=fetch
+        )
+        return {**show_metadata, **METADATA_TO_HYDRATE}
+
+    async def get_episode_page(self, endpoint: str, params: Optional[Dict]) -> Dict:
+        """Get a page of a show's episodes. Each page is cached separately."""
+        cache_params = {"endpoint": endpoint, "params": params}
+
+        async def fetch() -> Dict:
+            episode_data = await self.get(endpoint, params=params)
+            await asyncio.to_thread(
+                cache_data,
+                function_name="get_episode_details_for_podcast_show",
+                params=cache_params,
+                data=episode_data,
+            )
+            return episode_data
+
+        return await get_or_fetch_async(
+            function_name="get_episode_details_for_podcast_show",
+            params=cache_params,
+            fetch=fetch,
+        )
+
+    async def get_episode_details_for_podcast_show(
+        self,
+        show_id: str,
+        max_results: Optional[int] = 20,
+        known_episode_ids: Optional[Set[str]] = None,
+    ) -> List[Dict]:
+        """Get the details of each episode in a given podcast show.
+
+        Same as `SpotifyClient.get_episode_details_for_podcast_show`. Each
+        page is cached separately.
+        """
+        return [
+            episode
+            async for episode_page in self.iter_episode_pages_for_podcast_show(
+                show_id=show_id,
+                max_results=max_results,
+                known_episode_ids=known_episode_ids,
+            )
+            for episode in episode_page
+        ]
+
+    async def iter_episode_pages_for_podcast_show(
+        self,
+        show_id: str,
+        max_results: Optional[int] = 20,
+        known_episode_ids: Optional[Set[str]] = None,
+    ) -> AsyncIterator[List[Dict]]:
+        """Yield the details of the episodes in a given podcast show, one page
+        at a time. See `get_episode_details_for_podcast_show`."""
+        endpoint: Optional[str] = constants.PODCAST_SHOW_EPISODES_ENDPOINT.format(
+            id=show_id
+        )
+        # the "next" URLs returned by the API already contain the params.
+        params: Optional[Dict] = {"market": "US", "limit": get_page_size(max_results)}
+        num_episodes = 0
+        while endpoint and (max_results is None or num_episodes < max_results):
+            episode_data = await self.get_episode_page(endpoint, params)
+            new_episodes, reached_known_episode = get_new_episodes_from_page(
+                episode_items=episode_data["items"],
+                known_episode_ids=known_episode_ids,
+            )
+            if max_results is not None:
+                new_episodes = new_episodes[: max_results - num_episodes]
+            num_episodes += len(new_episodes)
+            if new_episodes:
+                yield [{**item, **METADATA_TO_HYDRATE} for item in new_episodes]
+            if reached_known_episode:
+                break
+            endpoint = episode_data["next"]
+            params = None
+
+    async def get_show_and_episodes(
+        self,
+        show_id: str,
+        max_results: Optional[int] = 20,
+        known_episode_ids: Optional[Set[str]] = None,
+    ) -> Tuple[Dict, List[Dict]]:
+        """Get the metadata and the episodes for a show concurrently."""
+        show_metadata, episodes = await asyncio.gather(
+            self.get_podcast_show_metadata(show_id=show_id),
+            self.get_episode_details_for_podcast_show(
+                show_id=show_id,
+                max_results=max_results,
+                known_episode_ids=known_episode_ids,
+            ),
+        )
+        return show_metadata, episodes
@@ -12,11 +12,21 @@ from dotenv import load_dotenv
 import os
 from pathlib import Path
 import requests
-from typing import Dict, List, Optional
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
 
 from db.redis.redis_caching import cache_data, get_cached_data
+from db.response_store.response_store import fetch_with_response_store
 from integrations.spotify import constants
 from lib.log.logger import Logger
+from lib.metrics import get_endpoint_label, METRICS
+from lib.rate_limiting import (
+    get_rate_limiter,
+    parse_retry_after,
+    RateLimitExceeded,
+    RateLimitPolicy,
+)
 from lib.sync_enrichment import METADATA_TO_HYDRATE
 
 load_dotenv(Path("../../../.env"))
@@ -27,26 +37,148 @@ CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 
 auth_header = base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode()).decode()  # noqa
-token_url = "https://accounts.spotify.com/api/token"
 token_data = {"grant_type": "client_credentials"}
 token_headers = {"Authorization": f"Basic {auth_header}"}
-response = requests.post(token_url, data=token_data, headers=token_headers)
-access_token = response.json()["access_token"]
+
+SPOTIFY_RATE_LIMITER = get_rate_limiter(
+    api_name="spotify",
+    policy=RateLimitPolicy(
+        requests_per_second=constants.SPOTIFY_RATE_LIMIT_REQUESTS_PER_SECOND,
+        burst=constants.SPOTIFY_RATE_LIMIT_BURST,
+        max_retries=constants.SPOTIFY_RATE_LIMIT_MAX_RETRIES,
+        base_backoff_seconds=constants.SPOTIFY_RATE_LIMIT_BASE_BACKOFF_SECONDS,
+        max_backoff_seconds=constants.SPOTIFY_RATE_LIMIT_MAX_BACKOFF_SECONDS,
+    ),
+)
+
+
+def record_response_status(endpoint: str, status_code: int) -> None:
+    METRICS.increment(
+        "api_responses_total",
+        api="spotify",
+        endpoint=get_endpoint_label(endpoint),
+        status=str(status_code),
+    )
+
+
+def raise_for_rate_limit(status_code: int, retry_after: Optional[str]) -> None:
+    """Raise `RateLimitExceeded` if the Spotify API throttled the request.
+
+    https://developer.spotify.com/documentation/web-api/concepts/rate-limits
+    """
+    if status_code == 429:
+        raise RateLimitExceeded(
+            "Spotify API rate limit exceeded.",
+            retry_after=parse_retry_after(retry_after),
+        )
+
+
+def get_page_size(max_results: Optional[int]) -> int:
+    """Get how many episodes to request per page."""
+    if max_results is None:
+        return constants.SPOTIFY_MAX_EPISODES_PER_PAGE
+    return min(max_results, constants.SPOTIFY_MAX_EPISODES_PER_PAGE)
+
+
+def get_new_episodes_from_page(
+    episode_items: List[Optional[Dict]], known_episode_ids: Optional[Set[str]]
+) -> Tuple[List[Dict], bool]:
+    """Get the episodes in a page of episodes (ordered newest-first) that come
+    before the first already-stored episode.
+
+    Also returns whether an already-stored episode was reached, in which case
+    there's no need to fetch any older pages.
+    """
+    # the API returns null for episodes that aren't available in the market.
+    episodes = [item for item in episode_items if item]
+    if not known_episode_ids:
+        return episodes, False
+    for i, episode in enumerate(episodes):
+        if episode["id"] in known_episode_ids:
+            return episodes[:i], True
+    return episodes, False
+
+
+class SpotifyAccessToken:
+    """Keeps track of a client-credentials access token and when it expires.
+
+    The token is only requested when it is first needed, and is refreshed
+    once it is about to expire.
+    """
+
+    def __init__(self) -> None:
+        self.token: Optional[str] = None
+        self.expires_at: float = 0.0
+        self.lock = threading.Lock()
+
+    def is_expired(self) -> bool:
+        return self.token is None or time.time() >= (
+            self.expires_at - constants.SPOTIFY_TOKEN_EXPIRY_MARGIN_SECONDS
+        )
+
+    def update(self, token_response: Dict) -> str:
+        """Update the token from the response of the token endpoint."""
+        self.token = token_response["access_token"]
+        self.expires_at = time.time() + token_response["expires_in"]
+        return self.token  # type: ignore
+
+    def get(self) -> str:
+        """Get a valid access token, refreshing it if it has expired."""
+        with self.lock:
+            if self.is_expired():
+                response = requests.post(
+                    constants.SPOTIFY_TOKEN_ENDPOINT,
+                    data=token_data,
+                    headers=token_headers,
+                )
+                self.update(response.json())
+            return self.token  # type: ignore
 
 
 class SpotifyClient:
     def __init__(self) -> None:
-        self.headers = {"Authorization": f"Bearer {access_token}"}
+        self.access_token = SpotifyAccessToken()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.access_token.get()}"}
+
+    def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
+        """Send a GET request through the shared rate limiter, which retries
+        with backoff if the request is throttled. Depending on the response
+        store mode, the response is also recorded, or is replayed from the
+        store instead of sending the request."""
+
+        def send() -> Dict:
+            headers = self.headers
+            with METRICS.time(
+                "api_request_duration_seconds",
+                api="spotify",
+                endpoint=get_endpoint_label(endpoint),
+            ):
+                response = requests.get(endpoint, headers=headers, params=params)
+            record_response_status(endpoint, response.status_code)
+            raise_for_rate_limit(
+                response.status_code, response.headers.get("Retry-After")
+            )
+            # other errors (e.g., an expired token, or a show that doesn't
+            # exist) raise too, so that their bodies are never cached as data.
+            response.raise_for_status()
+            return response.json()
+
+        return fetch_with_response_store(
+            api="spotify",
+            endpoint=endpoint,
+            params=params,
+            fetch=lambda: SPOTIFY_RATE_LIMITER.call(send),
+        )
 
     # TODO: need to explore this endpoint more. In the meantime, OK to
     # hardcode an ID by looking at the Spotify console.
     def get_id_for_podcast_show(self, show_name: str) -> str:
         """Given a particular podcast show name, get the corresponding ID."""
         params = {"q": show_name, "type": "show"}
-        response = requests.get(
-            constants.SPOTIFY_SEARCH_ENDPOINT, headers=self.headers, params=params
-        )
-        show_data = response.json()
+        show_data = self.get(constants.SPOTIFY_SEARCH_ENDPOINT, params=params)
         if "shows" in show_data:
             if show_data["shows"]["total"] == 0:
                 logger.warning(
@@ -73,50 +205,58 @@ class SpotifyClient:
             function_name="get_podcast_show_metadata", params=params
         )
         if cached_data:
-            return cached_data
+            return {**cached_data, **METADATA_TO_HYDRATE}
 
-        response = requests.get(endpoint, headers=self.headers)
-        res = {**response.json(), **METADATA_TO_HYDRATE}
+        res = self.get(endpoint)
         if not cached_data:
             cache_data(
                 function_name="get_podcast_show_metadata", params=params, data=res
             )
-        return res
+        return {**res, **METADATA_TO_HYDRATE}
 
     def get_episode_details_for_podcast_show(
-        self, show_id: str, max_results: int = 20
+        self,
+        show_id: str,
+        max_results: Optional[int] = 20,
+        known_episode_ids: Optional[Set[str]] = None,
     ) -> List[Dict]:
         """Get the details of each episode in a given podcast show.
 
-        Paginates through results to get the details for each episode,
-        up to the `max_results` argument given.
+        Paginates through results, newest episodes first, to get the details
+        for each episode, up to the `max_results` argument given (or the whole
+        catalogue, if None).
+
+        For incremental syncs, pass the IDs of the show's episodes that are
+        already stored as `known_episode_ids`: pagination stops at the first
+        of them.
         """
-        headers = {"Authorization": f"Bearer {access_token}"}
-        params = {"market": "US", "limit": max_results}
-        endpoint = constants.PODCAST_SHOW_EPISODES_ENDPOINT.format(id=show_id)
+        endpoint: Optional[str] = constants.PODCAST_SHOW_EPISODES_ENDPOINT.format(
+            id=show_id
+        )
+        # the "next" URLs returned by the API already contain the params.
+        params: Optional[Dict] = {"market": "US", "limit": get_page_size(max_results)}
         episodes: List[Dict] = []
-        # TODO: need to note that we'll strictly get max_results or less for
-        # now, but this is OK for development purposes. We can add extra
-        # filtering in the future.
-        while endpoint and len(episodes) < max_results:
-            cached_data = get_cached_data(
+        while endpoint and (max_results is None or len(episodes) < max_results):
+            cache_params = {"endpoint": endpoint, "params": params}
+            episode_data = get_cached_data(
                 function_name="get_episode_details_for_podcast_show",
-                params={"endpoint": endpoint, "params": params},
+                params=cache_params,
             )
-            if cached_data:
-                return cached_data
-            response = requests.get(endpoint, headers=headers, params=params)
-            episode_data = response.json()
-            episode_data_items = [
-                {**item, **METADATA_TO_HYDRATE} for item in episode_data["items"]
-            ]
-            episodes.extend(episode_data_items)
-            endpoint = episode_data["next"]
-            if not cached_data:
+            if not episode_data:
+                episode_data = self.get(endpoint, params=params)
                 cache_data(
                     function_name="get_episode_details_for_podcast_show",
-                    params={"endpoint": endpoint, "params": params},
+                    params=cache_params,
                     data=episode_data,
                 )
+            new_episodes, reached_known_episode = get_new_episodes_from_page(
+                episode_items=episode_data["items"],
+                known_episode_ids=known_episode_ids,
+            )
+            episodes.extend([{**item, **METADATA_TO_HYDRATE} for item in new_episodes])
+            if reached_known_episode:
+                break
+            endpoint = episode_data["next"]
+            params = None
 
-        return episodes
+        return episodes[:max_results]
@@ -1,5 +1,6 @@
 # list of endpoints: https://developer.spotify.com/blog/2020-03-20-introducing-podcasts-api
 
+SPOTIFY_TOKEN_ENDPOINT = "https://accounts.spotify.com/api/token"
 PODCAST_SHOW_ENDPOINT = "https://api.spotify.com/v1/shows/{id}?market={market}"
 SPOTIFY_SEARCH_ENDPOINT = "https://api.spotify.com/v1/search"
 PODCAST_SHOW_EPISODES_ENDPOINT = (
@@ -15,3 +16,33 @@ SPOTIFY_LIST_STRING_FIELDS = [
     "episode_ids",
     "languages",
 ]
+
+# max number of shows to fetch from the Spotify API at the same time.
+SPOTIFY_SYNC_MAX_WORKERS = 8
+
+# max number of fetched batches (e.g., pages of episodes) waiting to be
+# written to the DB. Once reached, fetching pauses until the writer catches up.
+SPOTIFY_SYNC_MAX_QUEUED_BATCHES = 16
+
+# refresh the access token this many seconds before it actually expires, so
+# that in-flight requests don't race the expiry.
+SPOTIFY_TOKEN_EXPIRY_MARGIN_SECONDS = 60
+
+# connection pool limits for the async client.
+SPOTIFY_ASYNC_MAX_CONNECTIONS = 10
+SPOTIFY_ASYNC_MAX_KEEPALIVE_CONNECTIONS = 10
+SPOTIFY_ASYNC_TIMEOUT_SECONDS = 30
+
+# max number of episodes to get for a show that has never been synced before.
+# Use a full backfill to get a show's whole catalogue.
+SPOTIFY_INITIAL_SYNC_MAX_EPISODES = 20
+
+# max number of episodes that the API returns per page.
+SPOTIFY_MAX_EPISODES_PER_PAGE = 50
+
+# client-side rate limits for the Spotify API, shared across all clients.
+SPOTIFY_RATE_LIMIT_REQUESTS_PER_SECOND = 10
+SPOTIFY_RATE_LIMIT_BURST = 10
+SPOTIFY_RATE_LIMIT_MAX_RETRIES = 5
+SPOTIFY_RATE_LIMIT_BASE_BACKOFF_SECONDS = 1
+SPOTIFY_RATE_LIMIT_MAX_BACKOFF_SECONDS = 60
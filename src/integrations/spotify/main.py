@@ -1,40 +1,95 @@
 """Parent file encompassing extraction with the Spotify API.
 
 Setting up Spotify API access: https://developer.spotify.com/dashboard
+
+Shows are fetched concurrently with the async client, and each page of
+episodes is written as soon as it is fetched (see `integrations.sync_engine`).
+
+Syncs are incremental by default: for each show, we only page through the
+episodes that are newer than the newest episode that is already stored.
 """
+import asyncio
+from functools import partial
+from typing import AsyncIterator, List, Union
+
 from integrations.spotify import helper
-from integrations.spotify.client import SpotifyClient
-from integrations.spotify.constants import SPOTIFY_SHOW_NAME_TO_ID_MAP
-from integrations.spotify.sqlite_helper import write_spotify_data_to_db
+from integrations.spotify.async_client import AsyncSpotifyClient
+from integrations.spotify.constants import (
+    SPOTIFY_INITIAL_SYNC_MAX_EPISODES,
+    SPOTIFY_SHOW_NAME_TO_ID_MAP,
+    SPOTIFY_SYNC_MAX_QUEUED_BATCHES,
+    SPOTIFY_SYNC_MAX_WORKERS,
+)
+from integrations.spotify.models import SpotifyEpisode, SpotifyShow
+from integrations.spotify.sqlite_helper import (
+    bulk_write_spotify_data_to_db,
+    get_known_episode_ids,
+)
+from integrations.sync_engine import run_streaming_async_sync
+from lib.decorators import timed
 from lib.log.logger import Logger
 
 logger = Logger(__name__)
 
 
-def main() -> None:
-    client = SpotifyClient()
-    for show_name, show_id in SPOTIFY_SHOW_NAME_TO_ID_MAP.items():
-        show_metadata = client.get_podcast_show_metadata(show_id=show_id)
-        episode_metadata_list = client.get_episode_details_for_podcast_show(
-            show_id=show_id
-        )
-        spotify_show = helper.create_spotify_show_instance(show_metadata)
-        spotify_episodes = [
+async def fetch_show_batches(
+    client: AsyncSpotifyClient,
+    show_name: str,
+    show_id: str,
+    full_backfill: bool = False,
+) -> AsyncIterator[List[Union[SpotifyShow, SpotifyEpisode]]]:
+    """Fetch the show metadata and the episodes for a given show, and yield
+    them in batches to write: the show, then one batch of episodes per page.
+
+    Unless `full_backfill` is set, only fetches the episodes that are newer
+    than the ones that are already stored. A full backfill pages through the
+    show's whole catalogue.
+    """
+    # the SQLite query is blocking, so it's run in a worker thread (with its
+    # own connection) to not hold up the other shows' coroutines.
+    known_episode_ids = (
+        None
+        if full_backfill
+        else await asyncio.to_thread(get_known_episode_ids, show_id)
+    )
+    if full_backfill or known_episode_ids:
+        max_results = None
+    else:
+        max_results = SPOTIFY_INITIAL_SYNC_MAX_EPISODES
+    show_metadata = await client.get_podcast_show_metadata(show_id=show_id)
+    yield [helper.create_spotify_show_instance(show_metadata)]
+    async for episode_metadata_page in client.iter_episode_pages_for_podcast_show(
+        show_id=show_id,
+        max_results=max_results,
+        known_episode_ids=known_episode_ids,
+    ):
+        yield [
             helper.create_spotify_episode_instance(
                 metadata=episode_metadata,
                 show_id=show_metadata["id"],
                 show_name=show_metadata["name"],
             )
-            for episode_metadata in episode_metadata_list
+            for episode_metadata in episode_metadata_page
         ]
-        write_spotify_data_to_db(spotify_show)
-        for episode in spotify_episodes:
-            write_spotify_data_to_db(episode)
-        logger.info(
-            "Completed getting updated channel and episode data for show"
-            f"{show_name} with id={show_id}. Added {len(spotify_episodes)} "
-            f"episodes to DB for show {show_name}"
+
+
+async def sync_shows(full_backfill: bool = False) -> None:
+    async with AsyncSpotifyClient() as client:
+        await run_streaming_async_sync(
+            integration="spotify",
+            name_to_id_map=SPOTIFY_SHOW_NAME_TO_ID_MAP,
+            fetch_batches=partial(
+                fetch_show_batches, client, full_backfill=full_backfill
+            ),
+            write_batch=bulk_write_spotify_data_to_db,
+            max_concurrency=SPOTIFY_SYNC_MAX_WORKERS,
+            max_queued_batches=SPOTIFY_SYNC_MAX_QUEUED_BATCHES,
         )
+
+
+@timed("pipeline_stage_duration_seconds", stage="spotify_sync")
+def main(full_backfill: bool = False) -> None:
+    asyncio.run(sync_shows(full_backfill=full_backfill))
     logger.info("-" * 10)
     logger.info("Completed Spotify sync.")
 
@@ -1,28 +1,44 @@
 """SQLite helper utilities for writing Spotify data."""
-from typing import Union
+from collections import defaultdict
+from typing import Dict, List, Sequence, Set, Union
 
 from db.sql import helper
-from db.sql.helper import conn, cursor
+from db.sql.connection import get_connection
 from integrations.spotify.helper import flatten_spotify_episode, flatten_spotify_show
 from integrations.spotify.models import SpotifyEpisode, SpotifyShow
 
 
+def bulk_write_spotify_data_to_db(
+    instances: Sequence[Union[SpotifyShow, SpotifyEpisode]]
+) -> None:
+    """Upserts a batch of Show and/or Episode instances into their respective
+    SQLite tables, with one transaction per table."""
+    table_name_to_rows: Dict[str, List[Dict]] = defaultdict(list)
+    for instance in instances:
+        instance_dict = (
+            flatten_spotify_show(instance)
+            if isinstance(instance, SpotifyShow)
+            else flatten_spotify_episode(instance)
+        )
+        table_name_to_rows[instance.__table_name__].append(instance_dict)
+
+    for table_name, rows in table_name_to_rows.items():
+        helper.upsert_rows(table_name=table_name, rows=rows)
+
+
 def write_spotify_data_to_db(instance: Union[SpotifyShow, SpotifyEpisode]) -> None:
-    table_name = instance.__table_name__
-    instance_dict = (
-        flatten_spotify_show(instance)
-        if isinstance(instance, SpotifyShow)
-        else flatten_spotify_episode(instance)
-    )
-    instance_dict.pop("__table_name__", None)
-    if not helper.check_if_table_exists(cursor=cursor, table_name=table_name):
-        helper.create_table(conn=conn, cursor=cursor, table_name=table_name)
+    bulk_write_spotify_data_to_db([instance])
 
-    # only write to the SQLite DB if the primary key is unique
-    row_insertion_is_valid = helper.single_row_insertion_is_valid(
-        row_data=instance_dict, table_name=table_name
-    )
-    if row_insertion_is_valid:
-        helper.write_to_database(
-            conn=conn, cursor=cursor, table_name=table_name, data=instance_dict
+
+def get_known_episode_ids(show_id: str) -> Set[str]:
+    """Get the IDs of the show's episodes that are already in the DB."""
+    table_name = SpotifyEpisode.__table_name__
+    if not helper.check_if_table_exists(
+        cursor=get_connection().cursor(), table_name=table_name
+    ):
+        return set()
+    return set(
+        helper.get_column(
+            table_name=table_name, column="id", where={"show_id": show_id}
         )
+    )
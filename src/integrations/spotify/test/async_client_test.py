@@ -0,0 +1,176 @@
+"""Tests for async_client.py"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+import pytest
+
+from integrations.spotify import async_client as async_client_module
+from integrations.spotify import constants
+from integrations.spotify.async_client import AsyncSpotifyClient
+from lib.sync_enrichment import METADATA_TO_HYDRATE
+
+SHOW_ID = "test_show_id"
+NUM_EPISODES = 5
+EPISODES_PER_PAGE = 2
+
+
+def mock_spotify_api(
+    request: httpx.Request, requested_urls: List[str]
+) -> httpx.Response:
+    requested_urls.append(str(request.url))
+    if str(request.url) == constants.SPOTIFY_TOKEN_ENDPOINT:
+        return httpx.Response(200, json={"access_token": "token", "expires_in": 3600})
+    assert request.headers["Authorization"] == "Bearer token"
+    offset = int(request.url.params.get("offset", 0))
+    items = [
+        {"id": f"episode-{i}"}
+        for i in range(offset, min(offset + EPISODES_PER_PAGE, NUM_EPISODES))
+    ]
+    next_offset = offset + EPISODES_PER_PAGE
+    next_url = (
+        f"https://api.spotify.com/v1/shows/{SHOW_ID}/episodes"
+        f"?offset={next_offset}&limit={EPISODES_PER_PAGE}"
+        if next_offset < NUM_EPISODES
+        else None
+    )
+    return httpx.Response(200, json={"items": items, "next": next_url})
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    async def fetch_without_cache(
+        function_name: str, params: Dict, fetch: Callable[[], Awaitable[Dict]]
+    ) -> Dict:
+        return await fetch()
+
+    monkeypatch.setattr(async_client_module, "get_or_fetch_async", fetch_without_cache)
+    monkeypatch.setattr(async_client_module, "cache_data", lambda **kwargs: None)
+
+
+def test_get_episode_details_paginates_and_fetches_token_once():
+    requested_urls: List[str] = []
+
+    async def get_episodes() -> List[Dict]:
+        async with AsyncSpotifyClient() as client:
+            client.http_client = httpx.AsyncClient(
+                transport=httpx.MockTransport(
+                    lambda request: mock_spotify_api(request, requested_urls)
+                )
+            )
+            return await client.get_episode_details_for_podcast_show(
+                show_id=SHOW_ID, max_results=10
+            )
+
+    episodes = asyncio.run(get_episodes())
+
+    assert [episode["id"] for episode in episodes] == [
+        f"episode-{i}" for i in range(NUM_EPISODES)
+    ]
+    assert requested_urls.count(constants.SPOTIFY_TOKEN_ENDPOINT) == 1
+
+
+def test_get_episode_details_stops_at_first_known_episode():
+    requested_urls: List[str] = []
+
+    async def get_episodes() -> List[Dict]:
+        async with AsyncSpotifyClient() as client:
+            client.http_client = httpx.AsyncClient(
+                transport=httpx.MockTransport(
+                    lambda request: mock_spotify_api(request, requested_urls)
+                )
+            )
+            return await client.get_episode_details_for_podcast_show(
+                show_id=SHOW_ID,
+                max_results=None,
+                known_episode_ids={"episode-3", "episode-4"},
+            )
+
+    episodes = asyncio.run(get_episodes())
+
+    assert [episode["id"] for episode in episodes] == [
+        "episode-0",
+        "episode-1",
+        "episode-2",
+    ]
+    # token + 2 pages; the 3rd page is never requested.
+    assert len(requested_urls) == 3
+
+
+def test_iter_episode_pages_yields_each_page_up_to_max_results():
+    requested_urls: List[str] = []
+
+    async def get_episode_pages() -> List[List[Dict]]:
+        async with AsyncSpotifyClient() as client:
+            client.http_client = httpx.AsyncClient(
+                transport=httpx.MockTransport(
+                    lambda request: mock_spotify_api(request, requested_urls)
+                )
+            )
+            return [
+                episode_page
+                async for episode_page in client.iter_episode_pages_for_podcast_show(
+                    show_id=SHOW_ID, max_results=3
+                )
+            ]
+
+    episode_pages = asyncio.run(get_episode_pages())
+
+    assert [[episode["id"] for episode in page] for page in episode_pages] == [
+        ["episode-0", "episode-1"],
+        ["episode-2"],
+    ]
+
+
+def test_get_podcast_show_metadata_only_caches_the_api_response(monkeypatch):
+    cached: List[Dict] = []
+    monkeypatch.setattr(
+        async_client_module, "cache_data", lambda **kwargs: cached.append(kwargs)
+    )
+
+    async def get_show_metadata() -> Dict:
+        async with AsyncSpotifyClient() as client:
+            client.http_client = httpx.AsyncClient(
+                transport=httpx.MockTransport(
+                    lambda request: httpx.Response(
+                        200,
+                        json={"access_token": "token", "expires_in": 3600}
+                        if str(request.url) == constants.SPOTIFY_TOKEN_ENDPOINT
+                        else {"id": SHOW_ID},
+                    )
+                )
+            )
+            return await client.get_podcast_show_metadata(show_id=SHOW_ID)
+
+    show_metadata = asyncio.run(get_show_metadata())
+
+    assert show_metadata == {"id": SHOW_ID, **METADATA_TO_HYDRATE}
+    assert [kwargs["data"] for kwargs in cached] == [{"id": SHOW_ID}]
+
+
+@pytest.mark.parametrize("status_code", [404, 500])
+def test_get_podcast_show_metadata_does_not_cache_errors(monkeypatch, status_code):
+    cached: List[Dict] = []
+    monkeypatch.setattr(
+        async_client_module, "cache_data", lambda **kwargs: cached.append(kwargs)
+    )
+
+    async def get_show_metadata() -> Dict:
+        async with AsyncSpotifyClient() as client:
+            client.http_client = httpx.AsyncClient(
+                transport=httpx.MockTransport(
+                    lambda request: httpx.Response(
+                        200, json={"access_token": "token", "expires_in": 3600}
+                    )
+                    if str(request.url) == constants.SPOTIFY_TOKEN_ENDPOINT
+                    else httpx.Response(
+                        status_code,
+                        json={"error": {"status": status_code, "message": "error"}},
+                    )
+                )
+            )
+            return await client.get_podcast_show_metadata(show_id=SHOW_ID)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(get_show_metadata())
+    assert cached == []
@@ -0,0 +1,238 @@
+"""Engine for syncing many channels/shows of an integration concurrently.
+
+Fetching a channel's data is dominated by waiting on the network, so the
+fetches for each channel run in a bounded pool of worker threads. The calling
+thread is the single writer: it drains the results as they complete and
+writes them to SQLite, so that the DB connection is never shared across
+threads.
+
+Integrations with an async client can instead run their fetches as
+coroutines on an event loop, with the same single-writer guarantee.
+
+Fetches are streamed: each fetch yields its data in batches (e.g., one batch
+per API page), and each batch is written as soon as the writer gets to it,
+so a channel's data is never held in memory all at once. Batches go through
+a bounded queue, so if the writer falls behind, the fetches block until it
+catches up (backpressure) instead of buffering the backlog in memory.
+"""
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from lib.log.logger import Logger
+
+logger = Logger(__name__)
+
+T = TypeVar("T")
+
+# seconds that a blocked fetch waits before checking whether the sync was
+# stopped.
+QUEUE_POLL_INTERVAL_SECONDS = 0.1
+
+# put on the queue by a fetch once it is done, with its error (if any).
+FETCH_DONE = object()
+
+
+def run_streaming_sync(
+    integration: str,
+    name_to_id_map: Dict[str, str],
+    fetch_batches: Callable[[str, str], Iterable[T]],
+    write_batch: Callable[[T], None],
+    max_workers: int,
+    max_queued_batches: int,
+) -> int:
+    """Fetch the data for each (name, id) pair concurrently and write each
+    batch of data as soon as it is available.
+
+    `fetch_batches` is run in a worker thread and must not write to SQLite.
+    `write_batch` is always run in the calling thread. At most
+    `max_queued_batches` batches are waiting to be written at any time. A
+    failure for one channel is logged and doesn't stop the sync for the
+    others, but the batches that it already fetched are still written.
+
+    Returns the number of channels that were synced successfully.
+    """
+    batch_queue: queue.Queue = queue.Queue(maxsize=max_queued_batches)
+    stop_event = threading.Event()
+
+    def put(item: Tuple[str, object, Optional[Exception]]) -> bool:
+        """Block until there is room in the queue. Returns False if the sync
+        was stopped in the meantime."""
+        while not stop_event.is_set():
+            try:
+                batch_queue.put(item, timeout=QUEUE_POLL_INTERVAL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(name: str, id_: str) -> None:
+        try:
+            for batch in fetch_batches(name, id_):
+                if not put((name, batch, None)):
+                    return
+        except Exception as e:
+            put((name, FETCH_DONE, e))
+            return
+        put((name, FETCH_DONE, None))
+
+    num_synced = 0
+    name_to_num_batches: Dict[str, int] = {}
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix=f"{integration}-sync"
+    ) as executor:
+        for name, id_ in name_to_id_map.items():
+            executor.submit(produce, name, id_)
+        try:
+            num_running = len(name_to_id_map)
+            while num_running:
+                name, batch, error = batch_queue.get()
+                if batch is not FETCH_DONE:
+                    write_batch(batch)
+                    name_to_num_batches[name] = name_to_num_batches.get(name, 0) + 1
+                    continue
+                num_running -= 1
+                if log_fetch_result(integration, name, name_to_num_batches, error):
+                    num_synced += 1
+        finally:
+            # unblock the fetches if the writer failed.
+            stop_event.set()
+
+    logger.info(
+        f"Synced {num_synced}/{len(name_to_id_map)} {integration} channels "
+        f"with max_workers={max_workers}."
+    )
+    return num_synced
+
+
+def log_fetch_result(
+    integration: str,
+    name: str,
+    name_to_num_batches: Dict[str, int],
+    error: Optional[Exception],
+) -> bool:
+    """Log the outcome of a channel's fetch. Returns True if it succeeded."""
+    num_batches = name_to_num_batches.get(name, 0)
+    if error is not None:
+        logger.error(
+            f"Error syncing {integration} data for {name} (after writing "
+            f"{num_batches} batches): {error}"
+        )
+        return False
+    logger.info(f"Synced {integration} data for {name} in {num_batches} batches.")
+    return True
+
+
+def run_concurrent_sync(
+    integration: str,
+    name_to_id_map: Dict[str, str],
+    fetch: Callable[[str, str], T],
+    write: Callable[[T], None],
+    max_workers: int,
+) -> int:
+    """Same as `run_streaming_sync`, for fetches that return all of their
+    data at once.
+
+    Returns the number of channels that were synced successfully.
+    """
+    return run_streaming_sync(
+        integration=integration,
+        name_to_id_map=name_to_id_map,
+        fetch_batches=lambda name, id_: [fetch(name, id_)],
+        write_batch=write,
+        max_workers=max_workers,
+        max_queued_batches=max_workers,
+    )
+
+
+async def run_streaming_async_sync(
+    integration: str,
+    name_to_id_map: Dict[str, str],
+    fetch_batches: Callable[[str, str], AsyncIterator[T]],
+    write_batch: Callable[[T], None],
+    max_concurrency: int,
+    max_queued_batches: int,
+) -> int:
+    """Async version of `run_streaming_sync`, for clients whose fetches are
+    async generators. At most `max_concurrency` fetches are in flight at once.
+
+    Returns the number of channels that were synced successfully.
+    """
+    batch_queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued_batches)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def produce(name: str, id_: str) -> None:
+        error = None
+        async with semaphore:
+            try:
+                async for batch in fetch_batches(name, id_):
+                    await batch_queue.put((name, batch, None))
+            except Exception as e:
+                error = e
+        await batch_queue.put((name, FETCH_DONE, error))
+
+    producers: List[asyncio.Task] = [
+        asyncio.create_task(produce(name, id_)) for name, id_ in name_to_id_map.items()
+    ]
+    num_synced = 0
+    name_to_num_batches: Dict[str, int] = {}
+    try:
+        num_running = len(producers)
+        while num_running:
+            name, batch, error = await batch_queue.get()
+            if batch is not FETCH_DONE:
+                write_batch(batch)
+                name_to_num_batches[name] = name_to_num_batches.get(name, 0) + 1
+                continue
+            num_running -= 1
+            if log_fetch_result(integration, name, name_to_num_batches, error):
+                num_synced += 1
+    finally:
+        # cancel the fetches if the writer failed.
+        for producer in producers:
+            producer.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+
+    logger.info(
+        f"Synced {num_synced}/{len(name_to_id_map)} {integration} channels "
+        f"with max_concurrency={max_concurrency}."
+    )
+    return num_synced
+
+
+async def run_concurrent_async_sync(
+    integration: str,
+    name_to_id_map: Dict[str, str],
+    fetch: Callable[[str, str], Awaitable[T]],
+    write: Callable[[T], None],
+    max_concurrency: int,
+) -> int:
+    """Same as `run_streaming_async_sync`, for fetches that return all of
+    their data at once.
+
+    Returns the number of channels that were synced successfully.
+    """
+
+    async def fetch_batches(name: str, id_: str) -> AsyncIterator[T]:
+        yield await fetch(name, id_)
+
+    return await run_streaming_async_sync(
+        integration=integration,
+        name_to_id_map=name_to_id_map,
+        fetch_batches=fetch_batches,
+        write_batch=write,
+        max_concurrency=max_concurrency,
+        max_queued_batches=max_concurrency,
+    )
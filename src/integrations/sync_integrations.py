@@ -1,8 +1,13 @@
 """Parent file to re-sync data from each integration."""
 from integrations.spotify import main as spotify_sync
 from integrations.youtube import main as youtube_sync
+from lib.log.logger import Logger
+from lib.rate_limiting import get_rate_limit_counters
+
+logger = Logger(__name__)
 
 
 def main() -> None:
     youtube_sync.main()
     spotify_sync.main()
+    logger.info(f"Rate limit counters by API: {get_rate_limit_counters()}")
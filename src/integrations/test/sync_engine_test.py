@@ -0,0 +1,191 @@
+"""Tests for sync_engine.py"""
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Iterator, List, Tuple
+
+import pytest
+
+from integrations.sync_engine import (
+    run_concurrent_async_sync,
+    run_concurrent_sync,
+    run_streaming_async_sync,
+    run_streaming_sync,
+)
+
+
+def test_run_concurrent_sync_writes_in_calling_thread():
+    writer_threads: List[str] = []
+    written: List[Tuple[str, str]] = []
+
+    def fetch(name: str, id_: str) -> Tuple[str, str]:
+        time.sleep(0.01)
+        return name, id_
+
+    def write(result: Tuple[str, str]) -> None:
+        writer_threads.append(threading.current_thread().name)
+        written.append(result)
+
+    name_to_id_map = {f"channel-{i}": f"id-{i}" for i in range(10)}
+    num_synced = run_concurrent_sync(
+        integration="test",
+        name_to_id_map=name_to_id_map,
+        fetch=fetch,
+        write=write,
+        max_workers=4,
+    )
+
+    assert num_synced == 10
+    assert sorted(written) == sorted(name_to_id_map.items())
+    assert set(writer_threads) == {threading.current_thread().name}
+
+
+def test_run_concurrent_sync_continues_after_fetch_error():
+    written: List[str] = []
+
+    def fetch(name: str, id_: str) -> str:
+        if name == "bad":
+            raise ValueError("API error")
+        return name
+
+    num_synced = run_concurrent_sync(
+        integration="test",
+        name_to_id_map={"good": "1", "bad": "2", "other": "3"},
+        fetch=fetch,
+        write=written.append,
+        max_workers=2,
+    )
+
+    assert num_synced == 2
+    assert sorted(written) == ["good", "other"]
+
+
+def test_run_concurrent_async_sync_limits_concurrency():
+    in_flight: List[int] = [0]
+    max_in_flight: List[int] = [0]
+    written: List[str] = []
+
+    async def fetch(name: str, id_: str) -> str:
+        in_flight[0] += 1
+        max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        if name == "bad":
+            raise ValueError("API error")
+        return name
+
+    name_to_id_map = {f"show-{i}": str(i) for i in range(10)}
+    name_to_id_map["bad"] = "bad"
+    num_synced = asyncio.run(
+        run_concurrent_async_sync(
+            integration="test",
+            name_to_id_map=name_to_id_map,
+            fetch=fetch,
+            write=written.append,
+            max_concurrency=3,
+        )
+    )
+
+    assert num_synced == 10
+    assert len(written) == 10
+    assert max_in_flight[0] == 3
+
+
+def test_run_streaming_sync_applies_backpressure():
+    num_fetched: List[int] = [0]
+    num_fetched_at_write: List[int] = []
+
+    def fetch_batches(name: str, id_: str) -> Iterator[int]:
+        for i in range(10):
+            num_fetched[0] += 1
+            yield i
+
+    def write_batch(batch: int) -> None:
+        time.sleep(0.01)
+        num_fetched_at_write.append(num_fetched[0])
+
+    num_synced = run_streaming_sync(
+        integration="test",
+        name_to_id_map={"channel": "1"},
+        fetch_batches=fetch_batches,
+        write_batch=write_batch,
+        max_workers=1,
+        max_queued_batches=2,
+    )
+
+    assert num_synced == 1
+    assert len(num_fetched_at_write) == 10
+    # the 1st batch is written long before the last one is fetched, and the
+    # fetch never gets more than the queue size (+1 in hand) ahead.
+    assert num_fetched_at_write[0] < 10
+    assert all(
+        num_fetched - num_written <= 4
+        for num_written, num_fetched in enumerate(num_fetched_at_write, start=1)
+    )
+
+
+def test_run_streaming_sync_keeps_batches_written_before_fetch_error():
+    written: List[str] = []
+
+    def fetch_batches(name: str, id_: str) -> Iterator[str]:
+        yield f"{name}-page-0"
+        if name == "bad":
+            raise ValueError("API error")
+        yield f"{name}-page-1"
+
+    num_synced = run_streaming_sync(
+        integration="test",
+        name_to_id_map={"good": "1", "bad": "2"},
+        fetch_batches=fetch_batches,
+        write_batch=written.append,
+        max_workers=2,
+        max_queued_batches=1,
+    )
+
+    assert num_synced == 1
+    assert sorted(written) == ["bad-page-0", "good-page-0", "good-page-1"]
+
+
+def test_run_streaming_sync_stops_fetches_if_write_fails():
+    def fetch_batches(name: str, id_: str) -> Iterator[int]:
+        yield from range(100)
+
+    def write_batch(batch: int) -> None:
+        raise IOError("disk full")
+
+    with pytest.raises(IOError):
+        run_streaming_sync(
+            integration="test",
+            name_to_id_map={"channel": "1"},
+            fetch_batches=fetch_batches,
+            write_batch=write_batch,
+            max_workers=1,
+            max_queued_batches=1,
+        )
+
+
+def test_run_streaming_async_sync_writes_batches_as_they_arrive():
+    events: List[str] = []
+
+    async def fetch_batches(name: str, id_: str) -> AsyncIterator[str]:
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            events.append(f"fetched {name}-{i}")
+            yield f"{name}-{i}"
+
+    def write_batch(batch: str) -> None:
+        events.append(f"wrote {batch}")
+
+    num_synced = asyncio.run(
+        run_streaming_async_sync(
+            integration="test",
+            name_to_id_map={"show": "1"},
+            fetch_batches=fetch_batches,
+            write_batch=write_batch,
+            max_concurrency=1,
+            max_queued_batches=1,
+        )
+    )
+
+    assert num_synced == 1
+    assert events.index("wrote show-0") < events.index("fetched show-2")
@@ -8,14 +8,42 @@ Full API docs: https://developers.google.com/resources/api-libraries/documentati
 from dotenv import load_dotenv
 import os
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import parse_qsl, urlsplit
 
 from googleapiclient.discovery import build, Resource
 from googleapiclient.errors import HttpError
-
-from db.redis.redis_caching import cache_data, get_cached_data
-from lib.sync_enrichment import METADATA_TO_HYDRATE
+from googleapiclient.http import HttpRequest
+
+from db.redis.redis_caching import (
+    cache_data,
+    cache_data_many,
+    get_cached_data,
+    get_stale_cache_entry,
+)
+from db.redis.singleflight import get_or_fetch, get_or_fetch_many
+from db.response_store import response_store
+from db.response_store.response_store import fetch_with_response_store
+from integrations.youtube import constants
 from lib.log.logger import Logger
+from lib.metrics import get_endpoint_label, METRICS
+from lib.rate_limiting import (
+    get_rate_limiter,
+    parse_retry_after,
+    RateLimitExceeded,
+    RateLimitPolicy,
+)
+from lib.sync_enrichment import METADATA_TO_HYDRATE
 
 load_dotenv(Path("../../../.env"))
 
@@ -23,26 +51,198 @@ logger = Logger(__name__)
 
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
+YOUTUBE_RATE_LIMITER = get_rate_limiter(
+    api_name="youtube",
+    policy=RateLimitPolicy(
+        requests_per_second=constants.YOUTUBE_RATE_LIMIT_REQUESTS_PER_SECOND,
+        burst=constants.YOUTUBE_RATE_LIMIT_BURST,
+        max_retries=constants.YOUTUBE_RATE_LIMIT_MAX_RETRIES,
+        base_backoff_seconds=constants.YOUTUBE_RATE_LIMIT_BASE_BACKOFF_SECONDS,
+        max_backoff_seconds=constants.YOUTUBE_RATE_LIMIT_MAX_BACKOFF_SECONDS,
+    ),
+)
+
+# reasons for a 403 that mean that we're sending requests too fast, as
+# opposed to e.g. having used up the daily quota, which retries won't fix.
+# https://developers.google.com/youtube/v3/docs/errors
+RATE_LIMIT_ERROR_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+def is_rate_limit_error(error: HttpError) -> bool:
+    if error.resp.status == 429:
+        return True
+    error_details = error.error_details if isinstance(error.error_details, list) else []
+    error_reasons = {
+        detail.get("reason") for detail in error_details if isinstance(detail, dict)
+    }
+    return error.resp.status == 403 and bool(error_reasons & RATE_LIMIT_ERROR_REASONS)
+
+
+def get_request_endpoint_and_params(request: HttpRequest) -> Tuple[str, Dict]:
+    """Split the URL of a request into its endpoint and its query params,
+    leaving out the API key."""
+    url = urlsplit(request.uri)
+    params = {key: value for key, value in parse_qsl(url.query) if key != "key"}
+    return f"{url.scheme}://{url.netloc}{url.path}", params
+
+
+def execute_request(request: HttpRequest) -> Dict:
+    """Execute a request to the YouTube API through the shared rate limiter,
+    which retries with backoff if the request is throttled.
+
+    Depending on the response store mode, the response is also recorded, or
+    is replayed from the store instead of executing the request. The latency
+    and status of each request sent are recorded in `lib.metrics`.
+    """
+    endpoint, params = get_request_endpoint_and_params(request)
+    endpoint_label = get_endpoint_label(endpoint)
+
+    def execute() -> Dict:
+        try:
+            with METRICS.time(
+                "api_request_duration_seconds", api="youtube", endpoint=endpoint_label
+            ):
+                response = request.execute()
+        except HttpError as e:
+            METRICS.increment(
+                "api_responses_total",
+                api="youtube",
+                endpoint=endpoint_label,
+                status=str(e.resp.status),
+            )
+            if is_rate_limit_error(e):
+                raise RateLimitExceeded(
+                    f"HTTP error: {e}",
+                    retry_after=parse_retry_after(e.resp.get("retry-after")),
+                ) from e
+            raise
+        METRICS.increment(
+            "api_responses_total", api="youtube", endpoint=endpoint_label, status="200"
+        )
+        return response
+
+    return fetch_with_response_store(
+        api="youtube",
+        endpoint=endpoint,
+        params=params,
+        fetch=lambda: YOUTUBE_RATE_LIMITER.call(execute),
+    )
+
+
+def execute_cached_request(
+    function_name: str,
+    params: Dict,
+    request: HttpRequest,
+    parse_response: Callable[[Dict], Dict] = lambda response: response,
+) -> Dict:
+    """Execute a request and cache its (parsed) response under the function
+    name and params, along with the response's ETag.
+
+    If the cache has an expired response with an ETag, the request is made
+    conditional on it: if the API replies "304 Not Modified", the expired
+    response is refreshed in the cache and returned, instead of being
+    downloaded again.
+    https://developers.google.com/youtube/v3/getting-started#etags
+
+    While recording responses, requests aren't made conditional, so that the
+    whole response gets recorded.
+    """
+    stale_cache_entry = get_stale_cache_entry(function_name, params)
+    if (
+        stale_cache_entry is not None
+        and stale_cache_entry.etag
+        and response_store.RESPONSE_STORE_MODE != "record"
+    ):
+        request.headers["If-None-Match"] = stale_cache_entry.etag
+    try:
+        response = execute_request(request)
+    except HttpError as e:
+        if e.resp.status != 304 or stale_cache_entry is None:
+            raise
+        cache_data(
+            function_name=function_name,
+            params=params,
+            data=stale_cache_entry.data,
+            etag=stale_cache_entry.etag,
+        )
+        return stale_cache_entry.data
+
+    data = parse_response(response)
+    cache_data(
+        function_name=function_name,
+        params=params,
+        data=data,
+        etag=response.get("etag"),
+    )
+    return data
+
 
 def manage_rate_limit_throttling(func: Callable) -> Callable:
+    """Returns an error dict, instead of raising, if a request fails or if
+    it is still being throttled after all the retries from the rate
+    limiter."""
+
     def wrapper(*args: Tuple, **kwargs: Dict) -> Any:
         try:
             result = func(*args, **kwargs)
             return result
-        except HttpError as e:
-            if e.resp.status == 429:
-                # TODO: investigate rate limits to figure out backoff strategy
-                # print("Rate limit exceeded. Waiting and retrying...")
-                # time.sleep(60)  # Sleep for 60 seconds (adjust as needed)
-                return wrapper(*args, **kwargs)  # Retry the function
-            else:
-                # Handle other HTTP errors here, e.g., log or raise an exception
-                logger.error(f"HTTP error: {e}")
-                return {"error": f"HTTP error: {e}"}
+        except (HttpError, RateLimitExceeded) as e:
+            logger.error(f"HTTP error: {e}")
+            return {"error": f"HTTP error: {e}"}
 
     return wrapper
 
 
+def chunk_list(items: List[str], chunk_size: int) -> Iterable[List[str]]:
+    """Yield successive chunks of at most `chunk_size` items."""
+    for i in range(0, len(items), chunk_size):
+        yield items[i : i + chunk_size]
+
+
+def split_video_list_response(response: Dict) -> Dict[str, Dict]:
+    """Splits a multi-ID `videos().list` response into one response per video.
+
+    Each per-video response has the same shape as the response for a single
+    ID, so it can be cached and parsed exactly like the output of
+    `get_video_details_from_id`.
+    """
+    return {
+        item["id"]: {
+            "kind": response.get("kind"),
+            "etag": item.get("etag"),
+            "items": [item],
+            "pageInfo": {"totalResults": 1, "resultsPerPage": 1},
+        }
+        for item in response.get("items", [])
+    }
+
+
+def get_new_video_ids_from_playlist_page(
+    response: Dict,
+    published_after: Optional[str] = None,
+    stop_at_video_id: Optional[str] = None,
+) -> Tuple[List[str], bool]:
+    """Get the IDs of the videos in a page of a channel's uploads playlist
+    (newest-first), up to the first video that is already known: either
+    `stop_at_video_id`, or one published before `published_after`.
+
+    Returns the video IDs, and whether a known video was reached.
+    """
+    video_ids: List[str] = []
+    for item in response.get("items", []):
+        video_id = item["contentDetails"]["videoId"]
+        # private and deleted videos don't have a publish time.
+        published_at = item["contentDetails"].get("videoPublishedAt")
+        if video_id == stop_at_video_id or (
+            published_after is not None
+            and published_at is not None
+            and published_at < published_after
+        ):
+            return video_ids, True
+        video_ids.append(video_id)
+    return video_ids, False
+
+
 class YoutubeClient:
     def __init__(self) -> None:
         self.client: Resource = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
@@ -58,7 +258,9 @@ class YoutubeClient:
         )
         if cached_data and len(cached_data) > 0:
             return cached_data
-        response = self.client.channels().list(part="id", forUsername=handle).execute()
+        response = execute_request(
+            self.client.channels().list(part="id", forUsername=handle)
+        )
 
         res = response["etag"]
         cache_data(
@@ -78,110 +280,155 @@ class YoutubeClient:
         first result, since this will give us the most likely result.
         """
         params = {"channel_name": channel_name}
-        cached_data = get_cached_data(
-            function_name="get_channel_metadata", params=params
+        # only the API's snippet is cached, so that the sync metadata is from
+        # this sync even on a cache hit.
+        channel_metadata = get_or_fetch(
+            function_name="get_channel_metadata",
+            params=params,
+            fetch=lambda: execute_cached_request(
+                function_name="get_channel_metadata",
+                params=params,
+                request=self.client.search().list(
+                    part="snippet", type="channel", q=channel_name
+                ),
+                parse_response=lambda response: response["items"][0]["snippet"],
+            ),
         )
-        if cached_data and len(cached_data) > 0:
-            return cached_data
+        return {**channel_metadata, **METADATA_TO_HYDRATE}
 
-        response = (
-            self.client.search()
-            .list(part="snippet", type="channel", q=channel_name)
-            .execute()
-        )
-        metadata = response["items"][0]["snippet"]
+    def get_uploads_playlist_id(self, channel_id: str) -> Optional[str]:
+        """Get the ID of the playlist that has all of a channel's uploads, or
+        None if the channel doesn't exist (e.g., it was deleted).
 
-        res = {**metadata, **METADATA_TO_HYDRATE}
-        cache_data(function_name="get_channel_metadata", params=params, data=res)
-        return res
+        https://developers.google.com/youtube/v3/docs/channels#contentDetails.relatedPlaylists.uploads
+        """  # noqa
+        params = {"channel_id": channel_id}
+        response = get_or_fetch(
+            function_name="get_uploads_playlist_id",
+            params=params,
+            fetch=lambda: execute_cached_request(
+                function_name="get_uploads_playlist_id",
+                params=params,
+                request=self.client.channels().list(
+                    part="contentDetails", id=channel_id
+                ),
+            ),
+        )
+        if not response.get("items"):
+            return None
+        return response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
 
-    @manage_rate_limit_throttling
-    def get_video_ids_for_channel(
+    def get_playlist_page(
         self,
-        channel_id: str,
-        max_results_total: int = 20,
-        max_results_per_query: int = 20,
-        order: str = "date",
-    ) -> List[str]:
-        """Get all the videos that are available for a given channel.
-
-        TODO: for a data pipeline, we would only get the videos that are new.
-        A future optimization would be to update this query only by new videos,
-        or to redesign this as a handler that is only triggered when a new
-        video is dropped.
-        # https://developers.google.com/resources/api-libraries/documentation/youtube/v3/python/latest/youtube_v3.search.html
+        playlist_id: str,
+        page_index: int,
+        page_token: Optional[str],
+        max_results_per_query: int,
+    ) -> Dict:
+        """Get a page of the items in a playlist.
 
-        TODO: need to think of a better caching strategy since pagination
-        tokens expire (it seems?)
-        """  # noqa
+        Pages are cached by playlist ID and page index, so that they can be
+        reused across runs. `page_token` is the "nextPageToken" of the previous
+        page (None for the first page).
+        """
         params = {
-            "channel_id": channel_id,
-            "max_results_total": max_results_total,
+            "playlist_id": playlist_id,
+            "page_index": page_index,
             "max_results_per_query": max_results_per_query,
-            "order": order,
         }
-        cached_data = get_cached_data(
-            function_name="get_video_ids_for_channel", params=params
-        )
-        if cached_data and len(cached_data) > 0:
-            return cached_data
-        response = (
-            self.client.search()
-            .list(
-                part="id",
-                channelId=channel_id,
-                maxResults=max_results_per_query,
-                order=order,
-                type="video",
-            )
-            .execute()
+        request_params = {
+            "part": "contentDetails",
+            "playlistId": playlist_id,
+            "maxResults": max_results_per_query,
+        }
+        if page_token:
+            request_params["pageToken"] = page_token
+        return get_or_fetch(
+            function_name="get_playlist_page",
+            params=params,
+            fetch=lambda: execute_cached_request(
+                function_name="get_playlist_page",
+                params=params,
+                request=self.client.playlistItems().list(**request_params),
+            ),
         )
 
-        next_page_token = response.get("nextPageToken", None)
-        video_ids = [
-            item["id"]["videoId"]
-            for item in response.get("items", [])
-            if item["id"]["kind"] == "youtube#video"
+    @manage_rate_limit_throttling
+    def get_video_ids_for_channel(
+        self,
+        channel_id: str,
+        max_results_total: Optional[int] = 20,
+        max_results_per_query: int = constants.MAX_PLAYLIST_ITEMS_PER_REQUEST,
+        published_after: Optional[str] = None,
+        stop_at_video_id: Optional[str] = None,
+    ) -> List[str]:
+        """Get all the videos that are available for a given channel,
+        newest-first.
+
+        The videos are listed from the channel's uploads playlist, which costs
+        1 quota unit per page (vs. 100 for a search), and whose pages are
+        cached (see `get_playlist_page`).
+
+        For incremental syncs, pass the high-water mark from the last sync:
+        pagination stops at the first video published before
+        `published_after`, or at `stop_at_video_id`, the last video that we
+        already have (which is excluded from the results). Pass
+        `max_results_total=None` to fetch all the new videos, however many
+        there are.
+        # https://developers.google.com/youtube/v3/docs/playlistItems/list
+        """
+        return [
+            video_id
+            for video_ids_page in self.iter_video_id_pages_for_channel(
+                channel_id=channel_id,
+                max_results_total=max_results_total,
+                max_results_per_query=max_results_per_query,
+                published_after=published_after,
+                stop_at_video_id=stop_at_video_id,
+            )
+            for video_id in video_ids_page
         ]
 
-        while True and len(video_ids) < max_results_total:
-            pagination_params = {
-                "part": "id",
-                "channelId": channel_id,
-                "maxResults": max_results_per_query,
-                "order": order,
-                "type": "video",
-                "pageToken": next_page_token,
-            }
-            cached_data = get_cached_data(
-                function_name="get_channel_metadata", params=pagination_params
-            )
-            cached_data = None
-            response = (
-                cached_data
-                if cached_data and len(cached_data) > 0
-                else self.client.search().list(**pagination_params).execute()
+    def iter_video_id_pages_for_channel(
+        self,
+        channel_id: str,
+        max_results_total: Optional[int] = 20,
+        max_results_per_query: int = constants.MAX_PLAYLIST_ITEMS_PER_REQUEST,
+        published_after: Optional[str] = None,
+        stop_at_video_id: Optional[str] = None,
+    ) -> Iterator[List[str]]:
+        """Yield the IDs of the videos for a given channel, one page of the
+        channel's uploads playlist at a time. See `get_video_ids_for_channel`.
+        """
+        playlist_id = self.get_uploads_playlist_id(channel_id)
+        if playlist_id is None:
+            logger.warning(f"Channel {channel_id} not found, so it has no videos.")
+            return
+        page_index = 0
+        page_token: Optional[str] = None
+        num_video_ids = 0
+        while max_results_total is None or num_video_ids < max_results_total:
+            response = self.get_playlist_page(
+                playlist_id=playlist_id,
+                page_index=page_index,
+                page_token=page_token,
+                max_results_per_query=max_results_per_query,
             )
-            cache_data(
-                function_name="get_channel_metadata",
-                params=pagination_params,
-                data=response,
+            video_ids, reached_known_video = get_new_video_ids_from_playlist_page(
+                response=response,
+                published_after=published_after,
+                stop_at_video_id=stop_at_video_id,
             )
+            if max_results_total is not None:
+                video_ids = video_ids[: max_results_total - num_video_ids]
+            num_video_ids += len(video_ids)
+            if video_ids:
+                yield video_ids
 
-            if "items" in response:
-                video_ids.extend(
-                    [
-                        item["id"]["videoId"]
-                        for item in response.get("items", [])
-                        if item["id"]["kind"] == "youtube#video"
-                    ]
-                )
-            if "nextPageToken" in response:
-                next_page_token = response["nextPageToken"]
-            else:
-                break
-
-        return video_ids[:max_results_total]
+            page_token = response.get("nextPageToken", None)
+            if not page_token or reached_known_video:
+                return
+            page_index += 1
 
     @manage_rate_limit_throttling
     def get_video_details_from_id(
@@ -189,17 +436,87 @@ class YoutubeClient:
     ) -> Dict:
         """Given a video ID, get the details about the video."""
         params = {"part": part_str, "id": video_id}
-        cached_data = get_cached_data(
-            function_name="get_video_details_from_id", params=params
+        return get_or_fetch(
+            function_name="get_video_details_from_id",
+            params=params,
+            fetch=lambda: execute_cached_request(
+                function_name="get_video_details_from_id",
+                params=params,
+                request=self.client.videos().list(**params),
+            ),
         )
-        if cached_data and len(cached_data) > 0:
-            return cached_data
 
-        response = self.client.videos().list(**params).execute()
-        cache_data(
-            function_name="get_video_details_from_id", params=params, data=response
+    def _list_videos(self, video_ids: List[str], part_str: str) -> Dict:
+        """Get the details for up to `MAX_VIDEO_IDS_PER_REQUEST` videos in a
+        single `videos().list` call.
+
+        Errors are raised rather than returned: a failed chunk would otherwise
+        look like a chunk of deleted videos, and be skipped for good once the
+        channel's sync state moves past it.
+        """
+        return execute_request(
+            self.client.videos().list(part=part_str, id=",".join(video_ids))
         )
-        return response
+
+    def get_video_details_from_ids(
+        self, video_ids: List[str], part_str: str = "snippet,statistics"
+    ) -> Dict[str, Dict]:
+        """Given a list of video IDs, get the details about each video.
+
+        IDs are grouped into chunks of up to `MAX_VIDEO_IDS_PER_REQUEST` per
+        API call. Each video is cached under the same key as
+        `get_video_details_from_id`, so only cache misses hit the API. All
+        the cache lookups (and writes, per chunk) share one round trip, and
+        videos that another worker is already fetching aren't fetched again.
+
+        Returns a dictionary mapping each video ID to a response in the same
+        format as `get_video_details_from_id`. Videos that the API doesn't
+        return (e.g., deleted or private videos) map to an empty response.
+        """
+
+        def fetch_many(params_list: List[Dict]) -> List[Optional[Dict]]:
+            video_id_to_response: Dict[str, Dict] = {}
+            for video_ids_chunk in chunk_list(
+                [params["id"] for params in params_list],
+                constants.MAX_VIDEO_IDS_PER_REQUEST,
+            ):
+                response = self._list_videos(
+                    video_ids=video_ids_chunk, part_str=part_str
+                )
+                chunk_video_id_to_response = split_video_list_response(response)
+                cache_data_many(
+                    function_name="get_video_details_from_id",
+                    params_list=[
+                        {"part": part_str, "id": video_id}
+                        for video_id in chunk_video_id_to_response
+                    ],
+                    data_list=list(chunk_video_id_to_response.values()),
+                )
+                video_id_to_response.update(chunk_video_id_to_response)
+            return [video_id_to_response.get(params["id"]) for params in params_list]
+
+        unique_video_ids = list(dict.fromkeys(video_ids))
+        video_id_to_response = {
+            video_id: response
+            for video_id, response in zip(
+                unique_video_ids,
+                get_or_fetch_many(
+                    function_name="get_video_details_from_id",
+                    params_list=[
+                        {"part": part_str, "id": video_id}
+                        for video_id in unique_video_ids
+                    ],
+                    fetch_many=fetch_many,
+                ),
+            )
+            if response
+        }
+
+        empty_response = {"items": [], "pageInfo": {"totalResults": 0}}
+        return {
+            video_id: video_id_to_response.get(video_id, empty_response)
+            for video_id in video_ids
+        }
 
     def parse_video_response(
         self, video_response: Dict
@@ -213,38 +530,71 @@ class YoutubeClient:
         extraction and that transformation should happen downstream.
         """
         metadata: Dict[str, str] = video_response["items"][0]["snippet"]
-        video_statistics: Dict[str, Union[str, int]] = video_response["items"][0][
-            "statistics"
-        ]
-        video_statistics["viewCount"] = int(video_statistics.get("viewCount"), 0)  # type: ignore
-        video_statistics["likeCount"] = int(video_statistics.get("likeCount"), 0)  # type: ignore
-        video_statistics["favoriteCount"] = int(
-            video_statistics.get("favoriteCount"), 0  # type: ignore
-        )
-        video_statistics["commentCount"] = int(video_statistics.get("commentCount"), 0)  # type: ignore
+        # build a new dict rather than converting the counts in place, since
+        # the response may be shared with the in-process cache.
+        raw_video_statistics: Dict = video_response["items"][0]["statistics"]
+        video_statistics: Dict[str, Union[str, int]] = {
+            **raw_video_statistics,
+            **{
+                field: int(raw_video_statistics.get(field, 0))
+                for field in ("viewCount", "likeCount", "favoriteCount", "commentCount")
+            },
+        }
         return metadata, video_statistics
 
     def get_video_stats_for_channel_by_video(
         self,
         channel_id: str,
-        max_results_total: int = 20,
-        max_results_per_query: int = 20,
-        order: str = "date",
+        max_results_total: Optional[int] = 20,
+        max_results_per_query: int = constants.MAX_PLAYLIST_ITEMS_PER_REQUEST,
+        published_after: Optional[str] = None,
+        stop_at_video_id: Optional[str] = None,
     ) -> List[Dict]:
         """Gets statistics and metadata for each video in a channel, and
         returns as a list.
+
+        See `get_video_ids_for_channel` for incremental syncs.
         """
-        video_ids = self.get_video_ids_for_channel(
+        return [
+            video_info
+            for video_info_page in self.iter_video_stats_pages_for_channel(
+                channel_id=channel_id,
+                max_results_total=max_results_total,
+                max_results_per_query=max_results_per_query,
+                published_after=published_after,
+                stop_at_video_id=stop_at_video_id,
+            )
+            for video_info in video_info_page
+        ]
+
+    def iter_video_stats_pages_for_channel(
+        self,
+        channel_id: str,
+        max_results_total: Optional[int] = 20,
+        max_results_per_query: int = constants.MAX_PLAYLIST_ITEMS_PER_REQUEST,
+        published_after: Optional[str] = None,
+        stop_at_video_id: Optional[str] = None,
+    ) -> Iterator[List[Dict]]:
+        """Yield the statistics and metadata for the videos in a channel, one
+        page of the channel's uploads playlist at a time, so that each page
+        can be written before the next one is fetched."""
+        for video_ids in self.iter_video_id_pages_for_channel(
             channel_id=channel_id,
             max_results_total=max_results_total,
             max_results_per_query=max_results_per_query,
-            order=order,
-        )
-
+            published_after=published_after,
+            stop_at_video_id=stop_at_video_id,
+        ):
+            video_id_to_response = self.get_video_details_from_ids(video_ids=video_ids)
+            yield self.parse_video_responses(video_id_to_response)
+
+    def parse_video_responses(
+        self, video_id_to_response: Dict[str, Dict]
+    ) -> List[Dict]:
+        """Parse the responses from `get_video_details_from_ids`, skipping the
+        videos that the API didn't return."""
         video_info_list = []
-
-        for video_id in video_ids:
-            video_response = self.get_video_details_from_id(video_id=video_id)
+        for video_id, video_response in video_id_to_response.items():
             if video_response["pageInfo"]["totalResults"] == 0:
                 continue
 
@@ -2,3 +2,29 @@ from lib.constants import YOUTUBE_CHANNEL_ID, YOUTUBE_CHANNEL_NAME
 
 # NOTE: for testing, just one channel. But could easily add more.
 MAP_CHANNEL_HANDLE_TO_ID = {YOUTUBE_CHANNEL_NAME: YOUTUBE_CHANNEL_ID}
+
+# the videos.list endpoint accepts at most 50 comma-separated IDs per request.
+# https://developers.google.com/youtube/v3/docs/videos/list#id
+MAX_VIDEO_IDS_PER_REQUEST = 50
+
+# the playlistItems.list endpoint returns at most 50 items per page.
+# https://developers.google.com/youtube/v3/docs/playlistItems/list#maxResults
+MAX_PLAYLIST_ITEMS_PER_REQUEST = 50
+
+# the first (or a full) sync of a channel only fetches its latest videos.
+# Incremental syncs fetch all the videos published since the last sync.
+MAX_VIDEOS_PER_FIRST_SYNC = 20
+
+# max number of channels to fetch from the YouTube API at the same time.
+YOUTUBE_SYNC_MAX_WORKERS = 4
+
+# max number of fetched batches (e.g., pages of videos) waiting to be written
+# to the DB. Once reached, fetching pauses until the writer catches up.
+YOUTUBE_SYNC_MAX_QUEUED_BATCHES = 8
+
+# client-side rate limits for the YouTube API, shared across all clients.
+YOUTUBE_RATE_LIMIT_REQUESTS_PER_SECOND = 10
+YOUTUBE_RATE_LIMIT_BURST = 10
+YOUTUBE_RATE_LIMIT_MAX_RETRIES = 5
+YOUTUBE_RATE_LIMIT_BASE_BACKOFF_SECONDS = 1
+YOUTUBE_RATE_LIMIT_MAX_BACKOFF_SECONDS = 60
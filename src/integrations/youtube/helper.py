@@ -1,10 +1,11 @@
 from dataclasses import asdict
-from typing import Dict
+from typing import Dict, List, Optional
 
 from integrations.youtube.models import (
     VideoMetadata,
     VideoStatistics,
     YoutubeChannel,
+    YoutubeChannelSyncState,
     YoutubeVideo,
 )
 
@@ -61,3 +62,39 @@ def flatten_video(video: YoutubeVideo) -> Dict:
         **asdict(video.metadata),
         **asdict(video.statistics),
     }
+
+
+def get_updated_channel_sync_state(
+    channel_id: str,
+    videos: List[YoutubeVideo],
+    previous_sync_state: Optional[YoutubeChannelSyncState],
+    synctimestamp: str,
+) -> Optional[YoutubeChannelSyncState]:
+    """Get the new high-water mark for a channel, given the newly synced
+    videos. Returns None if the channel has never had any videos synced."""
+    if not videos:
+        if previous_sync_state is None:
+            return None
+        return YoutubeChannelSyncState(
+            channel_id=channel_id,
+            latest_video_id=previous_sync_state.latest_video_id,
+            latest_published_at=previous_sync_state.latest_published_at,
+            synctimestamp=synctimestamp,
+        )
+    latest_video = max(videos, key=lambda video: video.metadata.published_at)
+    if (
+        previous_sync_state is not None
+        and previous_sync_state.latest_published_at > latest_video.metadata.published_at
+    ):
+        return get_updated_channel_sync_state(
+            channel_id=channel_id,
+            videos=[],
+            previous_sync_state=previous_sync_state,
+            synctimestamp=synctimestamp,
+        )
+    return YoutubeChannelSyncState(
+        channel_id=channel_id,
+        latest_video_id=latest_video.video_id,
+        latest_published_at=latest_video.metadata.published_at,
+        synctimestamp=synctimestamp,
+    )
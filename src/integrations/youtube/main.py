@@ -1,38 +1,111 @@
 """Parent file encompassing extraction with the YouTube API.
 
 Extracts data from YouTube API, for each channel, and then dumps into SQLite
-tables.
+tables. Channels are fetched concurrently, and each page of videos is
+written as soon as it is fetched (see `integrations.sync_engine`).
+
+Syncs are incremental by default: each channel's high-water mark (its most
+recently published video) is stored in the `youtube_sync_state` table, and
+later syncs only fetch videos published after it.
 """
+from functools import partial
+import threading
+from typing import Iterator, List, Union
+
+from integrations.sync_engine import run_streaming_sync
 from integrations.youtube import constants, helper
 from integrations.youtube.client import YoutubeClient
-from integrations.youtube.sqlite_helper import write_youtube_data_to_db
+from integrations.youtube.models import (
+    YoutubeChannel,
+    YoutubeChannelSyncState,
+    YoutubeVideo,
+)
+from integrations.youtube.sqlite_helper import (
+    bulk_write_youtube_data_to_db,
+    get_channel_sync_state,
+)
+from lib.constants import CURRENT_SYNCTIMESTAMP
+from lib.decorators import timed
 from lib.log.logger import Logger
 
 logger = Logger(__name__)
 
+thread_local = threading.local()
+
+YoutubeInstance = Union[YoutubeChannel, YoutubeVideo, YoutubeChannelSyncState]
+
+
+def get_thread_local_client() -> YoutubeClient:
+    """Get the YouTube client for the current thread.
+
+    The HTTP transport used by the Google API client isn't thread-safe, so
+    each worker thread needs its own client.
+    """
+    if not hasattr(thread_local, "client"):
+        thread_local.client = YoutubeClient()
+    return thread_local.client
 
-def main() -> None:
-    client = YoutubeClient()
 
-    for channel_name, channel_id in constants.MAP_CHANNEL_HANDLE_TO_ID.items():
-        channel_metadata = client.get_channel_metadata(channel_name)
-        channel_id = channel_metadata["channelId"]
-        video_metadata_list = client.get_video_stats_for_channel_by_video(
-            channel_id=channel_id
-        )
-        channel = helper.create_channel_dataclass_instance(channel_metadata)
+def fetch_channel_batches(
+    channel_name: str, channel_id: str, full_sync: bool = False
+) -> Iterator[List[YoutubeInstance]]:
+    """Fetch the channel metadata and the videos for a given channel, and
+    yield them in batches to write: the channel, then one batch of videos per
+    page of search results, then the channel's updated sync state.
+
+    Unless `full_sync` is set, only fetches the videos published since the
+    last sync of the channel: all of them, since any that were skipped would
+    be behind the new high-water mark and never fetched. The sync state comes
+    last so that it is only written once all of the channel's new videos are.
+    """
+    client = get_thread_local_client()
+    channel_metadata = client.get_channel_metadata(channel_name)
+    channel_id = channel_metadata["channelId"]
+    sync_state = None if full_sync else get_channel_sync_state(channel_id)
+    yield [helper.create_channel_dataclass_instance(channel_metadata)]
+
+    # only the newest video is needed for the sync state.
+    latest_videos: List[YoutubeVideo] = []
+    for video_metadata_page in client.iter_video_stats_pages_for_channel(
+        channel_id=channel_id,
+        max_results_total=None if sync_state else constants.MAX_VIDEOS_PER_FIRST_SYNC,
+        published_after=sync_state.latest_published_at if sync_state else None,
+        stop_at_video_id=sync_state.latest_video_id if sync_state else None,
+    ):
         videos = [
             helper.create_video_dataclass_instance(video_metadata)
-            for video_metadata in video_metadata_list
+            for video_metadata in video_metadata_page
+        ]
+        if not videos:
+            continue
+        yield videos
+        latest_videos = [
+            max(
+                [*latest_videos, *videos],
+                key=lambda video: video.metadata.published_at,
+            )
         ]
-        write_youtube_data_to_db(channel)
-        for video in videos:
-            write_youtube_data_to_db(video)
-        logger.info(
-            "Completed getting updated channel and episode data for channel"
-            f"{channel_name} with id={channel_id}. Added {len(videos)} "
-            f"episodes to DB for channel {channel_name}"
-        )
+
+    updated_sync_state = helper.get_updated_channel_sync_state(
+        channel_id=channel_id,
+        videos=latest_videos,
+        previous_sync_state=sync_state,
+        synctimestamp=CURRENT_SYNCTIMESTAMP,
+    )
+    if updated_sync_state:
+        yield [updated_sync_state]
+
+
+@timed("pipeline_stage_duration_seconds", stage="youtube_sync")
+def main(full_sync: bool = False) -> None:
+    run_streaming_sync(
+        integration="youtube",
+        name_to_id_map=constants.MAP_CHANNEL_HANDLE_TO_ID,
+        fetch_batches=partial(fetch_channel_batches, full_sync=full_sync),
+        write_batch=bulk_write_youtube_data_to_db,
+        max_workers=constants.YOUTUBE_SYNC_MAX_WORKERS,
+        max_queued_batches=constants.YOUTUBE_SYNC_MAX_QUEUED_BATCHES,
+    )
     logger.info("-" * 10)
     logger.info("Completed YouTube sync.")
 
@@ -47,3 +47,15 @@ class YoutubeVideo:
     metadata: VideoMetadata
     statistics: VideoStatistics
     synctimestamp: str
+
+
+@dataclass
+class YoutubeChannelSyncState:
+    """Class that keeps track of the high-water mark of a channel's videos,
+    so that the next sync only needs to fetch newer videos."""
+
+    __table_name__ = "youtube_sync_state"
+    channel_id: str
+    latest_video_id: str
+    latest_published_at: str
+    synctimestamp: str
@@ -1,30 +1,44 @@
 """SQLite helper utilities for writing YouTube data."""
-from typing import Union
+from collections import defaultdict
+from dataclasses import asdict
+from typing import Dict, List, Optional, Sequence, Union
 
 from db.sql import helper
-from db.sql.helper import conn, cursor
 from integrations.youtube.helper import flatten_video
-from integrations.youtube.models import YoutubeChannel, YoutubeVideo
+from integrations.youtube.models import (
+    YoutubeChannel,
+    YoutubeChannelSyncState,
+    YoutubeVideo,
+)
+
+
+def bulk_write_youtube_data_to_db(
+    instances: Sequence[Union[YoutubeChannel, YoutubeVideo, YoutubeChannelSyncState]]
+) -> None:
+    """Upserts a batch of Channel, Video and/or sync state instances into
+    their respective SQLite tables, with one transaction per table."""
+    table_name_to_rows: Dict[str, List[Dict]] = defaultdict(list)
+    for instance in instances:
+        instance_dict = (
+            flatten_video(instance)
+            if isinstance(instance, YoutubeVideo)
+            else asdict(instance)
+        )
+        table_name_to_rows[instance.__table_name__].append(instance_dict)
+
+    for table_name, rows in table_name_to_rows.items():
+        helper.upsert_rows(table_name=table_name, rows=rows)
 
 
 def write_youtube_data_to_db(instance: Union[YoutubeChannel, YoutubeVideo]) -> None:
     """Writes either the Channel or Video instance to their respective
     SQLite tables."""
-    table_name = instance.__table_name__
-    if isinstance(instance, YoutubeVideo):
-        instance_dict = flatten_video(instance)
-    else:
-        instance_dict = instance.__dict__
-    instance_dict.pop("__table_name__", None)
-
-    if not helper.check_if_table_exists(cursor=cursor, table_name=table_name):
-        helper.create_table(conn=conn, cursor=cursor, table_name=table_name)
-
-    # only write to the SQLite DB if the primary key is unique
-    row_insertion_is_valid = helper.single_row_insertion_is_valid(
-        row_data=instance_dict, table_name=table_name
+    bulk_write_youtube_data_to_db([instance])
+
+
+def get_channel_sync_state(channel_id: str) -> Optional[YoutubeChannelSyncState]:
+    """Get the sync state from the last sync of the channel, if any."""
+    row = helper.get_row_by_primary_key(
+        table_name=YoutubeChannelSyncState.__table_name__, pk_value=channel_id
     )
-    if row_insertion_is_valid:
-        helper.write_to_database(
-            conn=conn, cursor=cursor, table_name=table_name, data=instance_dict
-        )
+    return YoutubeChannelSyncState(**row) if row else None
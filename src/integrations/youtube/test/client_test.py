@@ -1,2 +1,370 @@
 """Tests for methods in client.py"""
-pass
+from typing import Callable, Dict, List, Optional
+
+from googleapiclient.errors import HttpError
+import httplib2
+import pytest
+
+from db.redis.redis_caching import CacheEntry
+from integrations.youtube import client as client_module
+from integrations.youtube.client import (
+    chunk_list,
+    get_request_endpoint_and_params,
+    split_video_list_response,
+    YoutubeClient,
+)
+from lib.sync_enrichment import METADATA_TO_HYDRATE
+
+
+def make_video_item(video_id: str) -> Dict:
+    return {
+        "kind": "youtube#video",
+        "etag": f"etag-{video_id}",
+        "id": video_id,
+        "snippet": {"title": f"title-{video_id}"},
+        "statistics": {"viewCount": "1"},
+    }
+
+
+class FakeRequest:
+    def __init__(self, response: Dict) -> None:
+        self.response = response
+        self.headers: Dict[str, str] = {}
+        self.uri = "https://youtube.googleapis.com/youtube/v3/videos?key=api-key"
+
+    def execute(self) -> Dict:
+        etag = self.headers.get("If-None-Match")
+        if etag is not None and etag == self.response.get("etag"):
+            raise HttpError(httplib2.Response({"status": 304}), b"")
+        return self.response
+
+
+class FakeVideosResource:
+    def __init__(self, calls: List[List[str]]) -> None:
+        self.calls = calls
+
+    def list(self, part: str, id: str) -> FakeRequest:
+        video_ids = id.split(",")
+        self.calls.append(video_ids)
+        if "failing" in video_ids:
+            return FailingRequest({})
+        # simulate a deleted video that the API doesn't return.
+        items = [make_video_item(video_id) for video_id in video_ids]
+        items = [item for item in items if item["id"] != "deleted"]
+        return FakeRequest(
+            {
+                "kind": "youtube#videoListResponse",
+                "etag": f"etag-{id}",
+                "items": items,
+            }
+        )
+
+
+class FailingRequest(FakeRequest):
+    def execute(self) -> Dict:
+        raise HttpError(httplib2.Response({"status": 403}), b"quotaExceeded")
+
+
+class FakeChannelsResource:
+    def list(self, part: str, id: str) -> FakeRequest:
+        # the API returns no items for channels that don't exist.
+        if id == "deleted":
+            return FakeRequest({"items": []})
+        if id == "failing":
+            return FailingRequest({})
+        return FakeRequest(
+            {
+                "items": [
+                    {"contentDetails": {"relatedPlaylists": {"uploads": f"UU{id}"}}}
+                ]
+            }
+        )
+
+
+class FakeSearchResource:
+    def list(self, part: str, type: str, q: str) -> FakeRequest:
+        return FakeRequest(
+            {"etag": "etag-search", "items": [{"snippet": {"title": q}}]}
+        )
+
+
+class FakePlaylistItemsResource:
+    """Returns the channel's uploads newest-first, 2 per page, published a
+    day apart."""
+
+    def __init__(self, playlist_items_calls: List[Dict]) -> None:
+        self.playlist_items_calls = playlist_items_calls
+
+    def list(self, **kwargs: Dict) -> FakeRequest:
+        self.playlist_items_calls.append(kwargs)
+        page = int(kwargs.get("pageToken") or 0)
+        items = [
+            {
+                "contentDetails": {
+                    "videoId": f"video-{i}",
+                    "videoPublishedAt": f"2023-09-{20 - i:02d}T00:00:00Z",
+                }
+            }
+            for i in range(page * 2, page * 2 + 2)
+        ]
+        return FakeRequest({"items": items, "nextPageToken": str(page + 1)})
+
+
+class FakeResource:
+    def __init__(self) -> None:
+        self.calls: List[List[str]] = []
+        self.playlist_items_calls: List[Dict] = []
+
+    def videos(self) -> FakeVideosResource:
+        return FakeVideosResource(self.calls)
+
+    def channels(self) -> FakeChannelsResource:
+        return FakeChannelsResource()
+
+    def search(self) -> FakeSearchResource:
+        return FakeSearchResource()
+
+    def playlistItems(self) -> FakePlaylistItemsResource:
+        return FakePlaylistItemsResource(self.playlist_items_calls)
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    cache: Dict[str, Dict] = {}
+
+    def fake_get_cached_data(function_name: str, params: Dict):
+        return cache.get(f"{function_name}:{params.get('id')}")
+
+    def fake_cache_data(
+        function_name: str, params: Dict, data: Dict, etag: Optional[str] = None
+    ) -> None:
+        cache[f"{function_name}:{params.get('id')}"] = data
+
+    def fake_get_cached_data_many(
+        function_name: str, params_list: List[Dict]
+    ) -> List[Optional[Dict]]:
+        return [fake_get_cached_data(function_name, params) for params in params_list]
+
+    def fake_cache_data_many(
+        function_name: str, params_list: List[Dict], data_list: List[Dict]
+    ) -> None:
+        for params, data in zip(params_list, data_list):
+            fake_cache_data(function_name, params, data)
+
+    def fake_get_or_fetch_many(
+        function_name: str, params_list: List[Dict], fetch_many: Callable
+    ) -> List[Optional[Dict]]:
+        results = fake_get_cached_data_many(function_name, params_list)
+        missing_indices = [i for i, data in enumerate(results) if not data]
+        if missing_indices:
+            fetched_results = fetch_many([params_list[i] for i in missing_indices])
+            for i, data in zip(missing_indices, fetched_results):
+                results[i] = data
+        return results
+
+    monkeypatch.setattr(client_module, "get_cached_data", fake_get_cached_data)
+    monkeypatch.setattr(client_module, "cache_data", fake_cache_data)
+    monkeypatch.setattr(client_module, "cache_data_many", fake_cache_data_many)
+    monkeypatch.setattr(client_module, "get_or_fetch_many", fake_get_or_fetch_many)
+    monkeypatch.setattr(
+        client_module, "get_or_fetch", lambda function_name, params, fetch: fetch()
+    )
+    monkeypatch.setattr(
+        client_module, "get_stale_cache_entry", lambda function_name, params: None
+    )
+    return cache
+
+
+@pytest.fixture
+def youtube_client():
+    client = YoutubeClient.__new__(YoutubeClient)
+    client.client = FakeResource()
+    return client
+
+
+def test_chunk_list():
+    chunks = list(chunk_list([str(i) for i in range(120)], 50))
+    assert [len(chunk) for chunk in chunks] == [50, 50, 20]
+
+
+def test_split_video_list_response():
+    response = {
+        "kind": "youtube#videoListResponse",
+        "items": [make_video_item("a"), make_video_item("b")],
+    }
+    split_response = split_video_list_response(response)
+    assert list(split_response.keys()) == ["a", "b"]
+    assert split_response["a"]["items"][0]["id"] == "a"
+    assert split_response["a"]["pageInfo"]["totalResults"] == 1
+
+
+def test_get_request_endpoint_and_params_leaves_out_api_key():
+    request = FakeRequest({})
+    request.uri += "&part=snippet&id=a%2Cb"
+    assert get_request_endpoint_and_params(request) == (  # type: ignore
+        "https://youtube.googleapis.com/youtube/v3/videos",
+        {"part": "snippet", "id": "a,b"},
+    )
+
+
+def test_get_video_details_from_ids_batches_requests(fake_cache, youtube_client):
+    video_ids = [f"video-{i}" for i in range(120)]
+    video_id_to_response = youtube_client.get_video_details_from_ids(video_ids)
+
+    assert [len(call) for call in youtube_client.client.calls] == [50, 50, 20]
+    assert list(video_id_to_response.keys()) == video_ids
+    assert len(fake_cache) == 120
+
+
+def test_get_video_details_from_ids_only_fetches_cache_misses(
+    fake_cache, youtube_client
+):
+    youtube_client.get_video_details_from_ids(["a", "b"])
+    youtube_client.client.calls.clear()
+
+    video_id_to_response = youtube_client.get_video_details_from_ids(
+        ["a", "b", "c", "deleted"]
+    )
+
+    assert youtube_client.client.calls == [["c", "deleted"]]
+    assert video_id_to_response["c"]["items"][0]["id"] == "c"
+    assert video_id_to_response["deleted"]["pageInfo"]["totalResults"] == 0
+
+
+def test_get_video_details_from_ids_raises_when_a_chunk_fails(
+    fake_cache, youtube_client
+):
+    video_ids = [f"video-{i}" for i in range(60)] + ["failing"]
+    with pytest.raises(HttpError):
+        youtube_client.get_video_details_from_ids(video_ids)
+
+    # the failed chunk isn't cached as if its videos had been deleted.
+    assert len(fake_cache) == 50
+    assert "get_video_details_from_id:video-50" not in fake_cache
+
+
+def test_parse_video_responses_leaves_cached_responses_unchanged(
+    fake_cache, youtube_client
+):
+    # the cache hands back the objects that it stores, like the in-process
+    # cache does, so parsing the same video twice must not fail.
+    for _ in range(2):
+        video_id_to_response = youtube_client.get_video_details_from_ids(["a"])
+        video_infos = youtube_client.parse_video_responses(video_id_to_response)
+        assert video_infos[0]["statistics"] == {
+            "viewCount": 1,
+            "likeCount": 0,
+            "favoriteCount": 0,
+            "commentCount": 0,
+        }
+    assert fake_cache["get_video_details_from_id:a"]["items"][0]["statistics"] == {
+        "viewCount": "1"
+    }
+
+
+def test_get_channel_metadata_only_caches_the_api_response(
+    monkeypatch, fake_cache, youtube_client
+):
+    channel_metadata = youtube_client.get_channel_metadata("channel")
+    assert channel_metadata == {"title": "channel", **METADATA_TO_HYDRATE}
+    assert fake_cache["get_channel_metadata:None"] == {"title": "channel"}
+
+    # on a cache hit, the sync metadata is still from this sync.
+    monkeypatch.setattr(
+        client_module,
+        "get_or_fetch",
+        lambda function_name, params, fetch: {"title": "cached"},
+    )
+    channel_metadata = youtube_client.get_channel_metadata("channel")
+    assert channel_metadata == {"title": "cached", **METADATA_TO_HYDRATE}
+
+
+def test_get_video_ids_for_channel_stops_at_known_video(fake_cache, youtube_client):
+    video_ids = youtube_client.get_video_ids_for_channel(
+        channel_id="channel",
+        max_results_total=100,
+        published_after="2023-09-10T00:00:00Z",
+        stop_at_video_id="video-4",
+    )
+
+    assert video_ids == ["video-0", "video-1", "video-2", "video-3"]
+    playlist_items_calls = youtube_client.client.playlist_items_calls
+    assert len(playlist_items_calls) == 3
+    assert all(call["playlistId"] == "UUchannel" for call in playlist_items_calls)
+
+
+def test_get_video_ids_for_channel_without_max_results_total(
+    fake_cache, youtube_client
+):
+    video_ids = youtube_client.get_video_ids_for_channel(
+        channel_id="channel",
+        max_results_total=None,
+        max_results_per_query=2,
+        stop_at_video_id="video-15",
+    )
+
+    assert video_ids == [f"video-{i}" for i in range(15)]
+
+
+def test_get_video_ids_for_channel_stops_at_published_after(fake_cache, youtube_client):
+    video_ids = youtube_client.get_video_ids_for_channel(
+        channel_id="channel",
+        max_results_total=100,
+        published_after="2023-09-18T00:00:00Z",
+    )
+
+    assert video_ids == ["video-0", "video-1", "video-2"]
+    assert len(youtube_client.client.playlist_items_calls) == 2
+
+
+def test_get_video_ids_for_channel_that_does_not_exist(fake_cache, youtube_client):
+    assert youtube_client.get_uploads_playlist_id("deleted") is None
+    video_ids = youtube_client.get_video_ids_for_channel(channel_id="deleted")
+
+    assert video_ids == []
+    assert youtube_client.client.playlist_items_calls == []
+
+
+def test_iter_video_id_pages_for_channel_raises_api_errors(fake_cache, youtube_client):
+    # the error isn't passed on as the playlist ID.
+    with pytest.raises(HttpError):
+        list(youtube_client.iter_video_id_pages_for_channel(channel_id="failing"))
+    assert youtube_client.client.playlist_items_calls == []
+
+
+def test_get_video_details_from_id_revalidates_expired_response(
+    monkeypatch, youtube_client
+):
+    cached: List[Dict] = []
+    stale_response = {"etag": "etag-a", "items": ["stale"]}
+    monkeypatch.setattr(
+        client_module,
+        "get_or_fetch",
+        lambda function_name, params, fetch: fetch(),
+    )
+    monkeypatch.setattr(
+        client_module,
+        "get_stale_cache_entry",
+        lambda function_name, params: CacheEntry(
+            data=stale_response, etag=f"etag-{params['id']}", expires_at=0
+        ),
+    )
+    monkeypatch.setattr(
+        client_module, "cache_data", lambda **kwargs: cached.append(kwargs)
+    )
+
+    # unchanged, so the API replies 304 and the stale response is refreshed.
+    assert youtube_client.get_video_details_from_id("a") == stale_response
+    assert cached[-1]["data"] == stale_response
+
+    # changed, so the API returns the new response.
+    monkeypatch.setattr(
+        client_module,
+        "get_stale_cache_entry",
+        lambda function_name, params: CacheEntry(
+            data=stale_response, etag="old-etag", expires_at=0
+        ),
+    )
+    response = youtube_client.get_video_details_from_id("a")
+    assert response["items"][0]["id"] == "a"
+    assert cached[-1]["etag"] == "etag-a"
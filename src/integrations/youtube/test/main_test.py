@@ -0,0 +1,110 @@
+"""Tests for main.py"""
+from typing import Dict, Iterator, List
+
+from googleapiclient.errors import HttpError
+import httplib2
+
+from benchmarks.fake_clients import FakeYoutubeClient, SyntheticDataset
+from integrations.sync_engine import run_streaming_sync
+from integrations.youtube import constants
+from integrations.youtube import main as main_module
+from integrations.youtube.models import YoutubeChannelSyncState, YoutubeVideo
+
+NUM_VIDEOS = 30
+NUM_NEW_VIDEOS = 25
+
+
+def test_fetch_channel_batches_fetches_all_new_videos(monkeypatch):
+    dataset = SyntheticDataset(num_channels=1, num_episodes_per_channel=NUM_VIDEOS)
+    podcast = dataset.podcasts[0]
+    last_synced_episode = podcast.episodes[NUM_NEW_VIDEOS]
+    sync_state = YoutubeChannelSyncState(
+        channel_id=podcast.youtube_channel_id,
+        latest_video_id=last_synced_episode.youtube_id,
+        latest_published_at=last_synced_episode.published_at.strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        ),
+        synctimestamp="2023-09-10T00:00:00Z",
+    )
+    monkeypatch.setattr(
+        main_module, "get_thread_local_client", lambda: FakeYoutubeClient(dataset)
+    )
+    monkeypatch.setattr(
+        main_module, "get_channel_sync_state", lambda channel_id: sync_state
+    )
+
+    batches = list(
+        main_module.fetch_channel_batches(
+            channel_name=podcast.youtube_channel_name,
+            channel_id=podcast.youtube_channel_id,
+        )
+    )
+
+    assert NUM_NEW_VIDEOS > constants.MAX_VIDEOS_PER_FIRST_SYNC
+    videos: List[YoutubeVideo] = [
+        video for batch in batches[1:-1] for video in batch  # type: ignore
+    ]
+    assert [video.video_id for video in videos] == [
+        episode.youtube_id for episode in podcast.episodes[:NUM_NEW_VIDEOS]
+    ]
+    updated_sync_state = batches[-1][0]
+    assert isinstance(updated_sync_state, YoutubeChannelSyncState)
+    assert updated_sync_state.latest_video_id == podcast.episodes[0].youtube_id
+
+
+def test_fetch_channel_batches_caps_the_first_sync(monkeypatch):
+    dataset = SyntheticDataset(num_channels=1, num_episodes_per_channel=NUM_VIDEOS)
+    podcast = dataset.podcasts[0]
+    monkeypatch.setattr(
+        main_module, "get_thread_local_client", lambda: FakeYoutubeClient(dataset)
+    )
+    monkeypatch.setattr(main_module, "get_channel_sync_state", lambda channel_id: None)
+
+    batches = list(
+        main_module.fetch_channel_batches(
+            channel_name=podcast.youtube_channel_name,
+            channel_id=podcast.youtube_channel_id,
+        )
+    )
+
+    num_videos = sum(len(batch) for batch in batches[1:-1])
+    assert num_videos == constants.MAX_VIDEOS_PER_FIRST_SYNC
+
+
+class FailingYoutubeClient(FakeYoutubeClient):
+    """Fails to get the details of the videos after the first page."""
+
+    def iter_video_stats_pages_for_channel(  # type: ignore
+        self, *args, **kwargs
+    ) -> Iterator[List[Dict]]:
+        pages = super().iter_video_stats_pages_for_channel(*args, **kwargs)
+        yield next(pages)
+        raise HttpError(httplib2.Response({"status": 500}), b"backendError")
+
+
+def test_fetch_channel_batches_keeps_sync_state_when_a_page_fails(monkeypatch):
+    dataset = SyntheticDataset(num_channels=1, num_episodes_per_channel=NUM_VIDEOS)
+    podcast = dataset.podcasts[0]
+    monkeypatch.setattr(
+        main_module, "get_thread_local_client", lambda: FailingYoutubeClient(dataset)
+    )
+    monkeypatch.setattr(main_module, "get_channel_sync_state", lambda channel_id: None)
+    written: List = []
+
+    num_synced = run_streaming_sync(
+        integration="youtube",
+        name_to_id_map={podcast.youtube_channel_name: podcast.youtube_channel_id},
+        fetch_batches=lambda name, id_: main_module.fetch_channel_batches(
+            channel_name=name, channel_id=id_
+        ),
+        write_batch=written.extend,
+        max_workers=1,
+        max_queued_batches=4,
+    )
+
+    assert num_synced == 0
+    assert any(isinstance(instance, YoutubeVideo) for instance in written)
+    # the sync state doesn't move past the videos that weren't fetched.
+    assert not any(
+        isinstance(instance, YoutubeChannelSyncState) for instance in written
+    )
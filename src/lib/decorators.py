@@ -0,0 +1,41 @@
+"""Decorators shared across the pipeline."""
+import asyncio
+from functools import wraps
+from typing import Any, Callable, TypeVar, cast
+
+from lib.metrics import METRICS
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def timed(metric_name: str, **labels: str) -> Callable[[F], F]:
+    """Record how long each call of the decorated function (sync or async)
+    takes in the `metric_name` latency histogram, and count the calls that
+    raise in `<metric_name>_errors_total`."""
+
+    def decorator(func: F) -> F:
+        if asyncio.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with METRICS.time(metric_name, **labels):
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception:
+                        METRICS.increment(f"{metric_name}_errors_total", **labels)
+                        raise
+
+            return cast(F, async_wrapper)
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with METRICS.time(metric_name, **labels):
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    METRICS.increment(f"{metric_name}_errors_total", **labels)
+                    raise
+
+        return cast(F, wrapper)
+
+    return decorator
@@ -0,0 +1,242 @@
+"""In-process metrics for the pipeline: counters, and latency histograms.
+
+Metrics are recorded in `METRICS`, labeled by e.g. API endpoint or table
+name, and exported at the end of a run (see `export_metrics`) both as a
+Prometheus text file, which node_exporter's textfile collector can pick up,
+and as a JSON summary.
+
+Prometheus text format: https://prometheus.io/docs/instrumenting/exposition_formats/
+"""  # noqa
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import urlsplit
+
+from lib.log.logger import Logger
+from lib.rate_limiting import get_rate_limit_counters
+
+logger = Logger(__name__)
+
+current_file_directory = os.path.dirname(os.path.abspath(__file__))
+
+METRICS_DIRECTORY = os.getenv(
+    "METRICS_DIRECTORY", os.path.join(current_file_directory, "log", "metrics")
+)
+
+# upper bounds of the latency histogram buckets.
+LATENCY_BUCKETS_SECONDS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class Histogram:
+    bucket_counts: List[int] = field(
+        default_factory=lambda: [0] * len(LATENCY_BUCKETS_SECONDS)
+    )
+    count: int = 0
+    sum: float = 0.0
+    max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, upper_bound in enumerate(LATENCY_BUCKETS_SECONDS):
+            if value <= upper_bound:
+                self.bucket_counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def get_cumulative_bucket_counts(self) -> List[int]:
+        cumulative_counts = []
+        total = 0
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            cumulative_counts.append(total)
+        return cumulative_counts
+
+    def get_quantile(self, quantile: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket that it falls
+        in (or the max, if it's above the last bucket)."""
+        rank = quantile * self.count
+        for upper_bound, cumulative_count in zip(
+            LATENCY_BUCKETS_SECONDS, self.get_cumulative_bucket_counts()
+        ):
+            if cumulative_count >= rank:
+                return min(upper_bound, self.max)
+        return self.max
+
+
+def get_labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped_labels = [
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    ]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped_labels) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters and histograms, keyed by metric name
+    and labels."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        key = get_labels(labels)
+        with self.lock:
+            counters = self.counters.setdefault(name, {})
+            counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = get_labels(labels)
+        with self.lock:
+            histograms = self.histograms.setdefault(name, {})
+            if key not in histograms:
+                histograms[key] = Histogram()
+            histograms[key].observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe how long the block takes, in seconds, even if it raises."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time, **labels)
+
+    def get_counter(self, name: str, **labels: str) -> float:
+        with self.lock:
+            return self.counters.get(name, {}).get(get_labels(labels), 0)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_prometheus_text(self) -> str:
+        lines = []
+        with self.lock:
+            for name, counters in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(counters.items()):
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+            for name, histograms in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(histograms.items()):
+                    for upper_bound, cumulative_count in zip(
+                        LATENCY_BUCKETS_SECONDS,
+                        histogram.get_cumulative_bucket_counts(),
+                    ):
+                        bucket_labels = get_labels(
+                            {**dict(labels), "le": str(upper_bound)}
+                        )
+                        lines.append(
+                            f"{name}_bucket{format_labels(bucket_labels)} "
+                            f"{cumulative_count}"
+                        )
+                    inf_labels = get_labels({**dict(labels), "le": "+Inf"})
+                    lines.append(
+                        f"{name}_bucket{format_labels(inf_labels)} {histogram.count}"
+                    )
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                    lines.append(
+                        f"{name}_count{format_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """Summary of the metrics, with the estimated p50/p95 of each
+        histogram."""
+        with self.lock:
+            return {
+                "counters": {
+                    name: [
+                        {"labels": dict(labels), "value": value}
+                        for labels, value in sorted(counters.items())
+                    ]
+                    for name, counters in sorted(self.counters.items())
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(labels),
+                            "count": histogram.count,
+                            "sum": round(histogram.sum, 6),
+                            "mean": round(histogram.sum / histogram.count, 6),
+                            "p50": round(histogram.get_quantile(0.5), 6),
+                            "p95": round(histogram.get_quantile(0.95), 6),
+                            "max": round(histogram.max, 6),
+                        }
+                        for labels, histogram in sorted(histograms.items())
+                    ]
+                    for name, histograms in sorted(self.histograms.items())
+                },
+            }
+
+
+METRICS = MetricsRegistry()
+
+
+def get_endpoint_label(endpoint: str) -> str:
+    """Label for an API endpoint: its path, with the IDs in it replaced, so
+    that there's one label value per endpoint rather than per request."""
+    return "/".join(
+        "{id}"
+        if len(segment) >= 16 and any(char.isdigit() for char in segment)
+        else segment
+        for segment in urlsplit(endpoint).path.split("/")
+    )
+
+
+def record_rate_limit_counters() -> None:
+    """Copy the rate limiters' counters (see `lib.rate_limiting`) into the
+    registry, so that they're exported with the other metrics."""
+    with METRICS.lock:
+        for api_name, counters in get_rate_limit_counters().items():
+            for counter_name, value in counters.items():
+                METRICS.counters.setdefault(f"rate_limit_{counter_name}_total", {})[
+                    get_labels({"api": api_name})
+                ] = value
+
+
+def export_metrics(job_name: str, directory: str = METRICS_DIRECTORY) -> None:
+    """Write the metrics to `<job_name>.prom` and `<job_name>.json`."""
+    record_rate_limit_counters()
+    os.makedirs(directory, exist_ok=True)
+    prometheus_path = os.path.join(directory, f"{job_name}.prom")
+    # write then rename, so that the textfile collector never reads a
+    # partially written file.
+    with open(f"{prometheus_path}.tmp", "w") as f:
+        f.write(METRICS.to_prometheus_text())
+    os.replace(f"{prometheus_path}.tmp", prometheus_path)
+    with open(os.path.join(directory, f"{job_name}.json"), "w") as f:
+        json.dump({"job_name": job_name, **METRICS.to_dict()}, f, indent=2)
+    logger.info(f"Exported the metrics for {job_name} to {directory}.")
@@ -0,0 +1,219 @@
+"""Shared rate limiting for the API clients.
+
+Each API gets its own `RateLimiter`, which combines:
+- a token bucket, which spaces out requests so that we stay under the API's
+quota instead of bursting into it.
+- exponential backoff with full jitter when the API throttles us, honoring
+the `Retry-After` header when the API sends one.
+- a retry budget, so that retries can only ever be a fraction of the
+requests that we send, rather than turning into retry storms.
+- counters for requests, throttle events, and retries.
+
+Background on backoff with jitter: https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+"""  # noqa
+import asyncio
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from lib.log.logger import Logger
+
+logger = Logger(__name__)
+
+T = TypeVar("T")
+
+
+class RateLimitExceeded(Exception):
+    """Raised when an API tells us that we've been rate limited."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class RateLimitPolicy:
+    """Rate limit settings for a given API."""
+
+    requests_per_second: float
+    burst: int  # max number of requests that can be sent at once
+    max_retries: int  # max number of retries for a single request
+    base_backoff_seconds: float
+    max_backoff_seconds: float
+    # each request adds this many retries to the retry budget, so that over
+    # time retries can be at most this fraction of all requests.
+    retry_budget_ratio: float = 0.2
+    # max number of retries that can be banked in the retry budget.
+    max_retry_budget: float = 10.0
+
+
+@dataclass
+class RateLimitCounters:
+    requests: int = 0
+    throttled: int = 0
+    retries: int = 0
+    retries_exhausted: int = 0
+    seconds_waited: float = 0.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Tokens refill at `rate` per second, up to
+    `capacity` tokens."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it.
+
+        Tokens can go negative, which queues up callers fairly: each caller
+        waits for the tokens reserved before it to refill.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.last_refill) * self.rate
+            )
+            self.last_refill = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+
+def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    """Parse a `Retry-After` header, which is either a number of seconds or
+    an HTTP date, into a number of seconds."""
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """Rate limiter for a given API. Use `call` (or `call_async`) to send a
+    request through the limiter. The request should raise
+    `RateLimitExceeded` when the API throttles it."""
+
+    def __init__(self, api_name: str, policy: RateLimitPolicy) -> None:
+        self.api_name = api_name
+        self.policy = policy
+        self.bucket = TokenBucket(
+            rate=policy.requests_per_second, capacity=policy.burst
+        )
+        self.counters = RateLimitCounters()
+        self.retry_budget = policy.max_retry_budget
+        self.lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self.lock:
+            self.counters.requests += 1
+            self.retry_budget = min(
+                self.retry_budget + self.policy.retry_budget_ratio,
+                self.policy.max_retry_budget,
+            )
+
+    def get_backoff_seconds(self, error: RateLimitExceeded, attempt: int) -> float:
+        """Get how long to wait before the next retry, or raise the error if
+        we're out of retries."""
+        with self.lock:
+            self.counters.throttled += 1
+            if attempt >= self.policy.max_retries or self.retry_budget < 1:
+                self.counters.retries_exhausted += 1
+                logger.error(
+                    f"Rate limited by {self.api_name} API and out of retries "
+                    f"(attempt={attempt}, retry_budget={self.retry_budget:.1f})."
+                )
+                raise error
+            self.retry_budget -= 1
+            self.counters.retries += 1
+
+        if error.retry_after is not None:
+            # a bad (or very large) Retry-After mustn't stall the worker for
+            # longer than we'd ever back off on our own.
+            backoff_seconds = min(error.retry_after, self.policy.max_backoff_seconds)
+        else:
+            backoff_seconds = random.uniform(
+                0,
+                min(
+                    self.policy.max_backoff_seconds,
+                    self.policy.base_backoff_seconds * 2**attempt,
+                ),
+            )
+        logger.warning(
+            f"Rate limited by {self.api_name} API. Retrying in "
+            f"{backoff_seconds:.2f} seconds (attempt={attempt + 1})."
+        )
+        return backoff_seconds
+
+    def record_wait(self, seconds: float) -> None:
+        if seconds > 0:
+            with self.lock:
+                self.counters.seconds_waited += seconds
+
+    def call(self, request: Callable[[], T]) -> T:
+        """Send a request, waiting for the token bucket and retrying with
+        backoff if the request is throttled."""
+        attempt = 0
+        while True:
+            wait_seconds = self.bucket.reserve()
+            self.record_wait(wait_seconds)
+            time.sleep(wait_seconds)
+            self.record_request()
+            try:
+                return request()
+            except RateLimitExceeded as e:
+                backoff_seconds = self.get_backoff_seconds(e, attempt)
+                self.record_wait(backoff_seconds)
+                time.sleep(backoff_seconds)
+                attempt += 1
+
+    async def call_async(self, request: Callable[[], Awaitable[T]]) -> T:
+        """Async version of `call`."""
+        attempt = 0
+        while True:
+            wait_seconds = self.bucket.reserve()
+            self.record_wait(wait_seconds)
+            await asyncio.sleep(wait_seconds)
+            self.record_request()
+            try:
+                return await request()
+            except RateLimitExceeded as e:
+                backoff_seconds = self.get_backoff_seconds(e, attempt)
+                self.record_wait(backoff_seconds)
+                await asyncio.sleep(backoff_seconds)
+                attempt += 1
+
+
+API_NAME_TO_RATE_LIMITER: Dict[str, RateLimiter] = {}
+rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_name: str, policy: RateLimitPolicy) -> RateLimiter:
+    """Get the rate limiter for an API. All clients for the same API share
+    one limiter, so that the limits apply across threads and clients."""
+    with rate_limiters_lock:
+        if api_name not in API_NAME_TO_RATE_LIMITER:
+            API_NAME_TO_RATE_LIMITER[api_name] = RateLimiter(api_name, policy)
+        return API_NAME_TO_RATE_LIMITER[api_name]
+
+
+def get_rate_limit_counters() -> Dict[str, Dict]:
+    """Get the counters for each API's rate limiter."""
+    return {
+        api_name: asdict(rate_limiter.counters)
+        for api_name, rate_limiter in API_NAME_TO_RATE_LIMITER.items()
+    }
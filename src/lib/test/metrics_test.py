@@ -0,0 +1,100 @@
+"""Tests for methods in metrics.py and decorators.py"""
+import asyncio
+import json
+
+import pytest
+
+from lib import metrics as metrics_module
+from lib.decorators import timed
+from lib.metrics import get_endpoint_label, Histogram, MetricsRegistry, METRICS
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    METRICS.reset()
+    yield
+    METRICS.reset()
+
+
+def test_histogram_estimates_quantiles_from_buckets():
+    histogram = Histogram()
+    for value in [0.002] * 90 + [0.2] * 9 + [120.0]:
+        histogram.observe(value)
+
+    assert histogram.count == 100
+    assert histogram.get_quantile(0.5) == 0.005
+    assert histogram.get_quantile(0.95) == 0.25
+    assert histogram.get_quantile(1.0) == 120.0
+
+
+def test_registry_exports_prometheus_text():
+    registry = MetricsRegistry()
+    registry.increment("cache_lookups_total", function_name="get_page", result="hit")
+    registry.increment("cache_lookups_total", 2, function_name="get_page", result="hit")
+    registry.observe("api_request_duration_seconds", 0.02, api="spotify")
+
+    lines = registry.to_prometheus_text().splitlines()
+    assert "# TYPE cache_lookups_total counter" in lines
+    assert 'cache_lookups_total{function_name="get_page",result="hit"} 3' in lines
+    assert "# TYPE api_request_duration_seconds histogram" in lines
+    assert 'api_request_duration_seconds_bucket{api="spotify",le="0.01"} 0' in lines
+    assert 'api_request_duration_seconds_bucket{api="spotify",le="0.025"} 1' in lines
+    assert 'api_request_duration_seconds_bucket{api="spotify",le="+Inf"} 1' in lines
+    assert 'api_request_duration_seconds_count{api="spotify"} 1' in lines
+
+
+def test_get_endpoint_label_replaces_ids():
+    assert (
+        get_endpoint_label(
+            "https://api.spotify.com/v1/shows/6ZcvVBPQ2ToLXEWVbaw59P/episodes"
+            "?market=US"
+        )
+        == "/v1/shows/{id}/episodes"
+    )
+    assert (
+        get_endpoint_label("https://youtube.googleapis.com/youtube/v3/videos")
+        == "/youtube/v3/videos"
+    )
+
+
+def test_timed_records_calls_and_errors():
+    @timed("stage_duration_seconds", stage="sync")
+    def sync(fail: bool) -> str:
+        if fail:
+            raise ValueError("failed")
+        return "done"
+
+    @timed("stage_duration_seconds", stage="async_sync")
+    async def async_sync() -> str:
+        return "done"
+
+    assert sync(fail=False) == "done"
+    with pytest.raises(ValueError):
+        sync(fail=True)
+    assert asyncio.run(async_sync()) == "done"
+
+    histograms = METRICS.to_dict()["histograms"]["stage_duration_seconds"]
+    assert {
+        histogram["labels"]["stage"]: histogram["count"] for histogram in histograms
+    } == {"async_sync": 1, "sync": 2}
+    assert METRICS.get_counter("stage_duration_seconds_errors_total", stage="sync") == 1
+
+
+def test_export_metrics_writes_prometheus_and_json_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        metrics_module,
+        "get_rate_limit_counters",
+        lambda: {"spotify": {"requests": 4, "retries": 1}},
+    )
+    METRICS.increment("sqlite_rows_written_total", 10, table="spotify_episode")
+
+    metrics_module.export_metrics(job_name="pipeline", directory=str(tmp_path))
+
+    prometheus_text = (tmp_path / "pipeline.prom").read_text()
+    assert 'sqlite_rows_written_total{table="spotify_episode"} 10' in prometheus_text
+    assert 'rate_limit_requests_total{api="spotify"} 4' in prometheus_text
+    summary = json.loads((tmp_path / "pipeline.json").read_text())
+    assert summary["job_name"] == "pipeline"
+    assert summary["counters"]["sqlite_rows_written_total"] == [
+        {"labels": {"table": "spotify_episode"}, "value": 10}
+    ]
@@ -0,0 +1,105 @@
+"""Tests for rate_limiting.py"""
+from typing import List
+
+import pytest
+
+from lib import rate_limiting
+from lib.rate_limiting import (
+    parse_retry_after,
+    RateLimiter,
+    RateLimitExceeded,
+    RateLimitPolicy,
+    TokenBucket,
+)
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> List[float]:
+    sleeps: List[float] = []
+    monkeypatch.setattr(rate_limiting.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def make_rate_limiter(max_retries: int = 3, max_retry_budget: float = 10.0):
+    return RateLimiter(
+        api_name="test",
+        policy=RateLimitPolicy(
+            requests_per_second=1000,
+            burst=1000,
+            max_retries=max_retries,
+            base_backoff_seconds=1,
+            max_backoff_seconds=8,
+            max_retry_budget=max_retry_budget,
+        ),
+    )
+
+
+def make_flaky_request(num_failures: int, retry_after=None):
+    calls = [0]
+
+    def request() -> str:
+        calls[0] += 1
+        if calls[0] <= num_failures:
+            raise RateLimitExceeded("throttled", retry_after=retry_after)
+        return "ok"
+
+    return request
+
+
+def test_token_bucket_spaces_out_requests_after_burst():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_call_retries_with_bounded_backoff(sleeps):
+    rate_limiter = make_rate_limiter()
+    assert rate_limiter.call(make_flaky_request(num_failures=3)) == "ok"
+
+    backoffs = [seconds for seconds in sleeps if seconds > 0]
+    assert len(backoffs) <= 3
+    assert all(seconds <= 8 for seconds in backoffs)
+    assert rate_limiter.counters.throttled == 3
+    assert rate_limiter.counters.retries == 3
+
+
+def test_call_honors_retry_after(sleeps):
+    rate_limiter = make_rate_limiter()
+    rate_limiter.call(make_flaky_request(num_failures=1, retry_after=7.0))
+    assert 7.0 in sleeps
+
+
+def test_call_caps_retry_after_and_spends_retry_budget(sleeps):
+    rate_limiter = make_rate_limiter(max_retries=10, max_retry_budget=2)
+    rate_limiter.call(make_flaky_request(num_failures=1, retry_after=3600.0))
+    assert 3600.0 not in sleeps
+    assert 8 in sleeps
+    assert rate_limiter.retry_budget < 2
+
+    with pytest.raises(RateLimitExceeded):
+        rate_limiter.call(make_flaky_request(num_failures=10, retry_after=1.0))
+    assert rate_limiter.counters.retries_exhausted == 1
+
+
+def test_call_raises_when_out_of_retries(sleeps):
+    rate_limiter = make_rate_limiter(max_retries=2)
+    with pytest.raises(RateLimitExceeded):
+        rate_limiter.call(make_flaky_request(num_failures=5))
+    assert rate_limiter.counters.retries == 2
+    assert rate_limiter.counters.retries_exhausted == 1
+
+
+def test_call_raises_when_retry_budget_is_spent(sleeps):
+    rate_limiter = make_rate_limiter(max_retries=10, max_retry_budget=2)
+    with pytest.raises(RateLimitExceeded):
+        rate_limiter.call(make_flaky_request(num_failures=10))
+    assert rate_limiter.counters.retries == 2
@@ -3,8 +3,12 @@
 2. Perform data transformations
 """
 from integrations.sync_integrations import main as sync_integrations
+from lib.metrics import export_metrics
 from transformations.main import main as transform_podcasts
 
 def main() -> None:
-    sync_integrations()
-    transform_podcasts()
+    try:
+        sync_integrations()
+        transform_podcasts()
+    finally:
+        export_metrics(job_name="pipeline")
@@ -1,3 +1,56 @@
 POST_DATE_MAX_NUM_HOURS_DIFF = 24
 MAPPED_CHANNEL_TABLE_NAME = "mapped_channels"
 MAPPED_EPISODES_TABLE_NAME = "mapped_episodes"
+MAPPING_SYNC_STATE_TABLE_NAME = "mapping_sync_state"
+
+# the tables, and the columns from each table, that are used to map the
+# channels. These are loaded in full, so we keep them narrow.
+MAPPING_TABLE_NAME_TO_COLUMNS = {
+    "youtube_channels": ["channel_id", "channel_title"],
+    "youtube_videos": ["video_id", "channel_id", "synctimestamp"],
+    "spotify_show": ["id", "name"],
+    "spotify_episode": ["id", "show_id", "synctimestamp"],
+}
+
+# the columns used to match the episodes. These include the descriptions, so
+# they're only loaded one channel (or one chunk) at a time.
+MATCHING_TABLE_NAME_TO_COLUMNS = {
+    "youtube_videos": [
+        "video_id",
+        "video_title",
+        "channel_id",
+        "channel_title",
+        "description",
+        "published_at",
+        "synctimestamp",
+    ],
+    "spotify_episode": [
+        "id",
+        "name",
+        "show_id",
+        "show_name",
+        "description",
+        "release_date",
+        "synctimestamp",
+    ],
+}
+MATCHING_CHUNK_SIZE = 5000  # rows
+# fuzzy matching of episode titles/descriptions.
+FUZZY_MATCH_MIN_SCORE = 0.6
+FUZZY_MATCH_TITLE_WEIGHT = 0.7
+FUZZY_MATCH_DESCRIPTION_WEIGHT = 0.3
+DESCRIPTION_MAX_NUM_CHARS = 500
+SIMILARITY_CACHE_MAX_SIZE = 2**16
+
+# MinHash/LSH index for proposing episode pairs across all channels. With b
+# bands of r rows, pairs with similarity above ~(1/b)^(1/r) are likely to
+# share a bucket, so 32 bands of 4 rows catch pairs above ~0.42.
+EPISODE_SIGNATURES_TABLE_NAME = "episode_signatures"
+MINHASH_NUM_PERMUTATIONS = 128
+MINHASH_SEED = 1
+LSH_NUM_BANDS = 32
+# buckets shared by more episodes than this are too generic to be useful.
+LSH_MAX_BUCKET_SIZE = 100
+LSH_MIN_EPISODE_PAIRS_PER_CHANNEL_PAIRING = 3
+# channel pairings proposed by the LSH index, kept across mapping runs.
+PROPOSED_CHANNEL_MAPPINGS_TABLE_NAME = "proposed_channel_mappings"
@@ -3,8 +3,8 @@ from typing import Dict, List
 
 import pandas as pd
 
-from db.sql.constants import TABLE_NAME_TO_KEYS_MAP
 from db.sql.helper import get_all_table_results_as_df
+from transformations.enrichment.constants import MAPPING_TABLE_NAME_TO_COLUMNS
 from transformations.enrichment.mappings.models import (
     MappedChannel,
     MappedChannelIntegrationMetadata,
@@ -14,10 +14,11 @@ from transformations.enrichment.mappings.models import (
 
 
 def get_map_tables_to_sqlite_data() -> Dict[str, pd.DataFrame]:
-    """Get all the current data in the SQLite DB."""
+    """Get the current data in the SQLite DB for the tables used for mapping,
+    with only the columns that the mapping uses."""
     return {
-        table_name: get_all_table_results_as_df(table_name)
-        for table_name in TABLE_NAME_TO_KEYS_MAP.keys()
+        table_name: get_all_table_results_as_df(table_name, columns=columns)
+        for table_name, columns in MAPPING_TABLE_NAME_TO_COLUMNS.items()
     }
 
 
@@ -30,8 +31,8 @@ def get_youtube_channel_info(
 
 
 def get_spotify_show_info(
-    spotify_df: pd.DataFrame, cols_to_return: List[str] = ["id", "show_title"]
-) -> List[str]:
+    spotify_df: pd.DataFrame, cols_to_return: List[str] = ["id", "name"]
+) -> List[Dict]:
     """Get all the Spotify show names. Returns unique names."""
     return spotify_df[cols_to_return].to_dict(orient="records")
 
@@ -57,32 +58,30 @@ def create_mapped_channel_instance(metadata: Dict) -> MappedChannel:
 
 
 def create_mapped_episode_instance(metadata: Dict) -> MappedEpisode:
-    youtube_episode = MappedEpisodeIntegrationMetadata(metadata["youtube_episoode"])
-    spotify_episode = MappedEpisodeIntegrationMetadata(metadata["spotify_episode"])
+    youtube_episode = MappedEpisodeIntegrationMetadata(**metadata["youtube_episode"])
+    spotify_episode = MappedEpisodeIntegrationMetadata(**metadata["spotify_episode"])
     mapped_episode = MappedEpisode(
         consolidated_name=metadata["consolidated_name"],
         mapped_channel_name=metadata["mapped_channel_name"],
         consolidated_description=metadata["consolidated_description"],
         youtube_episode=youtube_episode,
         spotify_episode=spotify_episode,
+        match_confidence=metadata["match_confidence"],
+        last_updated_timestamp=metadata["last_updated_timestamp"],
     )
     return mapped_episode
 
 
 def flatten_mapped_channel(mapped_channel: MappedChannel) -> Dict:
     return {
-        **{
-            "consolidated_name": mapped_channel.consolidated_name,
-            "last_updated_timestamp": mapped_channel.last_updated_timestamp,
-        },
-        **{
-            f"youtube_channel_{key}": value
-            for key, value in asdict(mapped_channel.youtube_channel).items()
-        },
-        **{
-            f"spotify_channel_{key}": value
-            for key, value in asdict(mapped_channel.spotify_channel).items()
-        },
+        "consolidated_name": mapped_channel.consolidated_name,
+        "youtube_channel_id": mapped_channel.youtube_channel.id,
+        "youtube_channel_name": mapped_channel.youtube_channel.name,
+        "youtube_episode_ids": ",".join(mapped_channel.youtube_channel.episode_ids),
+        "spotify_show_id": mapped_channel.spotify_channel.id,
+        "spotify_show_name": mapped_channel.spotify_channel.name,
+        "spotify_episode_ids": ",".join(mapped_channel.spotify_channel.episode_ids),
+        "last_updated_timestamp": mapped_channel.last_updated_timestamp,
     }
 
 
@@ -92,6 +91,8 @@ def flatten_mapped_episode(mapped_episode: MappedEpisode) -> Dict:
             "consolidated_name": mapped_episode.consolidated_name,
             "mapped_channel_name": mapped_episode.mapped_channel_name,
             "consolidated_description": mapped_episode.consolidated_description,
+            "match_confidence": mapped_episode.match_confidence,
+            "last_updated_timestamp": mapped_episode.last_updated_timestamp,
         },
         **{
             f"youtube_episode_{key}": value
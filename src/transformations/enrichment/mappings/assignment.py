@@ -0,0 +1,64 @@
+"""Assigns YouTube videos to Spotify episodes one-to-one.
+
+The scored candidate pairs (see `map_episodes.score_candidate_pairs`) are the
+edges of a sparse bipartite graph, weighted by match score. We pick a
+maximum-weight matching greedily: walk the edges from highest to lowest
+score, and keep an edge if neither of its episodes has been matched yet.
+The greedy matching is at least half the weight of the optimal one, and in
+practice matches it, since the right pair usually scores far higher than
+the other candidates.
+"""
+import numpy as np
+import pandas as pd
+
+ASSIGNED_PAIR_COLUMNS = ["youtube_index", "spotify_index", "match_confidence"]
+
+
+def get_match_confidence(scored_pairs_df: pd.DataFrame) -> pd.Series:
+    """Confidence of each pair: its match score, discounted by how close the
+    runner-up candidate for either of its episodes scored, since a pair that
+    barely beats another candidate is more likely to be wrong."""
+    match_scores = scored_pairs_df["match_score"]
+    # total score of the candidates of each episode, minus this pair's score.
+    youtube_total = scored_pairs_df.groupby("youtube_index")["match_score"].transform(
+        "sum"
+    )
+    spotify_total = scored_pairs_df.groupby("spotify_index")["match_score"].transform(
+        "sum"
+    )
+    competing_score = np.maximum(
+        youtube_total - match_scores, spotify_total - match_scores
+    )
+    return match_scores * match_scores / (match_scores + competing_score)
+
+
+def assign_episode_pairs(scored_pairs_df: pd.DataFrame) -> pd.DataFrame:
+    """Get a one-to-one assignment of YouTube videos to Spotify episodes from
+    the scored candidate pairs.
+
+    Returns a dataframe with the `youtube_index`, `spotify_index`, and
+    `match_confidence` (between 0 and 1) of each assigned pair.
+    """
+    if scored_pairs_df.empty:
+        return pd.DataFrame(columns=ASSIGNED_PAIR_COLUMNS)
+
+    edges_df = scored_pairs_df.assign(
+        match_confidence=get_match_confidence(scored_pairs_df)
+    ).sort_values("match_score", ascending=False, kind="stable")
+
+    matched_youtube_indices = set()
+    matched_spotify_indices = set()
+    is_assigned = np.zeros(len(edges_df), dtype=bool)
+    for i, (youtube_index, spotify_index) in enumerate(
+        zip(edges_df["youtube_index"], edges_df["spotify_index"])
+    ):
+        if (
+            youtube_index in matched_youtube_indices
+            or spotify_index in matched_spotify_indices
+        ):
+            continue
+        matched_youtube_indices.add(youtube_index)
+        matched_spotify_indices.add(spotify_index)
+        is_assigned[i] = True
+
+    return edges_df.loc[is_assigned, ASSIGNED_PAIR_COLUMNS].reset_index(drop=True)
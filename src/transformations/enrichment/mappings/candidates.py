@@ -0,0 +1,93 @@
+"""Generates the candidate (YouTube video, Spotify episode) pairs to score.
+
+A YouTube video and a Spotify episode are only a possible match if they were
+posted within `POST_DATE_MAX_NUM_HOURS_DIFF` of each other. Instead of
+checking every pair, we parse each date column once and do an interval join
+on the sorted Spotify release dates, so that only the pairs that are inside
+the window ever reach the (much slower) scorer.
+"""
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from transformations.enrichment import constants
+
+YOUTUBE_POST_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+SPOTIFY_POST_DATE_FORMAT = "%Y-%m-%d"
+
+CANDIDATE_PAIR_COLUMNS = ["youtube_index", "spotify_index"]
+
+
+def parse_post_dates(post_dates: pd.Series, date_format: str) -> np.ndarray:
+    """Parse a column of post dates into a datetime64 array. Dates that can't
+    be parsed (e.g., Spotify release dates with only year precision) are
+    NaT and never match."""
+    return pd.to_datetime(post_dates, format=date_format, errors="coerce").to_numpy(
+        dtype="datetime64[ns]"
+    )
+
+
+def get_candidate_pairs(
+    youtube_published_at: pd.Series,
+    spotify_release_dates: pd.Series,
+    max_num_hours_diff: float = constants.POST_DATE_MAX_NUM_HOURS_DIFF,
+) -> pd.DataFrame:
+    """Get the pairs of YouTube videos and Spotify episodes that were posted
+    within `max_num_hours_diff` hours of each other.
+
+    Returns a dataframe with the positional index of the YouTube video
+    (`youtube_index`) and of the Spotify episode (`spotify_index`) for each
+    candidate pair.
+    """
+    youtube_dates = parse_post_dates(youtube_published_at, YOUTUBE_POST_DATE_FORMAT)
+    spotify_dates = parse_post_dates(spotify_release_dates, SPOTIFY_POST_DATE_FORMAT)
+
+    # NaT sorts to the end, so we drop it from the searchable range.
+    spotify_order = np.argsort(spotify_dates, kind="stable")
+    sorted_spotify_dates = spotify_dates[spotify_order]
+    num_valid_spotify_dates = int((~np.isnat(sorted_spotify_dates)).sum())
+    sorted_spotify_dates = sorted_spotify_dates[:num_valid_spotify_dates]
+
+    # for each YouTube video, the Spotify episodes in the window are a
+    # contiguous [start, end) range of the sorted release dates.
+    max_time_diff = np.timedelta64(int(max_num_hours_diff * 3600), "s")
+    window_starts = np.searchsorted(
+        sorted_spotify_dates, youtube_dates - max_time_diff, side="left"
+    )
+    window_ends = np.searchsorted(
+        sorted_spotify_dates, youtube_dates + max_time_diff, side="right"
+    )
+    num_candidates = np.where(
+        np.isnat(youtube_dates), 0, np.maximum(window_ends - window_starts, 0)
+    )
+
+    # expand each range into one row per pair.
+    youtube_index = np.repeat(np.arange(len(youtube_dates)), num_candidates)
+    offsets_in_window = np.arange(num_candidates.sum()) - np.repeat(
+        np.cumsum(num_candidates) - num_candidates, num_candidates
+    )
+    spotify_index = spotify_order[
+        np.repeat(window_starts, num_candidates) + offsets_in_window
+    ]
+    return pd.DataFrame(
+        {"youtube_index": youtube_index, "spotify_index": spotify_index},
+        columns=CANDIDATE_PAIR_COLUMNS,
+    )
+
+
+def get_candidate_pairs_for_episodes(
+    youtube_videos: List[Dict], spotify_episodes: List[Dict]
+) -> pd.DataFrame:
+    """Get the candidate pairs for lists of YouTube video and Spotify episode
+    records. Indices are positions in the given lists."""
+    return get_candidate_pairs(
+        youtube_published_at=pd.Series(
+            [youtube_video["published_at"] for youtube_video in youtube_videos],
+            dtype=object,
+        ),
+        spotify_release_dates=pd.Series(
+            [spotify_episode["release_date"] for spotify_episode in spotify_episodes],
+            dtype=object,
+        ),
+    )
@@ -1,48 +1,153 @@
-"""Map podcast information across different integrations."""
-from typing import List
+"""Map podcast information across different integrations.
 
+Mapping is incremental by default: each run only matches the YouTube videos
+and Spotify episodes synced since the last mapping run, against the ones that
+aren't mapped yet, and only upserts the channels that have new data.
+"""
+from typing import Optional
+
+import pandas as pd
+
+from lib.constants import CURRENT_SYNCTIMESTAMP
+from lib.decorators import timed
+from transformations.enrichment.helper import get_map_tables_to_sqlite_data
 from transformations.enrichment.mappings import helper
-from transformations.enrichment.mappings.map_channels import map_channels
+from transformations.enrichment.mappings.lsh import build_lsh_index
+from transformations.enrichment.mappings.map_channels import (
+    get_channel_mapping,
+    map_channels,
+)
 from transformations.enrichment.mappings.map_episodes import map_episodes
-from transformations.enrichment.mappings.sqlite_helper import write_mapped_data_to_db
+from transformations.enrichment.mappings.sqlite_helper import (
+    bulk_write_mapped_data_to_db,
+    get_channel_episodes_for_matching,
+    get_mapped_episode_ids,
+    get_mapping_sync_state,
+    get_proposed_channel_mappings,
+    write_mapping_sync_state,
+    write_proposed_channel_mappings,
+)
 from lib.log.logger import Logger
 
 logger = Logger(__name__)
 
 
-def main() -> None:
+def get_latest_synctimestamp(*episodes_dfs: pd.DataFrame) -> Optional[str]:
+    synctimestamps = [
+        episodes_df["synctimestamp"].max()
+        for episodes_df in episodes_dfs
+        if not episodes_df.empty
+    ]
+    return max(synctimestamps) if synctimestamps else None
+
+
+@timed("pipeline_stage_duration_seconds", stage="map_podcasts")
+def main(full_remap: bool = False) -> None:
     """Creates unified definitions of podcast channels and episodes across
-    different integrations by mapping them together."""
-    CHANNELS: List[str] = []
+    different integrations by mapping them together.
 
+    Unless `full_remap` is set, only maps the data synced since the last
+    mapping run.
+    """
     logger.info("Starting to map podcasts across YouTube and Spotify integrations.")
 
-    tables_to_sqlite_data_map = helper.get_map_tables_to_sqlite_data()
-    youtube_channels_df = tables_to_sqlite_data_map["channels"]
+    mapping_sync_state = None if full_remap else get_mapping_sync_state()
+    # re-check the rows from the latest sync of the last run, in case that
+    # sync was still writing while we mapped.
+    synced_after = mapping_sync_state.last_synctimestamp if mapping_sync_state else None
+
+    tables_to_sqlite_data_map = get_map_tables_to_sqlite_data()
+    youtube_channels_df = tables_to_sqlite_data_map["youtube_channels"]
     youtube_videos_df = tables_to_sqlite_data_map["youtube_videos"]
     spotify_shows_df = tables_to_sqlite_data_map["spotify_show"]
     spotify_episodes_df = tables_to_sqlite_data_map["spotify_episode"]
 
+    # propose channel pairings from similar episodes, so that channels don't
+    # need to be mapped by hand. The index only has the newly synced episodes,
+    # so the pairings are stored and the ones from earlier runs are used too.
+    lsh_index = build_lsh_index(synced_after=synced_after)
+    channel_pairings = lsh_index.get_channel_pairings()
+    logger.info(f"LSH index proposed {len(channel_pairings)} channel pairings.")
+    write_proposed_channel_mappings(
+        channel_pairings=channel_pairings, synctimestamp=CURRENT_SYNCTIMESTAMP
+    )
+    youtube_channel_to_spotify_show = get_channel_mapping(
+        get_proposed_channel_mappings()
+    )
+
     mapped_channels = map_channels(
         youtube_channels_df=youtube_channels_df,
         spotify_shows_df=spotify_shows_df,
         youtube_videos_df=youtube_videos_df,
         spotify_episodes_df=spotify_episodes_df,
+        youtube_channel_to_spotify_show=youtube_channel_to_spotify_show,
     )
 
+    mapped_episode_ids = (
+        get_mapped_episode_ids()
+        if synced_after
+        else {"youtube": set(), "spotify": set()}
+    )
+    new_episode_ids = helper.get_episode_ids_synced_after(
+        episodes_df=youtube_videos_df, id_col="video_id", synced_after=synced_after
+    ) | helper.get_episode_ids_synced_after(
+        episodes_df=spotify_episodes_df, id_col="id", synced_after=synced_after
+    )
+
+    num_mapped_channels = 0
+    num_mapped_episodes = 0
     for mapped_channel in mapped_channels:
-        youtube_video_ids = mapped_channel.youtube_episode.episode_ids
-        spotify_episode_ids = mapped_channel.spotify_episode.episode_ids
-        youtube_videos = helper.get_youtube_videos(youtube_video_ids)
-        spotify_episodes = helper.get_spotify_episodes(spotify_episode_ids)
+        youtube_video_ids = mapped_channel.youtube_channel.episode_ids
+        spotify_episode_ids = mapped_channel.spotify_channel.episode_ids
+        if new_episode_ids.isdisjoint(youtube_video_ids) and new_episode_ids.isdisjoint(
+            spotify_episode_ids
+        ):
+            continue
+        # only one channel's episodes (with their descriptions) are loaded at
+        # a time.
+        youtube_videos = helper.get_unmapped_episodes(
+            episodes_df=get_channel_episodes_for_matching(
+                table_name="youtube_videos",
+                channel_id_col="channel_id",
+                channel_id=mapped_channel.youtube_channel.id,
+            ),
+            id_col="video_id",
+            episode_ids=youtube_video_ids,
+            mapped_episode_ids=mapped_episode_ids["youtube"],
+        )
+        spotify_episodes = helper.get_unmapped_episodes(
+            episodes_df=get_channel_episodes_for_matching(
+                table_name="spotify_episode",
+                channel_id_col="show_id",
+                channel_id=mapped_channel.spotify_channel.id,
+            ),
+            id_col="id",
+            episode_ids=spotify_episode_ids,
+            mapped_episode_ids=mapped_episode_ids["spotify"],
+        )
         mapped_episodes = map_episodes(
-            youtube_videos=youtube_videos, spotify_episodes=spotify_episodes
+            youtube_videos=youtube_videos,
+            spotify_episodes=spotify_episodes,
+            mapped_channels=[mapped_channel],
+            synced_after=synced_after,
         )
-        write_mapped_data_to_db(mapped_channel)
-        for episode in mapped_episodes:
-            mapped_episode = helper.create_mapped_episode_instance(episode)
-            write_mapped_data_to_db(mapped_episode)
+        bulk_write_mapped_data_to_db([mapped_channel, *mapped_episodes])
+        num_mapped_channels += 1
+        num_mapped_episodes += len(mapped_episodes)
 
+    latest_synctimestamp = get_latest_synctimestamp(
+        youtube_videos_df, spotify_episodes_df
+    )
+    if latest_synctimestamp is not None:
+        write_mapping_sync_state(
+            last_synctimestamp=latest_synctimestamp,
+            synctimestamp=CURRENT_SYNCTIMESTAMP,
+        )
+
+    logger.info(
+        f"Mapped {num_mapped_episodes} new episodes across {num_mapped_channels} "
+        f"channels with new data (out of {len(mapped_channels)} channels)."
+    )
     logger.info("Completed mapping podcasts across YouTube and Spotify integrations.")
 
 
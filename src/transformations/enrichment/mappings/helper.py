@@ -1,4 +1,6 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
 
 from transformations.enrichment.mappings.models import MappedChannel, MappedEpisode
 
@@ -23,14 +25,30 @@ def get_shows_from_spotify_data() -> List[str]:
     return [""]
 
 
-def get_youtube_videos(youtube_video_ids: List[str]) -> List[Dict]:
-    """Given ids, get YouTube videos."""
-    return [{}]
-
-
-def get_spotify_episodes(spotify_episode_ids: List[str]) -> List[Dict]:
-    """Given ids, get Spotify episodes."""
-    return [{}]
+def get_episode_ids_synced_after(
+    episodes_df: pd.DataFrame, id_col: str, synced_after: Optional[str]
+) -> Set[str]:
+    """Get the ids of the episodes synced at or after the given synctimestamp
+    (all of them, if it's None)."""
+    if episodes_df.empty:
+        return set()
+    if synced_after is None:
+        return set(episodes_df[id_col])
+    return set(episodes_df.loc[episodes_df["synctimestamp"] >= synced_after, id_col])
+
+
+def get_unmapped_episodes(
+    episodes_df: pd.DataFrame,
+    id_col: str,
+    episode_ids: List[str],
+    mapped_episode_ids: Set[str],
+) -> List[Dict]:
+    """Given ids, get the YouTube videos/Spotify episodes that aren't mapped
+    yet."""
+    unmapped_episode_ids = set(episode_ids) - mapped_episode_ids
+    return episodes_df[episodes_df[id_col].isin(unmapped_episode_ids)].to_dict(
+        orient="records"
+    )
 
 
 def create_mapped_channel_instance(metadata: Dict) -> MappedChannel:
@@ -0,0 +1,298 @@
+"""MinHash/LSH index for proposing YouTube <-> Spotify matches at scale.
+
+Each episode gets a MinHash signature over the tokens of its normalized
+title and description (see `similarity`). Signatures are split into bands,
+and episodes whose signatures agree on a whole band land in the same bucket.
+Pairs of a YouTube video and a Spotify episode that share a bucket are
+likely to be similar, so we get candidate pairs across every channel without
+comparing all pairs.
+
+Signatures are stored in SQLite, so the index is built incrementally: only
+rows that don't have a signature yet are hashed on each run.
+
+Background: http://infolab.stanford.edu/~ullman/mmds/ch3.pdf
+"""
+from collections import Counter, defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from lib.constants import CURRENT_SYNCTIMESTAMP
+from lib.log.logger import Logger
+from transformations.enrichment import constants
+from transformations.enrichment.mappings.models import EpisodeSignature
+from transformations.enrichment.mappings.similarity import (
+    get_description_tokens,
+    get_title_tokens,
+)
+from transformations.enrichment.mappings.sqlite_helper import (
+    bulk_write_episode_signatures_to_db,
+    get_episode_signatures,
+    iter_episodes_for_matching,
+)
+
+logger = Logger(__name__)
+
+# largest prime below 2^32, so that hashed values fit in a uint32.
+MINHASH_PRIME = np.uint64(4294967291)
+
+rng = np.random.RandomState(constants.MINHASH_SEED)
+# a < 2^31 and x < 2^32, so a * x + b never overflows a uint64.
+MINHASH_A = rng.randint(1, 2**31, size=constants.MINHASH_NUM_PERMUTATIONS).astype(
+    np.uint64
+)
+MINHASH_B = rng.randint(0, 2**31, size=constants.MINHASH_NUM_PERMUTATIONS).astype(
+    np.uint64
+)
+
+ROWS_PER_BAND = constants.MINHASH_NUM_PERMUTATIONS // constants.LSH_NUM_BANDS
+
+EpisodeKey = Tuple[str, str]  # (integration, episode_id)
+
+
+def get_episode_tokens(title: str, description: str) -> FrozenSet[str]:
+    return get_title_tokens(title) | get_description_tokens(description)
+
+
+def compute_minhash_signature(tokens: FrozenSet[str]) -> np.ndarray:
+    """Compute the MinHash signature of a set of tokens.
+
+    Tokens are hashed with crc32 rather than `hash`, since `hash` is salted
+    per process and the signatures are persisted across runs.
+    """
+    if not tokens:
+        return np.full(
+            constants.MINHASH_NUM_PERMUTATIONS, np.iinfo(np.uint32).max, np.uint32
+        )
+    token_hashes = np.array(
+        [zlib.crc32(token.encode("utf-8")) for token in tokens], dtype=np.uint64
+    )
+    permuted_hashes = (
+        np.outer(token_hashes, MINHASH_A) + MINHASH_B
+    ) % MINHASH_PRIME  # (num_tokens, num_permutations)
+    return permuted_hashes.min(axis=0).astype(np.uint32)
+
+
+def get_band_keys(signature: np.ndarray) -> List[bytes]:
+    return [
+        bytes([band])
+        + signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND].tobytes()
+        for band in range(constants.LSH_NUM_BANDS)
+    ]
+
+
+def estimate_similarity(signature_1: np.ndarray, signature_2: np.ndarray) -> float:
+    """The share of matching MinHash values estimates the Jaccard similarity."""
+    return float(np.mean(signature_1 == signature_2))
+
+
+class EpisodeLSHIndex:
+    """LSH index over the signatures of YouTube videos and Spotify episodes."""
+
+    def __init__(self) -> None:
+        self.signatures: Dict[EpisodeKey, np.ndarray] = {}
+        self.episode_to_channel: Dict[EpisodeKey, Tuple[str, str]] = {}
+        self.buckets: Dict[bytes, Dict[str, List[str]]] = defaultdict(
+            lambda: {"youtube": [], "spotify": []}
+        )
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __contains__(self, episode_key: EpisodeKey) -> bool:
+        return episode_key in self.signatures
+
+    def add(self, episode_signature: EpisodeSignature) -> None:
+        episode_key = (episode_signature.integration, episode_signature.episode_id)
+        if episode_key in self:
+            return
+        signature = np.frombuffer(episode_signature.signature, dtype=np.uint32)
+        self.signatures[episode_key] = signature
+        self.episode_to_channel[episode_key] = (
+            episode_signature.channel_id,
+            episode_signature.channel_name,
+        )
+        for band_key in get_band_keys(signature):
+            self.buckets[band_key][episode_signature.integration].append(
+                episode_signature.episode_id
+            )
+
+    def get_candidate_pairs(self, min_similarity: float = 0.0) -> pd.DataFrame:
+        """Get the (YouTube video, Spotify episode) pairs that share at least
+        one bucket, with their estimated similarity."""
+        pairs: Set[Tuple[str, str]] = set()
+        num_skipped_buckets = 0
+        for bucket in self.buckets.values():
+            youtube_ids, spotify_ids = bucket["youtube"], bucket["spotify"]
+            if not youtube_ids or not spotify_ids:
+                continue
+            if len(youtube_ids) + len(spotify_ids) > constants.LSH_MAX_BUCKET_SIZE:
+                num_skipped_buckets += 1
+                continue
+            pairs.update(
+                (youtube_id, spotify_id)
+                for youtube_id in youtube_ids
+                for spotify_id in spotify_ids
+            )
+        if num_skipped_buckets:
+            logger.info(f"Skipped {num_skipped_buckets} oversized LSH buckets.")
+
+        rows = [
+            {
+                "youtube_id": youtube_id,
+                "spotify_id": spotify_id,
+                "similarity": estimate_similarity(
+                    self.signatures[("youtube", youtube_id)],
+                    self.signatures[("spotify", spotify_id)],
+                ),
+            }
+            for youtube_id, spotify_id in pairs
+        ]
+        candidate_pairs_df = pd.DataFrame(
+            rows, columns=["youtube_id", "spotify_id", "similarity"]
+        )
+        return candidate_pairs_df[
+            candidate_pairs_df["similarity"] >= min_similarity
+        ].reset_index(drop=True)
+
+    def get_channel_pairings(
+        self,
+        min_num_episode_pairs: int = constants.LSH_MIN_EPISODE_PAIRS_PER_CHANNEL_PAIRING,  # noqa
+    ) -> List[Dict]:
+        """Propose (YouTube channel, Spotify show) pairings, based on how many
+        of their episodes are candidate pairs. Most likely pairings first."""
+        channel_pair_counts: Counter = Counter()
+        for youtube_id, spotify_id in self.get_candidate_pairs()[
+            ["youtube_id", "spotify_id"]
+        ].itertuples(index=False, name=None):
+            channel_pair_counts[
+                (
+                    self.episode_to_channel[("youtube", youtube_id)],
+                    self.episode_to_channel[("spotify", spotify_id)],
+                )
+            ] += 1
+        return [
+            {
+                "youtube_channel_id": youtube_channel[0],
+                "youtube_channel_name": youtube_channel[1],
+                "spotify_show_id": spotify_show[0],
+                "spotify_show_name": spotify_show[1],
+                "num_episode_pairs": num_episode_pairs,
+            }
+            for (
+                youtube_channel,
+                spotify_show,
+            ), num_episode_pairs in channel_pair_counts.most_common()
+            if num_episode_pairs >= min_num_episode_pairs
+        ]
+
+
+def create_episode_signatures(
+    episodes_df: pd.DataFrame,
+    integration: str,
+    id_col: str,
+    title_col: str,
+    channel_id_col: str,
+    channel_name_col: str,
+) -> List[EpisodeSignature]:
+    return [
+        EpisodeSignature(
+            signature_id=f"{integration}:{row[id_col]}",
+            integration=integration,
+            episode_id=row[id_col],
+            channel_id=row[channel_id_col],
+            channel_name=row[channel_name_col],
+            signature=compute_minhash_signature(
+                get_episode_tokens(row[title_col], row["description"])
+            ).tobytes(),
+            synctimestamp=CURRENT_SYNCTIMESTAMP,
+        )
+        for row in episodes_df.to_dict(orient="records")
+    ]
+
+
+def get_new_episodes_df(
+    lsh_index: EpisodeLSHIndex, episodes_df: pd.DataFrame, integration: str, id_col: str
+) -> pd.DataFrame:
+    """Get the episodes that aren't in the index yet."""
+    if episodes_df.empty:
+        return episodes_df
+    is_new_episode = [
+        (integration, episode_id) not in lsh_index for episode_id in episodes_df[id_col]
+    ]
+    return episodes_df[is_new_episode]
+
+
+def update_lsh_index(
+    lsh_index: EpisodeLSHIndex,
+    youtube_videos_df: pd.DataFrame,
+    spotify_episodes_df: pd.DataFrame,
+) -> List[EpisodeSignature]:
+    """Add the videos and episodes that aren't in the index yet, and store
+    their signatures. Returns the new signatures."""
+    new_youtube_videos_df = get_new_episodes_df(
+        lsh_index=lsh_index,
+        episodes_df=youtube_videos_df,
+        integration="youtube",
+        id_col="video_id",
+    )
+    new_spotify_episodes_df = get_new_episodes_df(
+        lsh_index=lsh_index,
+        episodes_df=spotify_episodes_df,
+        integration="spotify",
+        id_col="id",
+    )
+    new_signatures = create_episode_signatures(
+        episodes_df=new_youtube_videos_df,
+        integration="youtube",
+        id_col="video_id",
+        title_col="video_title",
+        channel_id_col="channel_id",
+        channel_name_col="channel_title",
+    ) + create_episode_signatures(
+        episodes_df=new_spotify_episodes_df,
+        integration="spotify",
+        id_col="id",
+        title_col="name",
+        channel_id_col="show_id",
+        channel_name_col="show_name",
+    )
+    for signature in new_signatures:
+        lsh_index.add(signature)
+    bulk_write_episode_signatures_to_db(new_signatures)
+    logger.info(
+        f"Added {len(new_signatures)} episodes to the LSH index, which now "
+        f"has {len(lsh_index)} episodes."
+    )
+    return new_signatures
+
+
+def build_lsh_index(synced_after: Optional[str] = None) -> EpisodeLSHIndex:
+    """Load the index from the stored signatures and add any new videos and
+    episodes to it, streaming through the episodes synced at or after
+    `synced_after` one chunk at a time."""
+    lsh_index = EpisodeLSHIndex()
+    for signature in get_episode_signatures():
+        lsh_index.add(signature)
+    # if there are no stored signatures yet, every episode is new.
+    if not len(lsh_index):
+        synced_after = None
+    for youtube_videos_df in iter_episodes_for_matching(
+        table_name="youtube_videos", synced_after=synced_after
+    ):
+        update_lsh_index(
+            lsh_index=lsh_index,
+            youtube_videos_df=youtube_videos_df,
+            spotify_episodes_df=pd.DataFrame(),
+        )
+    for spotify_episodes_df in iter_episodes_for_matching(
+        table_name="spotify_episode", synced_after=synced_after
+    ):
+        update_lsh_index(
+            lsh_index=lsh_index,
+            youtube_videos_df=pd.DataFrame(),
+            spotify_episodes_df=spotify_episodes_df,
+        )
+    return lsh_index
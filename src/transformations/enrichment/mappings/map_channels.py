@@ -1,5 +1,5 @@
 """Maps YouTube and Spotify channels."""
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Optional
 
 import pandas as pd
 
@@ -9,6 +9,7 @@ from transformations.enrichment.helper import (
     get_spotify_show_info,
     get_youtube_channel_info,
 )
+from transformations.enrichment.mappings.models import MappedChannel
 
 
 YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING = {"Andrew Huberman": "Huberman Lab"}
@@ -19,19 +20,43 @@ SPOTIFY_SHOW_TO_YOUTUBE_CHANNEL_MAP = {
 }
 
 
+def get_channel_mapping(channel_pairings: List[Dict]) -> Dict[str, str]:
+    """Get the mapping of YouTube channel names to Spotify show names: the
+    hardcoded mapping, plus the channel pairings proposed by the LSH index
+    (see `lsh.EpisodeLSHIndex.get_channel_pairings`) for the channels and
+    shows that aren't mapped yet. Earlier pairings take precedence."""
+    youtube_channel_to_spotify_show = dict(YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING)
+    spotify_show_names = set(youtube_channel_to_spotify_show.values())
+    for channel_pairing in channel_pairings:
+        youtube_name = channel_pairing["youtube_channel_name"]
+        spotify_name = channel_pairing["spotify_show_name"]
+        if (
+            youtube_name in youtube_channel_to_spotify_show
+            or spotify_name in spotify_show_names
+        ):
+            continue
+        youtube_channel_to_spotify_show[youtube_name] = spotify_name
+        spotify_show_names.add(spotify_name)
+    return youtube_channel_to_spotify_show
+
+
 def return_consolidated_channel_name(
-    channel_name: str, integration: Literal["spotify", "youtube"]
+    channel_name: str,
+    integration: Literal["spotify", "youtube"],
+    youtube_channel_to_spotify_show: Dict[str, str],
 ) -> str:
     """Returns the consolidated channel name."""
     return (
         channel_name
         if integration == "spotify"
-        else YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING[channel_name]
+        else youtube_channel_to_spotify_show[channel_name]
     )
 
 
 def consolidate_channel_metadata(
-    channel_info: Dict, integration: Literal["spotify", "youtube"]
+    channel_info: Dict,
+    integration: Literal["spotify", "youtube"],
+    youtube_channel_to_spotify_show: Dict[str, str],
 ) -> Dict:
     """Consolidate the channel metadata from both the YouTube and Spotify
     versions into one unified version.
@@ -46,15 +71,19 @@ def consolidate_channel_metadata(
         "last_updated_timestamp": str (current timestamp)
     }
     """
+    spotify_show_to_youtube_channel = {
+        spotify_name: youtube_name
+        for youtube_name, spotify_name in youtube_channel_to_spotify_show.items()
+    }
     youtube_name = (
         channel_info["channel_title"]
         if integration == "youtube"
-        else SPOTIFY_SHOW_TO_YOUTUBE_CHANNEL_MAP[channel_info["show_title"]]
+        else spotify_show_to_youtube_channel[channel_info["name"]]
     )
     spotify_name = (
-        channel_info["show_title"]
+        channel_info["name"]
         if integration == "spotify"
-        else YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING[channel_info["channel_title"]]
+        else youtube_channel_to_spotify_show[channel_info["channel_title"]]
     )
     return {
         "consolidated_name": spotify_name,
@@ -64,6 +93,16 @@ def consolidate_channel_metadata(
     }
 
 
+def get_channel_id_to_episode_ids_map(
+    episodes_df: pd.DataFrame, channel_id_col: str, id_col: str
+) -> Dict[str, List[str]]:
+    """Group the episode ids by channel id. Episodes keep their order within
+    each channel."""
+    if episodes_df.empty:
+        return {}
+    return episodes_df.groupby(channel_id_col, sort=False)[id_col].agg(list).to_dict()
+
+
 def get_map_channel_to_episode_ids(
     youtube_videos_df: pd.DataFrame, spotify_episodes_df: pd.DataFrame
 ) -> Dict[str, Dict[str, List[str]]]:
@@ -80,26 +119,15 @@ def get_map_channel_to_episode_ids(
         }
     }
     """
-    youtube_channel_id_to_episode_ids_map: Dict[str, List[str]] = {}
-    spotify_channel_id_to_episode_ids_map: Dict[str, List[str]] = {}
-
-    for _, row in youtube_videos_df.iterrows():
-        channel_id = row["channel_id"]
-        episode_id = row["video_id"]
-        if channel_id not in youtube_channel_id_to_episode_ids_map:
-            youtube_channel_id_to_episode_ids_map[channel_id] = []
-        youtube_channel_id_to_episode_ids_map[channel_id].append(episode_id)
-
-    for _, row in spotify_episodes_df.iterrows():
-        channel_id = row["show_id"]
-        episode_id = row["id"]
-        if channel_id not in spotify_channel_id_to_episode_ids_map:
-            spotify_channel_id_to_episode_ids_map[channel_id] = []
-        spotify_channel_id_to_episode_ids_map[channel_id].append(episode_id)
-
     return {
-        "youtube": youtube_channel_id_to_episode_ids_map,
-        "spotify": spotify_channel_id_to_episode_ids_map,
+        "youtube": get_channel_id_to_episode_ids_map(
+            episodes_df=youtube_videos_df,
+            channel_id_col="channel_id",
+            id_col="video_id",
+        ),
+        "spotify": get_channel_id_to_episode_ids_map(
+            episodes_df=spotify_episodes_df, channel_id_col="show_id", id_col="id"
+        ),
     }
 
 
@@ -108,8 +136,13 @@ def map_channels(
     spotify_shows_df: pd.DataFrame,
     youtube_videos_df: pd.DataFrame,
     spotify_episodes_df: pd.DataFrame,
-) -> List[Dict]:
-    """Map YouTube and Spotify channels."""
+    youtube_channel_to_spotify_show: Optional[Dict[str, str]] = None,
+) -> List[MappedChannel]:
+    """Map YouTube and Spotify channels. Only the channels that are in the
+    channel mapping (see `get_channel_mapping`; the hardcoded mapping by
+    default) and have been synced for both integrations are mapped."""
+    if youtube_channel_to_spotify_show is None:
+        youtube_channel_to_spotify_show = YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING
 
     youtube_channel_info_list = get_youtube_channel_info(youtube_channels_df)
     spotify_show_info_list = get_spotify_show_info(spotify_shows_df)
@@ -118,10 +151,14 @@ def map_channels(
 
     # create consolidated metadata, starting with youtube data
     for youtube_channel in youtube_channel_info_list:
+        if youtube_channel["channel_title"] not in youtube_channel_to_spotify_show:
+            continue
         consolidated_name = return_consolidated_channel_name(
-            youtube_channel["channel_title"], "youtube"
+            youtube_channel["channel_title"], "youtube", youtube_channel_to_spotify_show
+        )
+        channel_metadata = consolidate_channel_metadata(
+            youtube_channel, "youtube", youtube_channel_to_spotify_show
         )
-        channel_metadata = consolidate_channel_metadata(youtube_channel, "youtube")
         youtube_channel_id = youtube_channel["channel_id"]
         channel_metadata["youtube_channel_id"] = youtube_channel_id
         consolidated_name_to_channel_metadata_map[consolidated_name] = channel_metadata
@@ -129,17 +166,19 @@ def map_channels(
     # enrich consolidated metadata with spotify data
     for spotify_show in spotify_show_info_list:
         consolidated_name = return_consolidated_channel_name(
-            spotify_show["show_title"], "spotify"
+            spotify_show["name"], "spotify", youtube_channel_to_spotify_show
         )
-        spotify_show_id = spotify_show["id"]
-        channel_metadata["spotify_show_id"] = spotify_show_id
+        if consolidated_name not in consolidated_name_to_channel_metadata_map:
+            continue
         consolidated_name_to_channel_metadata_map[consolidated_name][
             "spotify_show_id"
-        ] = channel_metadata  # noqa
+        ] = spotify_show["id"]
 
-    consolidated_metadata: List[Dict] = list(
-        consolidated_name_to_channel_metadata_map.values()
-    )
+    consolidated_metadata: List[Dict] = [
+        channel_metadata
+        for channel_metadata in consolidated_name_to_channel_metadata_map.values()
+        if "spotify_show_id" in channel_metadata
+    ]
 
     # add the episode ids to the consolidated metadata
     map_channel_to_episode_ids = get_map_channel_to_episode_ids(
@@ -154,12 +193,12 @@ def map_channels(
     for channel_metadata in consolidated_metadata:
         youtube_channel_id = channel_metadata["youtube_channel_id"]
         spotify_show_id = channel_metadata["spotify_show_id"]
-        channel_metadata["youtube_episode_ids"] = youtube_channel_to_episode_ids_map[
-            youtube_channel_id
-        ]
-        channel_metadata["spotify_episode_ids"] = spotify_channel_to_episode_ids_map[
-            spotify_show_id
-        ]
+        channel_metadata[
+            "youtube_episode_ids"
+        ] = youtube_channel_to_episode_ids_map.get(youtube_channel_id, [])
+        channel_metadata[
+            "spotify_episode_ids"
+        ] = spotify_channel_to_episode_ids_map.get(spotify_show_id, [])
         mapped_channel_metadata.append(channel_metadata)
 
     # create mapped channel instances
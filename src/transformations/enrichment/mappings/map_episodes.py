@@ -1,47 +1,84 @@
 """Maps YouTube videos and Spotify episodes."""
 from datetime import datetime
-from typing import Dict, List, Union
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
 
+import numpy as np
 import pandas as pd
 
+from lib.constants import CURRENT_SYNCTIMESTAMP
 from lib.log.logger import Logger
+from lib.metrics import METRICS
 from transformations.enrichment import constants
 from transformations.enrichment.helper import create_mapped_episode_instance
-from transformations.enrichment.models import MappedChannel, MappedEpisode
+from transformations.enrichment.mappings.assignment import assign_episode_pairs
+from transformations.enrichment.mappings.candidates import (
+    get_candidate_pairs_for_episodes,
+    SPOTIFY_POST_DATE_FORMAT,
+    YOUTUBE_POST_DATE_FORMAT,
+)
+from transformations.enrichment.mappings.map_channels import (
+    YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING,
+)
+from transformations.enrichment.mappings.similarity import (
+    description_similarity,
+    title_similarity,
+)
+from transformations.enrichment.mappings.models import MappedChannel, MappedEpisode
 
 logger = Logger(__name__)
 
 
-def titles_match(youtube_video_title: str, spotify_episode_title: str) -> bool:
+# the same post dates are compared many times over, so we only parse each once.
+@lru_cache(maxsize=None)
+def parse_youtube_post_date(youtube_video_post_date: str) -> datetime:
+    return datetime.strptime(youtube_video_post_date, YOUTUBE_POST_DATE_FORMAT)
+
+
+@lru_cache(maxsize=None)
+def parse_spotify_post_date(spotify_episode_post_date: str) -> datetime:
+    return datetime.strptime(spotify_episode_post_date, SPOTIFY_POST_DATE_FORMAT)
+
+
+def titles_match(youtube_video_title: str, spotify_episode_title: str) -> float:
     """Performs matching of the titles.
 
     Returns 1 for exact match. Otherwise, can return float between 0 and 1
     for fuzzy matching. Returns 0 if they clearly don't match.
 
-    NOTE: first pass can be exact match.
+    Titles are compared after normalization (see `similarity.normalize_text`),
+    so e.g. "#123 | Title" and "Title" are an exact match.
     """
-    return youtube_video_title == spotify_episode_title
+    return title_similarity(youtube_video_title, spotify_episode_title)
 
 
-def channel_names_match(youtube_channel_name: str, spotify_podcast_name: str) -> bool:
+def channel_names_match(
+    youtube_channel_name: str,
+    spotify_podcast_name: str,
+    youtube_channel_to_spotify_show: Optional[Dict[str, str]] = None,
+) -> bool:
     """Checks to see if the YouTube and Spotify channel/podcast names match.
 
-    This doesn't have to be fuzzy match; we should be able to use a hardcoded
-    map in order to see if the names are actually matching (first pass can
-    just be raw match).
+    This doesn't have to be fuzzy match; we should be able to use a map (the
+    hardcoded one by default) in order to see if the names are actually
+    matching (first pass can just be raw match).
     """
-    return youtube_channel_name == spotify_podcast_name
+    if youtube_channel_to_spotify_show is None:
+        youtube_channel_to_spotify_show = YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING
+    return youtube_channel_name == spotify_podcast_name or (
+        youtube_channel_to_spotify_show.get(youtube_channel_name)
+        == spotify_podcast_name
+    )
 
 
 def fuzzy_match_descriptions(
     youtube_video_description: str, spotify_episode_description: str
-) -> bool:
-    """Performs fuzzy matching of the titles.
-
-    For first pass, can just do exact matching. Otherwise, later can do
-    fuzzy matching.
-    """
-    return youtube_video_description == spotify_episode_description
+) -> float:
+    """Performs fuzzy matching of the descriptions. Returns a float between
+    0 and 1."""
+    return description_similarity(
+        youtube_video_description, spotify_episode_description
+    )
 
 
 def youtube_video_and_spotify_episode_posted_same_time(
@@ -61,10 +98,8 @@ def youtube_video_and_spotify_episode_posted_same_time(
     True
     """
     # create datetime objects for each
-    youtube_post_date_dt = datetime.strptime(
-        youtube_video_post_date, "%Y-%m-%dT%H:%M:%SZ"
-    )
-    spotify_post_date_dt = datetime.strptime(spotify_episode_post_date, "%Y-%m-%d")
+    youtube_post_date_dt = parse_youtube_post_date(youtube_video_post_date)
+    spotify_post_date_dt = parse_spotify_post_date(spotify_episode_post_date)
 
     # get the difference between the two, check if it is in acceptable range.
     num_hours_diff = abs(
@@ -74,7 +109,9 @@ def youtube_video_and_spotify_episode_posted_same_time(
 
 
 def exact_match_youtube_video_to_spotify_episode(
-    youtube_video: Dict, spotify_episode: Dict
+    youtube_video: Dict,
+    spotify_episode: Dict,
+    youtube_channel_to_spotify_show: Optional[Dict[str, str]] = None,
 ) -> float:
     """Tries an exact comparison between the YouTube and Spotify sources.
     If it can exactly tell that they are identical, then it returns 1.
@@ -95,16 +132,22 @@ def exact_match_youtube_video_to_spotify_episode(
     if channel_names_match(
         youtube_channel_name=youtube_video["channel_title"],
         spotify_podcast_name=spotify_episode["show_name"],
-    ) and titles_match(
-        youtube_video_title=youtube_video["video_title"],
-        spotify_episode_title=spotify_episode["name"],
+        youtube_channel_to_spotify_show=youtube_channel_to_spotify_show,
+    ) and (
+        titles_match(
+            youtube_video_title=youtube_video["video_title"],
+            spotify_episode_title=spotify_episode["name"],
+        )
+        == 1.0
     ):
         return 1.0
     return 0
 
 
 def fuzzy_match_youtube_video_to_spotify_episode(
-    youtube_video: Dict, spotify_episode: Dict
+    youtube_video: Dict,
+    spotify_episode: Dict,
+    youtube_channel_to_spotify_show: Optional[Dict[str, str]] = None,
 ) -> float:
     """Perform fuzzy matching between YouTube and Spotify sources.
 
@@ -122,35 +165,36 @@ def fuzzy_match_youtube_video_to_spotify_episode(
         channel_names_match(
             youtube_channel_name=youtube_video["channel_title"],
             spotify_podcast_name=spotify_episode["show_name"],
+            youtube_channel_to_spotify_show=youtube_channel_to_spotify_show,
         )
     )
 
-    descriptions_match_score = float(
-        fuzzy_match_descriptions(
-            youtube_video_description="", spotify_episode_description=""
-        )
+    descriptions_match_score = fuzzy_match_descriptions(
+        youtube_video_description=youtube_video["description"],
+        spotify_episode_description=spotify_episode["description"],
     )
 
     # it's likely that (assuming our algorithm works as intended) that
     # a proper mapping will lead to any of the scores being near 0, so if
-    # we get that, then we can likely throw away the result.
-    if any(
-        [
-            score == 0
-            for score in [
-                titles_match_score,
-                channel_names_match_score,
-                descriptions_match_score,
-            ]
-        ]
-    ):
+    # we get that, then we can likely throw away the result. Descriptions
+    # often differ a lot across platforms, so they only add to the score.
+    if titles_match_score == 0 or channel_names_match_score == 0:
         return 0.0
 
-    return titles_match_score + channel_names_match_score + descriptions_match_score
+    match_score = (
+        constants.FUZZY_MATCH_TITLE_WEIGHT * titles_match_score
+        + constants.FUZZY_MATCH_DESCRIPTION_WEIGHT * descriptions_match_score
+    )
+    if match_score < constants.FUZZY_MATCH_MIN_SCORE:
+        return 0.0
+    return match_score
 
 
 def match_youtube_video_to_spotify_episode(
-    youtube_video: Dict, spotify_episode: Dict, allow_fuzzy_matching: bool = False
+    youtube_video: Dict,
+    spotify_episode: Dict,
+    allow_fuzzy_matching: bool = False,
+    youtube_channel_to_spotify_show: Optional[Dict[str, str]] = None,
 ) -> Dict[str, Union[str, float]]:
     """Performs a matching between a YouTube video and Spotify episode, to
     get the likelihood (a float between 0 and 1) that they should be
@@ -171,7 +215,9 @@ def match_youtube_video_to_spotify_episode(
     }
     """
     is_exact_match = exact_match_youtube_video_to_spotify_episode(
-        youtube_video=youtube_video, spotify_episode=spotify_episode
+        youtube_video=youtube_video,
+        spotify_episode=spotify_episode,
+        youtube_channel_to_spotify_show=youtube_channel_to_spotify_show,
     )
     match_type: str = "exact" if is_exact_match else "fuzzy"
     if is_exact_match:
@@ -182,98 +228,87 @@ def match_youtube_video_to_spotify_episode(
 
     if allow_fuzzy_matching:
         fuzzy_match_score = fuzzy_match_youtube_video_to_spotify_episode(
-            youtube_video=youtube_video, spotify_episode=spotify_episode
+            youtube_video=youtube_video,
+            spotify_episode=spotify_episode,
+            youtube_channel_to_spotify_show=youtube_channel_to_spotify_show,
         )
         return {"match_type": match_type, "value": fuzzy_match_score}
     else:
         return {"match_type": match_type, "value": 0.0}
 
 
-def find_most_likely_spotify_map_to_youtube_videos(
-    youtube_videos: List[Dict], spotify_episodes: List[Dict]
-) -> Dict[str, Dict]:
-    youtube_to_matching_spotify_episode: Dict[str, Dict] = {}
-    # loop through all the YouTube videos, find most likely Spotify match
-    for youtube_video in youtube_videos:
-        youtube_id = youtube_video["video_id"]
-        max_matching_score: float = 0.0
-        max_matching_id: str = ""
-        has_found_exact_match: bool = False
-        for spotify_episode in spotify_episodes:
-            spotify_id: str = spotify_episode["id"]
-            spotify_episode_name: str = spotify_episode["name"]
-            match_dict = match_youtube_video_to_spotify_episode(
-                youtube_video=youtube_video, spotify_episode=spotify_episode
+def score_candidate_pair(
+    youtube_video: Dict,
+    spotify_episode: Dict,
+    youtube_channel_to_spotify_show: Optional[Dict[str, str]] = None,
+) -> float:
+    """Score a candidate pair. Returns 1.0 for an exact match, the fuzzy
+    match score otherwise, and 0.0 if the pair definitely doesn't match."""
+    match_dict = match_youtube_video_to_spotify_episode(
+        youtube_video=youtube_video,
+        spotify_episode=spotify_episode,
+        allow_fuzzy_matching=True,
+        youtube_channel_to_spotify_show=youtube_channel_to_spotify_show,
+    )
+    match_type: str = match_dict["match_type"]  # type: ignore
+    match_score: float = match_dict["value"]  # type: ignore
+    if match_type == "exact":
+        # 1 if exact match, -1 if definitely not a match.
+        return max(match_score, 0.0)
+    return match_score
+
+
+def is_synced_after(episodes: List[Dict], synced_after: str) -> np.ndarray:
+    return np.array(
+        [episode["synctimestamp"] >= synced_after for episode in episodes],
+        dtype=bool,
+    )
+
+
+def score_candidate_pairs(
+    youtube_videos: List[Dict],
+    spotify_episodes: List[Dict],
+    synced_after: Optional[str] = None,
+    youtube_channel_to_spotify_show: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """Score each candidate pair of a YouTube video and a Spotify episode
+    posted around the same time.
+
+    If `synced_after` is set, only the pairs where the video or the episode
+    was synced at or after that synctimestamp are scored, since the other
+    pairs were already scored in a previous mapping run.
+
+    Returns the candidate pairs (see `candidates.get_candidate_pairs`) that
+    could be a match, with their `match_score`.
+    """
+    candidate_pairs_df = get_candidate_pairs_for_episodes(
+        youtube_videos=youtube_videos, spotify_episodes=spotify_episodes
+    )
+    if synced_after is not None:
+        is_new_pair = (
+            is_synced_after(youtube_videos, synced_after)[
+                candidate_pairs_df["youtube_index"].to_numpy()
+            ]
+            | is_synced_after(spotify_episodes, synced_after)[
+                candidate_pairs_df["spotify_index"].to_numpy()
+            ]
+        )
+        candidate_pairs_df = candidate_pairs_df[is_new_pair]
+    METRICS.increment("map_episodes_comparisons_total", len(candidate_pairs_df))
+    candidate_pairs_df = candidate_pairs_df.assign(
+        match_score=[
+            score_candidate_pair(
+                youtube_video=youtube_videos[youtube_index],
+                spotify_episode=spotify_episodes[spotify_index],
+                youtube_channel_to_spotify_show=youtube_channel_to_spotify_show,
             )
-            match_type: str = match_dict["match_type"]  # type: ignore
-            match_score: float = match_dict["value"]  # type: ignore
-            if match_type == "exact":
-                # found exact match
-                if match_score == 1.0:
-                    has_found_exact_match = True
-                    max_matching_id = spotify_id
-                # skip if definitely not a match.
-                elif match_score == -1.0:
-                    continue
-            else:
-                if match_score != 0.0 and match_score > max_matching_score:
-                    max_matching_score = match_score
-                    max_matching_id = spotify_id
-            if has_found_exact_match:
-                break
-        if max_matching_id is not None:
-            youtube_to_matching_spotify_episode[youtube_id] = {
-                "matching_id": spotify_id,
-                "matching_name": spotify_episode_name,
-                "matching_description": spotify_episode["description"],  # noqa
-                "original_id": youtube_id,
-                "original_name": youtube_video["video_title"],
-                "original_description": youtube_video["description"],
-            }
-    return youtube_to_matching_spotify_episode
-
-
-def find_most_likely_youtube_map_to_spotify_episodes(
-    youtube_videos: List[Dict], spotify_episodes: List[Dict]
-) -> Dict[str, Dict]:
-    spotify_to_matching_youtube_video: Dict[str, Dict] = {}
-    # loop through all the Spotify episodes, find most likely YouTube match
-    for spotify_episode in spotify_episodes:
-        spotify_id = spotify_episode["id"]
-        max_matching_score: float = 0.0
-        max_matching_id: str = ""
-        has_found_exact_match: bool = False
-        for youtube_video in youtube_videos:
-            youtube_id = youtube_video["video_id"]
-            match_dict = match_youtube_video_to_spotify_episode(
-                youtube_video=youtube_video, spotify_episode=spotify_episode
+            for youtube_index, spotify_index in zip(
+                candidate_pairs_df["youtube_index"],
+                candidate_pairs_df["spotify_index"],
             )
-            match_type: str = match_dict["match_type"]  # type: ignore
-            match_score: float = match_dict["value"]  # type: ignore
-            if match_type == "exact":
-                # found exact match
-                if match_score == 10:
-                    has_found_exact_match = True
-                    max_matching_id = youtube_id
-                # skip if definitely not a match.
-                elif match_score == -1.0:
-                    continue
-            else:
-                if match_score != 0.0 and match_score > max_matching_score:
-                    max_matching_score = match_score
-                    max_matching_id = youtube_id
-            if has_found_exact_match:
-                break
-        if max_matching_id is not None:
-            spotify_to_matching_youtube_video[spotify_id] = {
-                "matching_id": youtube_id,
-                "matching_name": youtube_video["video_title"],
-                "matching_description": youtube_video["description"],
-                "original_id": spotify_id,
-                "original_name": spotify_episode["name"],
-                "original_ddescription": spotify_episode["description"],
-            }
-    return spotify_to_matching_youtube_video
+        ]
+    )
+    return candidate_pairs_df[candidate_pairs_df["match_score"] > 0.0]
 
 
 def get_episode_id_to_channel_id_map(
@@ -331,7 +366,7 @@ def get_consolidate_episode_name(
 ) -> str:
     """Get consolidated episode name. For now, use Spotify episode name."""
     if youtube_episode_name != spotify_episode_name:
-        logger.info(
+        logger.log(
             "Youtube episode name != Spotify episode name",
             youtube_episode_name=youtube_episode_name,
             spotify_episode_name=spotify_episode_name,
@@ -344,7 +379,7 @@ def get_consolidated_description(
 ) -> str:
     """Get consolidated description. For now, use Spotify episode description."""
     if youtube_episode_description != spotify_episode_description:
-        logger.info(
+        logger.log(
             "Youtube episode description != Spotify episode description",
             youtube_episode_description=youtube_episode_description,
             spotify_episode_description=spotify_episode_description,
@@ -357,7 +392,7 @@ def get_consolidated_mapped_channel_name(
 ) -> str:
     """Get consolidated channel name. For now, use Spotify channel name."""
     if youtube_channel_name != spotify_channel_name:
-        logger.info(
+        logger.log(
             "Youtube channel name != Spotify channel name",
             youtube_channel_name=youtube_channel_name,
             spotify_channel_name=spotify_channel_name,
@@ -366,7 +401,7 @@ def get_consolidated_mapped_channel_name(
 
 
 def create_mapped_episode_metadata(
-    mapping: Dict[str, str],
+    mapping: Dict,
     youtube_episode_id_to_channel_id_map: Dict[str, Dict],
     spotify_episode_id_to_channel_id_map: Dict[str, Dict],
 ) -> Dict:
@@ -377,6 +412,7 @@ def create_mapped_episode_metadata(
     - consolidated name
     - consolidated description
     - channel id
+    - match confidence
     """
     consolidated_name = get_consolidate_episode_name(
         youtube_episode_name=mapping["youtube_episode_name"],
@@ -414,6 +450,8 @@ def create_mapped_episode_metadata(
         "consolidated_description": consolidated_description,
         "youtube_episode": youtube_episode_data,
         "spotify_episode": spotify_episode_data,
+        "match_confidence": mapping["match_confidence"],
+        "last_updated_timestamp": CURRENT_SYNCTIMESTAMP,
     }
 
 
@@ -421,47 +459,50 @@ def map_episodes(
     youtube_videos: List[Dict],
     spotify_episodes: List[Dict],
     mapped_channels: List[MappedChannel],
-) -> List[Dict]:
+    synced_after: Optional[str] = None,
+) -> List[MappedEpisode]:
     """Map a given channel's YouTube videos against possible Spotify podcast versions
     of those same videos.
+
+    If `synced_after` is set, only matches the videos and episodes synced at
+    or after that synctimestamp (see `score_candidate_pairs`).
     """
-    youtube_to_matching_spotify_episode: Dict[
-        str, Dict[str, str]
-    ] = find_most_likely_spotify_map_to_youtube_videos(
-        youtube_videos=youtube_videos, spotify_episodes=spotify_episodes
-    )
-    spotify_to_matching_youtube_video: Dict[
-        str, Dict[str, str]
-    ] = find_most_likely_youtube_map_to_spotify_episodes(
-        youtube_videos=youtube_videos, spotify_episodes=spotify_episodes
+    # the channels' names match if the channels were mapped together.
+    youtube_channel_to_spotify_show = {
+        **YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING,
+        **{
+            mapped_channel.youtube_channel.name: mapped_channel.spotify_channel.name
+            for mapped_channel in mapped_channels
+        },
+    }
+    # score each candidate pair once, then assign the pairs one-to-one.
+    scored_pairs_df = score_candidate_pairs(
+        youtube_videos=youtube_videos,
+        spotify_episodes=spotify_episodes,
+        synced_after=synced_after,
+        youtube_channel_to_spotify_show=youtube_channel_to_spotify_show,
     )
+    assigned_pairs_df = assign_episode_pairs(scored_pairs_df)
 
     mappings: List[Dict] = []
+    for youtube_index, spotify_index, match_confidence in assigned_pairs_df[
+        ["youtube_index", "spotify_index", "match_confidence"]
+    ].itertuples(index=False, name=None):
+        youtube_video = youtube_videos[youtube_index]
+        spotify_episode = spotify_episodes[spotify_index]
+        mappings.append(
+            {
+                "youtube_id": youtube_video["video_id"],
+                "spotify_id": spotify_episode["id"],
+                "youtube_episode_name": youtube_video["video_title"],
+                "spotify_episode_name": spotify_episode["name"],
+                "youtube_description": youtube_video["description"],
+                "spotify_description": spotify_episode["description"],
+                "match_confidence": match_confidence,
+            }
+        )
 
-    # check for bijective match. If so, add to mappings
-    for (
-        youtube_id,
-        matching_spotify_data,
-    ) in youtube_to_matching_spotify_episode.items():  # noqa
-        spotify_id = matching_spotify_data["matching_id"]
-        spotify_episode_name = matching_spotify_data["matching_name"]
-        spotify_description = matching_spotify_data["matching_description"]
-        if spotify_to_matching_youtube_video[spotify_id]["matching_id"] == (youtube_id):
-            mappings.append(
-                {
-                    "youtube_id": youtube_id,
-                    "spotify_id": spotify_id,
-                    "youtube_episode_name": matching_spotify_data[
-                        "original_name"
-                    ],  # noqa
-                    "spotify_episode_name": spotify_episode_name,
-                    "youtube_description": matching_spotify_data[
-                        "original_description"
-                    ],  # noqa
-                    "spotify_description": spotify_description,
-                }
-            )
-
+    METRICS.increment("map_episodes_mappings_total", len(mappings))
     logger.info(
         f"From {len(youtube_videos)} and {len(spotify_episodes)}, created "
         f"{len(mappings)} mappings."
@@ -2,8 +2,11 @@ from dataclasses import dataclass
 from typing import List
 
 from transformations.enrichment.constants import (
+    EPISODE_SIGNATURES_TABLE_NAME,
     MAPPED_CHANNEL_TABLE_NAME,
     MAPPED_EPISODES_TABLE_NAME,
+    MAPPING_SYNC_STATE_TABLE_NAME,
+    PROPOSED_CHANNEL_MAPPINGS_TABLE_NAME,
 )
 
 
@@ -56,3 +59,46 @@ class MappedEpisode:
     consolidated_description: str
     youtube_episode: MappedEpisodeIntegrationMetadata
     spotify_episode: MappedEpisodeIntegrationMetadata
+    match_confidence: float  # between 0 and 1
+    last_updated_timestamp: str
+
+
+@dataclass
+class EpisodeSignature:
+    """MinHash signature of a YouTube video or Spotify episode, used by the
+    LSH index to propose matches across all channels."""
+
+    __table_name__ = EPISODE_SIGNATURES_TABLE_NAME
+    signature_id: str  # PK, "<integration>:<episode_id>"
+    integration: str  # "youtube" or "spotify"
+    episode_id: str
+    channel_id: str
+    channel_name: str
+    signature: bytes
+    synctimestamp: str
+
+
+@dataclass
+class MappingSyncState:
+    """Tracks how far the mapping has gotten, so that each mapping run only
+    has to map the data that was synced since the last run."""
+
+    __table_name__ = MAPPING_SYNC_STATE_TABLE_NAME
+    name: str  # PK
+    last_synctimestamp: str  # latest synctimestamp of the mapped data
+    synctimestamp: str
+
+
+@dataclass
+class ProposedChannelMapping:
+    """A (YouTube channel, Spotify show) pairing proposed by the LSH index.
+    Pairings are stored so that later mapping runs, which only index the
+    newly synced episodes, still map the channels."""
+
+    __table_name__ = PROPOSED_CHANNEL_MAPPINGS_TABLE_NAME
+    youtube_channel_name: str  # PK
+    youtube_channel_id: str
+    spotify_show_id: str
+    spotify_show_name: str
+    num_episode_pairs: int
+    synctimestamp: str
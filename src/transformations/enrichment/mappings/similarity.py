@@ -0,0 +1,70 @@
+"""Fuzzy similarity between YouTube and Spotify episode titles/descriptions.
+
+The same episode is usually titled slightly differently on each platform,
+e.g., "#123 | Guest Name: Topic" on Spotify and "Guest Name: Topic | Show
+Podcast" on YouTube. We normalize each text once (lowercase, drop episode
+numbers and punctuation), cache its token set, and then score pairs with
+set similarity, which is cheap enough to score many thousands of pairs per
+channel.
+"""
+from functools import lru_cache
+import re
+from typing import FrozenSet
+
+from transformations.enrichment import constants
+
+# e.g., "#123", "ep 12", "ep. 12", "episode 12"
+EPISODE_NUMBER_PATTERN = re.compile(r"(#\s*\d+|\bep(isode)?\.?\s*\d+\b)")
+NON_WORD_PATTERN = re.compile(r"[^\w\s]|_")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase the text and strip episode numbers and punctuation."""
+    text = EPISODE_NUMBER_PATTERN.sub(" ", (text or "").lower())
+    text = NON_WORD_PATTERN.sub(" ", text)
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+@lru_cache(maxsize=constants.SIMILARITY_CACHE_MAX_SIZE)
+def get_title_tokens(title: str) -> FrozenSet[str]:
+    return frozenset(normalize_text(title).split())
+
+
+@lru_cache(maxsize=constants.SIMILARITY_CACHE_MAX_SIZE)
+def get_description_tokens(description: str) -> FrozenSet[str]:
+    """Tokens of the start of the description. The end of descriptions is
+    usually platform-specific (sponsors, links, timestamps), so we skip it."""
+    description = (description or "")[: constants.DESCRIPTION_MAX_NUM_CHARS]
+    return frozenset(normalize_text(description).split())
+
+
+def jaccard_similarity(tokens_1: FrozenSet[str], tokens_2: FrozenSet[str]) -> float:
+    if not tokens_1 or not tokens_2:
+        return 0.0
+    num_shared_tokens = len(tokens_1 & tokens_2)
+    return num_shared_tokens / (len(tokens_1) + len(tokens_2) - num_shared_tokens)
+
+
+def overlap_coefficient(tokens_1: FrozenSet[str], tokens_2: FrozenSet[str]) -> float:
+    """Share of the smaller set that is in the other set, so that a title
+    with an extra guest/show suffix still scores high."""
+    if not tokens_1 or not tokens_2:
+        return 0.0
+    return len(tokens_1 & tokens_2) / min(len(tokens_1), len(tokens_2))
+
+
+def title_similarity(title_1: str, title_2: str) -> float:
+    """Returns 1 if the normalized titles have the same tokens, otherwise a
+    float between 0 and 1."""
+    tokens_1 = get_title_tokens(title_1)
+    tokens_2 = get_title_tokens(title_2)
+    return (
+        jaccard_similarity(tokens_1, tokens_2) + overlap_coefficient(tokens_1, tokens_2)
+    ) / 2
+
+
+def description_similarity(description_1: str, description_2: str) -> float:
+    return jaccard_similarity(
+        get_description_tokens(description_1), get_description_tokens(description_2)
+    )
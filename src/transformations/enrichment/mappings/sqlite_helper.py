@@ -1,34 +1,166 @@
 """SQLite helper utilities for writing mapped data."""
-from typing import Union
+from collections import defaultdict
+from dataclasses import asdict
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Union
+
+import pandas as pd
 
 from db.sql import helper
-from db.sql.helper import conn, cursor
+from db.sql.connection import get_connection
+from transformations.enrichment.constants import (
+    MATCHING_CHUNK_SIZE,
+    MATCHING_TABLE_NAME_TO_COLUMNS,
+)
 from transformations.enrichment.helper import (
     flatten_mapped_channel,
     flatten_mapped_episode,
 )
-from transformations.enrichment.mappings.models import MappedChannel, MappedEpisode
+from transformations.enrichment.mappings.models import (
+    EpisodeSignature,
+    MappedChannel,
+    MappedEpisode,
+    MappingSyncState,
+    ProposedChannelMapping,
+)
+
+MAPPING_SYNC_STATE_NAME = "episodes"
+
+
+def bulk_write_mapped_data_to_db(
+    instances: Sequence[Union[MappedChannel, MappedEpisode]]
+) -> None:
+    """Upserts a batch of MappedChannel and/or MappedEpisode instances into
+    their respective SQLite tables, with one transaction per table."""
+    table_name_to_rows: Dict[str, List[Dict]] = defaultdict(list)
+    for instance in instances:
+        instance_dict = (
+            flatten_mapped_channel(instance)
+            if isinstance(instance, MappedChannel)
+            else flatten_mapped_episode(instance)
+        )
+        table_name_to_rows[instance.__table_name__].append(instance_dict)
+
+    for table_name, rows in table_name_to_rows.items():
+        helper.upsert_rows(table_name=table_name, rows=rows)
 
 
 def write_mapped_data_to_db(instance: Union[MappedChannel, MappedEpisode]) -> None:
     """Writes either the MappedChannel or MappedEpisode instance to their
     respective SQLite tables."""
-    table_name = instance.__table_name__
-    instance_dict = (
-        flatten_mapped_channel(instance)
-        if isinstance(instance, MappedChannel)
-        else flatten_mapped_episode(instance)
+    bulk_write_mapped_data_to_db([instance])
+
+
+def bulk_write_episode_signatures_to_db(signatures: List[EpisodeSignature]) -> None:
+    """Upserts a batch of EpisodeSignature instances."""
+    if not signatures:
+        return
+    helper.upsert_rows(
+        table_name=EpisodeSignature.__table_name__,
+        rows=[asdict(signature) for signature in signatures],
     )
-    instance_dict.pop("__table_name__", None)
 
-    if not helper.check_if_table_exists(cursor=cursor, table_name=table_name):
-        helper.create_table(conn=conn, cursor=cursor, table_name=table_name)
 
-    # only write to the SQLite DB if the primary key is unique
-    row_insertion_is_valid = helper.single_row_insertion_is_valid(
-        row_data=instance_dict, table_name=table_name
+def get_episode_signatures() -> List[EpisodeSignature]:
+    """Get all the stored episode signatures."""
+    signatures_df = helper.get_all_table_results_as_df(EpisodeSignature.__table_name__)
+    return [EpisodeSignature(**row) for row in signatures_df.to_dict(orient="records")]
+
+
+def get_mapped_episode_ids() -> Dict[str, Set[str]]:
+    """Get the IDs of the YouTube videos and Spotify episodes that are already
+    mapped, keyed by integration."""
+    table_name = MappedEpisode.__table_name__
+    if not helper.check_if_table_exists(
+        cursor=get_connection().cursor(), table_name=table_name
+    ):
+        return {"youtube": set(), "spotify": set()}
+    return {
+        "youtube": set(
+            helper.get_column(table_name=table_name, column="youtube_episode_id")
+        ),
+        "spotify": set(
+            helper.get_column(table_name=table_name, column="spotify_episode_id")
+        ),
+    }
+
+
+def get_mapping_sync_state() -> Optional[MappingSyncState]:
+    """Get the state from the last mapping run, if any."""
+    row = helper.get_row_by_primary_key(
+        table_name=MappingSyncState.__table_name__,
+        pk_value=MAPPING_SYNC_STATE_NAME,
+    )
+    return MappingSyncState(**row) if row else None
+
+
+def write_mapping_sync_state(last_synctimestamp: str, synctimestamp: str) -> None:
+    mapping_sync_state = MappingSyncState(
+        name=MAPPING_SYNC_STATE_NAME,
+        last_synctimestamp=last_synctimestamp,
+        synctimestamp=synctimestamp,
+    )
+    helper.upsert_rows(
+        table_name=MappingSyncState.__table_name__,
+        rows=[asdict(mapping_sync_state)],
+    )
+
+
+def write_proposed_channel_mappings(
+    channel_pairings: List[Dict], synctimestamp: str
+) -> None:
+    """Upserts the channel pairings proposed by the LSH index (see
+    `lsh.EpisodeLSHIndex.get_channel_pairings`)."""
+    if not channel_pairings:
+        return
+    helper.upsert_rows(
+        table_name=ProposedChannelMapping.__table_name__,
+        rows=[
+            asdict(
+                ProposedChannelMapping(
+                    youtube_channel_name=channel_pairing["youtube_channel_name"],
+                    youtube_channel_id=channel_pairing["youtube_channel_id"],
+                    spotify_show_id=channel_pairing["spotify_show_id"],
+                    spotify_show_name=channel_pairing["spotify_show_name"],
+                    num_episode_pairs=channel_pairing["num_episode_pairs"],
+                    synctimestamp=synctimestamp,
+                )
+            )
+            for channel_pairing in channel_pairings
+        ],
+    )
+
+
+def get_proposed_channel_mappings() -> List[Dict]:
+    """Get all the stored channel pairings, most likely pairings first."""
+    proposed_channel_mappings_df = helper.get_all_table_results_as_df(
+        ProposedChannelMapping.__table_name__
+    )
+    if proposed_channel_mappings_df.empty:
+        return []
+    return proposed_channel_mappings_df.sort_values(
+        "num_episode_pairs", ascending=False, kind="stable"
+    ).to_dict(orient="records")
+
+
+def get_channel_episodes_for_matching(
+    table_name: str, channel_id_col: str, channel_id: str
+) -> pd.DataFrame:
+    """Get the episodes of a channel, with the columns used for matching."""
+    return helper.load_table(
+        table_name=table_name,
+        columns=MATCHING_TABLE_NAME_TO_COLUMNS[table_name],
+        where_in={channel_id_col: [channel_id]},
+    )
+
+
+def iter_episodes_for_matching(
+    table_name: str, synced_after: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """Stream through the episodes synced at or after `synced_after` (all of
+    them if None) in chunks, with the columns used for matching."""
+    return helper.iter_table_chunks(
+        table_name=table_name,
+        chunksize=MATCHING_CHUNK_SIZE,
+        columns=MATCHING_TABLE_NAME_TO_COLUMNS[table_name],
+        synced_after=synced_after,
     )
-    if row_insertion_is_valid:
-        helper.write_to_database(
-            conn=conn, cursor=cursor, table_name=table_name, data=instance_dict
-        )
@@ -0,0 +1,38 @@
+"""Tests for methods in assignment.py"""
+import pandas as pd
+
+from transformations.enrichment.mappings.assignment import assign_episode_pairs
+
+
+def test_assign_episode_pairs_is_one_to_one():
+    # greedy best match in each direction would pick (0, 0) for both videos
+    # and drop video 1, even though it has another good candidate.
+    scored_pairs_df = pd.DataFrame(
+        [
+            {"youtube_index": 0, "spotify_index": 0, "match_score": 0.9},
+            {"youtube_index": 1, "spotify_index": 0, "match_score": 0.8},
+            {"youtube_index": 1, "spotify_index": 1, "match_score": 0.7},
+            {"youtube_index": 2, "spotify_index": 2, "match_score": 1.0},
+        ]
+    )
+
+    assigned_pairs_df = assign_episode_pairs(scored_pairs_df)
+
+    assert list(
+        assigned_pairs_df[["youtube_index", "spotify_index"]].itertuples(
+            index=False, name=None
+        )
+    ) == [(2, 2), (0, 0), (1, 1)]
+    confidences = dict(
+        zip(assigned_pairs_df["youtube_index"], assigned_pairs_df["match_confidence"])
+    )
+    # uncontested pair is fully confident, contested pairs are discounted.
+    assert confidences[2] == 1.0
+    assert 0 < confidences[1] < confidences[0] < 0.9
+
+
+def test_assign_episode_pairs_with_no_pairs():
+    scored_pairs_df = pd.DataFrame(
+        columns=["youtube_index", "spotify_index", "match_score"]
+    )
+    assert assign_episode_pairs(scored_pairs_df).empty
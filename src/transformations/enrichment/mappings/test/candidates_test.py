@@ -0,0 +1,34 @@
+"""Tests for methods in candidates.py"""
+import pandas as pd
+
+from transformations.enrichment.mappings.candidates import get_candidate_pairs
+
+
+def test_get_candidate_pairs_only_returns_pairs_in_window():
+    youtube_published_at = pd.Series(
+        ["2023-09-15T12:00:00Z", "2023-09-01T00:00:00Z", "not-a-date"]
+    )
+    spotify_release_dates = pd.Series(
+        ["2023-09-16", "2023-09-14", "2023-09-15", "2023-08-31", "2023", "2023-09-20"]
+    )
+
+    candidate_pairs_df = get_candidate_pairs(
+        youtube_published_at=youtube_published_at,
+        spotify_release_dates=spotify_release_dates,
+        max_num_hours_diff=24,
+    )
+
+    assert list(candidate_pairs_df.itertuples(index=False, name=None)) == [
+        (0, 2),
+        (0, 0),
+        (1, 3),
+    ]
+
+
+def test_get_candidate_pairs_with_no_episodes():
+    candidate_pairs_df = get_candidate_pairs(
+        youtube_published_at=pd.Series(["2023-09-15T12:00:00Z"]),
+        spotify_release_dates=pd.Series([], dtype=object),
+    )
+    assert candidate_pairs_df.empty
+    assert list(candidate_pairs_df.columns) == ["youtube_index", "spotify_index"]
@@ -0,0 +1,40 @@
+"""Tests for methods in helper.py"""
+import pandas as pd
+
+from transformations.enrichment.mappings.helper import (
+    get_episode_ids_synced_after,
+    get_unmapped_episodes,
+)
+
+episodes_df = pd.DataFrame(
+    [
+        {"id": "episode-1", "synctimestamp": "2023-09-01T00:00:00Z"},
+        {"id": "episode-2", "synctimestamp": "2023-09-02T00:00:00Z"},
+        {"id": "episode-3", "synctimestamp": "2023-09-03T00:00:00Z"},
+    ]
+)
+
+
+def test_get_episode_ids_synced_after():
+    assert get_episode_ids_synced_after(
+        episodes_df=episodes_df, id_col="id", synced_after="2023-09-02T00:00:00Z"
+    ) == {"episode-2", "episode-3"}
+    assert get_episode_ids_synced_after(
+        episodes_df=episodes_df, id_col="id", synced_after=None
+    ) == {"episode-1", "episode-2", "episode-3"}
+    assert (
+        get_episode_ids_synced_after(
+            episodes_df=pd.DataFrame(), id_col="id", synced_after=None
+        )
+        == set()
+    )
+
+
+def test_get_unmapped_episodes():
+    unmapped_episodes = get_unmapped_episodes(
+        episodes_df=episodes_df,
+        id_col="id",
+        episode_ids=["episode-1", "episode-2"],
+        mapped_episode_ids={"episode-1"},
+    )
+    assert [episode["id"] for episode in unmapped_episodes] == ["episode-2"]
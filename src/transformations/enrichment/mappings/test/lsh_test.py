@@ -0,0 +1,124 @@
+"""Tests for methods in lsh.py"""
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pytest
+
+from transformations.enrichment.mappings import lsh as lsh_module
+from transformations.enrichment.mappings.lsh import (
+    build_lsh_index,
+    compute_minhash_signature,
+    estimate_similarity,
+    get_episode_tokens,
+)
+from transformations.enrichment.mappings.models import EpisodeSignature
+
+TOPICS = [
+    "sleep and focus with dr jane doe",
+    "the science of nutrition and fasting",
+    "how to build habits that stick",
+    "dopamine motivation and drive explained",
+]
+
+
+def make_youtube_videos_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            {
+                "video_id": f"video-{i}",
+                "video_title": f"{topic.title()} | Huberman Lab Podcast #{i}",
+                "description": f"In this episode we discuss {topic}.",
+                "channel_id": "youtube-channel",
+                "channel_title": "Andrew Huberman",
+            }
+            for i, topic in enumerate(TOPICS)
+        ]
+    )
+
+
+def make_spotify_episodes_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            {
+                "id": f"episode-{i}",
+                "name": f"#{i} | {topic.title()}",
+                "description": f"In this episode we discuss {topic}.",
+                "show_id": "spotify-show",
+                "show_name": "Huberman Lab",
+            }
+            for i, topic in enumerate(TOPICS)
+        ]
+    )
+
+
+@pytest.fixture
+def episode_tables(monkeypatch) -> Dict[str, pd.DataFrame]:
+    tables = {
+        "youtube_videos": make_youtube_videos_df(),
+        "spotify_episode": make_spotify_episodes_df(),
+    }
+
+    def fake_iter_episodes_for_matching(
+        table_name: str, synced_after: Optional[str] = None
+    ) -> Iterator[pd.DataFrame]:
+        # 2 rows per chunk.
+        df = tables[table_name]
+        for i in range(0, len(df), 2):
+            yield df.iloc[i : i + 2]
+
+    monkeypatch.setattr(
+        lsh_module, "iter_episodes_for_matching", fake_iter_episodes_for_matching
+    )
+    return tables
+
+
+@pytest.fixture
+def stored_signatures(monkeypatch) -> List[EpisodeSignature]:
+    signatures: List[EpisodeSignature] = []
+    monkeypatch.setattr(lsh_module, "get_episode_signatures", lambda: list(signatures))
+    monkeypatch.setattr(
+        lsh_module, "bulk_write_episode_signatures_to_db", signatures.extend
+    )
+    return signatures
+
+
+def test_minhash_signature_estimates_similarity():
+    tokens = get_episode_tokens("#1 | Sleep & Focus", "we discuss sleep and focus")
+    same_tokens = get_episode_tokens("Sleep & Focus", "We discuss sleep and focus.")
+    other_tokens = get_episode_tokens("Nutrition", "all about fasting")
+
+    signature = compute_minhash_signature(tokens)
+    assert estimate_similarity(signature, compute_minhash_signature(same_tokens)) == 1
+    assert estimate_similarity(signature, compute_minhash_signature(other_tokens)) < 0.2
+
+
+def test_build_lsh_index_proposes_pairs_and_channel_pairings(
+    episode_tables, stored_signatures
+):
+    lsh_index = build_lsh_index()
+
+    candidate_pairs_df = lsh_index.get_candidate_pairs(min_similarity=0.5)
+    assert {
+        (youtube_id, spotify_id)
+        for youtube_id, spotify_id, _ in candidate_pairs_df.itertuples(
+            index=False, name=None
+        )
+    } == {(f"video-{i}", f"episode-{i}") for i in range(len(TOPICS))}
+
+    channel_pairings = lsh_index.get_channel_pairings(min_num_episode_pairs=3)
+    assert [
+        (pairing["youtube_channel_name"], pairing["spotify_show_name"])
+        for pairing in channel_pairings
+    ] == [("Andrew Huberman", "Huberman Lab")]
+
+
+def test_build_lsh_index_only_hashes_new_episodes(episode_tables, stored_signatures):
+    youtube_videos_df = episode_tables["youtube_videos"]
+    episode_tables["youtube_videos"] = youtube_videos_df.iloc[:2]
+    build_lsh_index()
+    assert len(stored_signatures) == 6
+
+    episode_tables["youtube_videos"] = youtube_videos_df
+    lsh_index = build_lsh_index(synced_after="2023-09-01T00:00:00Z")
+    assert len(stored_signatures) == 8
+    assert len(lsh_index) == 8
@@ -0,0 +1,109 @@
+"""Tests for methods in map_channels.py"""
+from typing import Dict
+
+import pandas as pd
+
+from transformations.enrichment.mappings.map_channels import (
+    get_channel_mapping,
+    get_map_channel_to_episode_ids,
+    map_channels,
+    YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING,
+)
+
+
+def make_channel_pairing(youtube_channel_name: str, spotify_show_name: str) -> Dict:
+    return {
+        "youtube_channel_id": f"id-{youtube_channel_name}",
+        "youtube_channel_name": youtube_channel_name,
+        "spotify_show_id": f"id-{spotify_show_name}",
+        "spotify_show_name": spotify_show_name,
+        "num_episode_pairs": 3,
+    }
+
+
+def test_get_map_channel_to_episode_ids():
+    youtube_videos_df = pd.DataFrame(
+        {
+            "video_id": ["video-1", "video-2", "video-3"],
+            "channel_id": ["channel-1", "channel-2", "channel-1"],
+        }
+    )
+    spotify_episodes_df = pd.DataFrame(
+        {"id": ["episode-1", "episode-2"], "show_id": ["show-1", "show-1"]}
+    )
+
+    map_channel_to_episode_ids = get_map_channel_to_episode_ids(
+        youtube_videos_df, spotify_episodes_df
+    )
+
+    assert map_channel_to_episode_ids == {
+        "youtube": {
+            "channel-1": ["video-1", "video-3"],
+            "channel-2": ["video-2"],
+        },
+        "spotify": {"show-1": ["episode-1", "episode-2"]},
+    }
+
+
+def test_get_map_channel_to_episode_ids_with_no_episodes():
+    assert get_map_channel_to_episode_ids(pd.DataFrame(), pd.DataFrame()) == {
+        "youtube": {},
+        "spotify": {},
+    }
+
+
+def test_get_channel_mapping_adds_pairings_for_unmapped_channels():
+    channel_mapping = get_channel_mapping(
+        [
+            make_channel_pairing("Other Channel", "Other Show"),
+            # already mapped by hand.
+            make_channel_pairing("Andrew Huberman", "Wrong Show"),
+            make_channel_pairing("Another Channel", "Huberman Lab"),
+            # less likely than the first pairing of "Other Show".
+            make_channel_pairing("Third Channel", "Other Show"),
+        ]
+    )
+
+    assert channel_mapping == {
+        "Andrew Huberman": "Huberman Lab",
+        "Other Channel": "Other Show",
+    }
+    assert YOUTUBE_CHANNEL_TO_SPOTIFY_SHOW_MAPPING == {
+        "Andrew Huberman": "Huberman Lab"
+    }
+
+
+def test_map_channels_with_proposed_channel_mapping():
+    youtube_channels_df = pd.DataFrame(
+        {"channel_id": ["channel-1"], "channel_title": ["Other Channel"]}
+    )
+    spotify_shows_df = pd.DataFrame({"id": ["show-1"], "name": ["Other Show"]})
+    youtube_videos_df = pd.DataFrame(
+        {"video_id": ["video-1"], "channel_id": ["channel-1"]}
+    )
+    spotify_episodes_df = pd.DataFrame({"id": ["episode-1"], "show_id": ["show-1"]})
+
+    mapped_channels = map_channels(
+        youtube_channels_df=youtube_channels_df,
+        spotify_shows_df=spotify_shows_df,
+        youtube_videos_df=youtube_videos_df,
+        spotify_episodes_df=spotify_episodes_df,
+        youtube_channel_to_spotify_show=get_channel_mapping(
+            [make_channel_pairing("Other Channel", "Other Show")]
+        ),
+    )
+
+    assert len(mapped_channels) == 1
+    assert mapped_channels[0].consolidated_name == "Other Show"
+    assert mapped_channels[0].youtube_channel.episode_ids == ["video-1"]
+    assert mapped_channels[0].spotify_channel.episode_ids == ["episode-1"]
+    # without the proposed mapping, the channels aren't mapped.
+    assert (
+        map_channels(
+            youtube_channels_df=youtube_channels_df,
+            spotify_shows_df=spotify_shows_df,
+            youtube_videos_df=youtube_videos_df,
+            spotify_episodes_df=spotify_episodes_df,
+        )
+        == []
+    )
@@ -0,0 +1,137 @@
+"""Tests for methods in map_episodes.py"""
+from typing import Dict
+
+from transformations.enrichment.mappings import map_episodes as map_episodes_module
+from transformations.enrichment.mappings.map_episodes import (
+    fuzzy_match_youtube_video_to_spotify_episode,
+    map_episodes,
+    score_candidate_pairs,
+)
+from transformations.enrichment.mappings.models import (
+    MappedChannel,
+    MappedChannelIntegrationMetadata,
+)
+
+
+def make_youtube_video(video_id: str, title: str, published_at: str) -> Dict:
+    return {
+        "video_id": video_id,
+        "video_title": title,
+        "channel_title": "Huberman Lab",
+        "description": f"description-{video_id}",
+        "published_at": published_at,
+        "synctimestamp": "2023-09-01T00:00:00Z",
+    }
+
+
+def make_spotify_episode(episode_id: str, name: str, release_date: str) -> Dict:
+    return {
+        "id": episode_id,
+        "name": name,
+        "show_name": "Huberman Lab",
+        "description": f"description-{episode_id}",
+        "release_date": release_date,
+        "synctimestamp": "2023-09-01T00:00:00Z",
+    }
+
+
+def test_map_episodes_scores_each_candidate_once(monkeypatch):
+    youtube_videos = [
+        make_youtube_video(
+            f"video-{day}", f"title-{day}", f"2023-09-{day:02d}T15:00:00Z"
+        )
+        for day in range(1, 31)
+    ]
+    spotify_episodes = [
+        make_spotify_episode(f"episode-{day}", f"title-{day}", f"2023-09-{day:02d}")
+        for day in range(1, 31)
+    ]
+    num_comparisons = 0
+    match = map_episodes_module.match_youtube_video_to_spotify_episode
+
+    def counting_match(**kwargs) -> Dict:
+        nonlocal num_comparisons
+        num_comparisons += 1
+        return match(**kwargs)
+
+    monkeypatch.setattr(
+        map_episodes_module, "match_youtube_video_to_spotify_episode", counting_match
+    )
+
+    mapped_channel = MappedChannel(
+        consolidated_name="Huberman Lab",
+        youtube_channel=MappedChannelIntegrationMetadata(
+            id="youtube-channel",
+            name="Huberman Lab",
+            episode_ids=[video["video_id"] for video in youtube_videos],
+        ),
+        spotify_channel=MappedChannelIntegrationMetadata(
+            id="spotify-show",
+            name="Huberman Lab",
+            episode_ids=[episode["id"] for episode in spotify_episodes],
+        ),
+        last_updated_timestamp="2023-09-30-00:00:00",
+    )
+
+    mapped_episodes = map_episodes(
+        youtube_videos=youtube_videos,
+        spotify_episodes=spotify_episodes,
+        mapped_channels=[mapped_channel],
+    )
+
+    assert len(mapped_episodes) == 30
+    assert {
+        (episode.youtube_episode.id, episode.spotify_episode.id)
+        for episode in mapped_episodes
+    } == {(f"video-{day}", f"episode-{day}") for day in range(1, 31)}
+    assert all(episode.match_confidence == 1.0 for episode in mapped_episodes)
+    # each video is only compared against the episodes released on the same
+    # or the next day, instead of against all 30 episodes.
+    assert num_comparisons == 59
+
+
+def test_fuzzy_match_youtube_video_to_spotify_episode():
+    youtube_video = make_youtube_video(
+        "video", "Sleep & Focus | Huberman Lab Podcast #12", "2023-09-15T15:00:00Z"
+    )
+    spotify_episode = make_spotify_episode("episode", "Sleep & Focus", "2023-09-15")
+    spotify_episode["description"] = youtube_video["description"]
+    other_spotify_episode = make_spotify_episode(
+        "other-episode", "Nutrition", "2023-09-15"
+    )
+
+    match_score = fuzzy_match_youtube_video_to_spotify_episode(
+        youtube_video=youtube_video, spotify_episode=spotify_episode
+    )
+    other_match_score = fuzzy_match_youtube_video_to_spotify_episode(
+        youtube_video=youtube_video, spotify_episode=other_spotify_episode
+    )
+
+    assert 0.0 < match_score < 1.0
+    assert other_match_score == 0.0
+
+
+def test_score_candidate_pairs_synced_after_skips_old_pairs():
+    youtube_videos = [
+        make_youtube_video("old-video", "Sleep", "2023-09-01T15:00:00Z"),
+        make_youtube_video("new-video", "Focus", "2023-09-02T15:00:00Z"),
+    ]
+    youtube_videos[1]["synctimestamp"] = "2023-09-02T00:00:00Z"
+    spotify_episodes = [
+        make_spotify_episode("old-episode", "Sleep", "2023-09-01"),
+        make_spotify_episode("other-old-episode", "Focus", "2023-09-02"),
+    ]
+
+    scored_pairs_df = score_candidate_pairs(
+        youtube_videos=youtube_videos,
+        spotify_episodes=spotify_episodes,
+        synced_after="2023-09-02T00:00:00Z",
+    )
+
+    # the old video was already matched against the old episodes in a
+    # previous run, so only the new video's pairs are scored.
+    assert list(
+        scored_pairs_df[["youtube_index", "spotify_index"]].itertuples(
+            index=False, name=None
+        )
+    ) == [(1, 1)]
@@ -0,0 +1,37 @@
+"""Tests for methods in similarity.py"""
+from transformations.enrichment.mappings.similarity import (
+    description_similarity,
+    get_title_tokens,
+    normalize_text,
+    title_similarity,
+)
+
+
+def test_normalize_text():
+    assert normalize_text("#123 | Dr. Jane Doe: Sleep & Focus") == (
+        "dr jane doe sleep focus"
+    )
+    assert normalize_text("Ep. 12 - Sleep") == "sleep"
+    assert normalize_text("Episode 12: Sleep") == "sleep"
+
+
+def test_title_similarity():
+    assert title_similarity("#123 | Sleep & Focus", "Sleep & Focus") == 1.0
+    with_suffix = title_similarity(
+        "Sleep & Focus", "Sleep & Focus | Huberman Lab Podcast"
+    )
+    assert 0.5 < with_suffix < 1.0
+    assert title_similarity("Sleep & Focus", "Nutrition") == 0.0
+
+
+def test_description_similarity():
+    description = "In this episode, we discuss sleep and focus."
+    assert description_similarity(description, description) == 1.0
+    assert description_similarity(description, "") == 0.0
+
+
+def test_title_tokens_are_cached():
+    get_title_tokens.cache_clear()
+    for _ in range(3):
+        title_similarity("#1 | Sleep", "Sleep")
+    assert get_title_tokens.cache_info().misses == 2
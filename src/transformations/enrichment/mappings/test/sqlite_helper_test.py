@@ -0,0 +1,44 @@
+"""Tests for methods in sqlite_helper.py"""
+from db.sql import connection
+from transformations.enrichment.mappings.sqlite_helper import (
+    get_proposed_channel_mappings,
+    write_proposed_channel_mappings,
+)
+
+
+def test_proposed_channel_mappings_are_kept_across_runs(monkeypatch, tmp_path):
+    monkeypatch.setattr(connection, "SQLITE_DB_PATH", str(tmp_path / "test.db"))
+    assert get_proposed_channel_mappings() == []
+
+    write_proposed_channel_mappings(
+        channel_pairings=[
+            {
+                "youtube_channel_id": "channel-1",
+                "youtube_channel_name": "Channel 1",
+                "spotify_show_id": "show-1",
+                "spotify_show_name": "Show 1",
+                "num_episode_pairs": 3,
+            }
+        ],
+        synctimestamp="2023-09-01-00:00:00",
+    )
+    # a later run doesn't propose the same pairing again.
+    write_proposed_channel_mappings(
+        channel_pairings=[
+            {
+                "youtube_channel_id": "channel-2",
+                "youtube_channel_name": "Channel 2",
+                "spotify_show_id": "show-2",
+                "spotify_show_name": "Show 2",
+                "num_episode_pairs": 10,
+            }
+        ],
+        synctimestamp="2023-09-02-00:00:00",
+    )
+
+    proposed_channel_mappings = get_proposed_channel_mappings()
+    assert [
+        (mapping["youtube_channel_name"], mapping["spotify_show_name"])
+        for mapping in proposed_channel_mappings
+    ] == [("Channel 2", "Show 2"), ("Channel 1", "Show 1")]
+    connection.close_connections()